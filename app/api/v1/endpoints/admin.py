@@ -0,0 +1,66 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.profiling import is_admin_token, resolve_artifact
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List request profiles and ingestion memory traces, newest first.
+    """
+    if not settings.PROFILE_DIR.exists():
+        return {"profiles": []}
+    files = sorted(settings.PROFILE_DIR.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    return {"profiles": [{"id": p.name, "bytes": p.stat().st_size} for p in files if p.is_file()]}
+
+@router.get("/profiles/{artifact_id}", dependencies=[Depends(require_admin)])
+async def get_profile(artifact_id: str):
+    path = resolve_artifact(artifact_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
+
+class ReindexRequest(BaseModel):
+    # Rebuild from source files (chunking change); omit to re-embed the live collection.
+    # Uploads and deletes wait until a rebuild from files has swapped the alias.
+    directory: Optional[str] = None
+
+@router.post("/reindex", status_code=202, dependencies=[Depends(require_admin)])
+async def start_reindex(background_tasks: BackgroundTasks, request: Optional[ReindexRequest] = None):
+    """
+    Build the next collection version in the background and swap the alias when done.
+    Poll GET /admin/reindex for progress.
+    """
+    from app.services.reindex import ReindexService, reindex_status
+
+    if reindex_status.state == "running":
+        raise HTTPException(status_code=409, detail="A reindex is already running")
+    directory = Path(request.directory) if request and request.directory else None
+    if directory is not None and not directory.is_dir():
+        raise HTTPException(status_code=400, detail=f"Not a directory: {directory}")
+
+    async def run():
+        try:
+            await asyncio.to_thread(ReindexService().run, directory)
+        except Exception as e:
+            logger.error(f"Background reindex failed: {e}")
+
+    background_tasks.add_task(run)
+    return {"status": "accepted", "mode": "directory" if directory else "collection"}
+
+@router.get("/reindex", dependencies=[Depends(require_admin)])
+async def get_reindex_status():
+    from app.services.reindex import reindex_status
+    return reindex_status.to_dict()
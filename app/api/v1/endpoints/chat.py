@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.core.deadline import Deadline, DeadlineExceeded, start_deadline
 from app.schemas.chat import ChatRequest, ChatResponse, SourceSnippet
 from app.services.rag import RAGService
+from app.services.llm.resilient import LLMDeadlineExceeded, LLMUnavailableError
+from app.services.session import session_store
+import json
 import logging
 
 router = APIRouter()
@@ -10,7 +16,21 @@ logger = logging.getLogger(__name__)
 def get_rag_service():
     return RAGService()
 
-@router.post("/", response_model=ChatResponse)
+async def request_deadline(x_request_timeout: Optional[float] = Header(None, gt=0)) -> Deadline:
+    # Async so the deadline is set in the endpoint's own context (sync dependencies run in a thread)
+    return start_deadline(x_request_timeout)
+
+def source_snippets(chunks) -> list:
+    return [
+        SourceSnippet(
+            text=chunk.text[:200] + "...", # Truncate for snippet
+            source=chunk.metadata.get("source", "Unknown"),
+            page=chunk.metadata.get("page", 0)
+        )
+        for chunk in chunks
+    ]
+
+@router.post("/", response_model=ChatResponse, dependencies=[Depends(request_deadline)])
 async def chat(
     request: ChatRequest,
     service: RAGService = Depends(get_rag_service)
@@ -18,30 +38,96 @@ async def chat(
     try:
         logger.info(f"📨 Chat request: '{request.query}'")
         logger.info(f"🔍 Filters received: {request.filters}")
-        result = service.generate_response(request.query, filters=request.filters)
+        session = session_store.get_or_create(request.session_id)
+        result = await service.agenerate_response(
+            request.query,
+            filters=request.filters,
+            session=session,
+            history=request.history,
+            priority=request.priority
+        )
         
         answer = result["answer"]
         chunks = result["sources"]
         
-        sources = []
-        for chunk in chunks:
-            sources.append(SourceSnippet(
-                text=chunk.text[:200] + "...", # Truncate for snippet
-                source=chunk.metadata.get("source", "Unknown"),
-                page=chunk.metadata.get("page", 0)
-            ))
-            
-        # Basic confidence logic
-        confidence = "High" if chunks else "Low"
+        sources = source_snippets(chunks)
+
+        # Confidence comes from retrieval scores; an "I don't know" answer is always Low
+        confidence = result.get("confidence") or ("High" if chunks else "Low")
         if "I don't know" in answer:
             confidence = "Low"
             
         return ChatResponse(
             answer=answer,
             sources=sources,
-            confidence=confidence
+            confidence=confidence,
+            session_id=session.id,
+            partial=result.get("partial", False)
         )
         
+    except (LLMDeadlineExceeded, DeadlineExceeded) as e:
+        logger.error(f"Chat timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMUnavailableError as e:
+        logger.error(f"Chat LLM unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/stream", dependencies=[Depends(request_deadline)])
+async def chat_stream(
+    request: ChatRequest,
+    service: RAGService = Depends(get_rag_service)
+):
+    """
+    Same as POST /chat/, streamed as newline-delimited JSON so clients can
+    render the answer as it is generated. The first line carries the
+    metadata, then one line per text piece, then a final "done" line:
+        {"type": "meta", "session_id": ..., "sources": [...], "confidence": ..., "partial": ...}
+        {"type": "token", "text": "..."}
+        {"type": "done"}
+    Failures before the first line are HTTP errors, as for POST /chat/.
+    Later ones end the stream with {"type": "error", "detail": ...}.
+    """
+    try:
+        logger.info(f"📨 Streaming chat request: '{request.query}'")
+        session = session_store.get_or_create(request.session_id)
+        result = await service.astream_response(
+            request.query,
+            filters=request.filters,
+            session=session,
+            history=request.history,
+            priority=request.priority
+        )
+    except DeadlineExceeded as e:
+        logger.error(f"Chat timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    meta = {
+        "type": "meta",
+        "session_id": session.id,
+        "sources": [s.model_dump() for s in source_snippets(result["sources"])],
+        "confidence": result["confidence"],
+        "partial": result.get("partial", False),
+    }
+
+    # A plain generator: Starlette iterates it in a worker thread, so the blocking LLM stream never stalls the event loop
+    def lines():
+        yield json.dumps(meta) + "\n"
+        answer = result["answer"]
+        try:
+            for piece in answer:
+                yield json.dumps({"type": "token", "text": piece}) + "\n"
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        finally:
+            answer.close()
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, BackgroundTasks
-from app.schemas.document import DocumentResponse
+from typing import List
+from app.schemas.document import DocumentResponse, IngestJobResponse
 from app.services.document.loader import DocumentLoader
 from app.services.document.chunker import DocumentChunker
 from app.services.retrieval import RetrievalService
+from app.services.ingestion import IngestionJob, IngestionPipeline, job_registry
+from app.api.v1.endpoints.admin import require_admin
 from app.core.config import settings
-import shutil
-import os
+from app.services.document.upload import MemoryBudget, UploadTooLargeError, expand_archive, is_archive, receive_upload
+from pathlib import Path
 import logging
 import asyncio
 
@@ -26,83 +29,138 @@ def get_chunker():
 async def ingest_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    replace: bool = False,
     loader: DocumentLoader = Depends(get_loader),
     retrieval: RetrievalService = Depends(get_retrieval_service)
 ):
+    if Path(file.filename or "").suffix.lower() not in DocumentLoader.SUPPORTED_SUFFIXES:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type: {file.filename}")
+
     try:
-        # 1. Save temp file synchronously (fast)
-        file_location = settings.UPLOAD_DIR / file.filename
-        file_location.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        logger.info(f"Saved file to {file_location}")
+        # 1. Copy the upload in chunks (hashing as we go) without blocking the event loop.
+        # Small files stay in memory; large ones are spooled to a unique temp path.
+        # The request body size is capped earlier, by RequestBodyLimitMiddleware.
+        upload = await receive_upload(file, file.filename)
+        logger.info(f"Received {file.filename} ({upload.size} bytes, sha256={upload.sha256[:12]}, in_memory={upload.data is not None})")
+
+        job = job_registry.create()
+        status = job.add_file(upload.filename, upload.sha256)
 
         # 2. Add heavy processing to background task
-        # We pass the FILE PATH as a string so it's serializable and safe
         background_tasks.add_task(
-            process_upload_background, 
-            file_path=str(file_location), 
-            filename=file.filename,
-            loader=loader, 
-            retrieval=retrieval
+            process_upload_background,
+            job=job,
+            uploads=[(status, upload)],
+            loader=loader,
+            retrieval=retrieval,
+            replace=replace
         )
-        
+
         return DocumentResponse(
             id=file.filename,
-            message=f"File {file.filename} received. Processing started in background (this may take a minute for large files)."
+            message=f"File {file.filename} received. Processing started in background (this may take a minute for large files).",
+            content_hash=upload.sha256,
+            size_bytes=upload.size,
+            job_id=job.id
         )
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Ingestion setup error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_upload_background(file_path: str, filename: str, loader: DocumentLoader, retrieval: RetrievalService):
+@router.post("/ingest/bulk", response_model=IngestJobResponse, status_code=202)
+async def ingest_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    replace: bool = False,
+    loader: DocumentLoader = Depends(get_loader),
+    retrieval: RetrievalService = Depends(get_retrieval_service)
+):
     """
-    Heavy lifting function run in background with ASYNC to prevent blocking.
+    Ingest many documents in one request: any mix of supported files and
+    zip/tar archives. Everything feeds a single pipeline; poll
+    GET /documents/jobs/{job_id} for per-file progress. With `replace=true`
+    each document's previously indexed chunks are removed first.
     """
+    job = job_registry.create()
+    uploads = []
+    # Files and archive members stay in memory only up to this total; the rest go to UPLOAD_DIR
+    budget = MemoryBudget(settings.UPLOAD_REQUEST_IN_MEMORY_MAX_BYTES)
     try:
-        logger.info(f"Background: Starting processing for {filename}...")
-        
-        # 2. Load Documents (Heavy cpu) -> Offload to thread
-        documents = await asyncio.to_thread(loader.load, file_path)
-        if not documents:
-            logger.error(f"Background: Could not extract text from {filename}")
-            return
-
-        # 3. Index Documents (Heavy cpu/network)
-        # We process in smaller batches to avoid OOM or Timeouts
-        texts = [doc.text for doc in documents]
-        metas = [doc.metadata for doc in documents]
-        
-        # Split into batches of 20
-        batch_size = 20
-        total_batches = (len(texts) + batch_size - 1) // batch_size
-        
-        logger.info(f"Background: Extracted {len(texts)} chunks. Processing in {total_batches} batches...")
-        
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_metas = metas[i:i + batch_size]
-            
-            # Offload indexing to thread to keep loop responsive
-            await asyncio.to_thread(retrieval.index_documents, batch_texts, batch_metas)
-            
-            # Tiny sleep to let other requests pass (heartbeats, etc.)
-            await asyncio.sleep(0.1)
-            
-            logger.info(f"Background: Processed batch {i//batch_size + 1}/{total_batches} for {filename}")
-        
-        logger.info(f"Background: Successfully finished processing {filename}")
-        
+        for file in files:
+            filename = file.filename or ""
+            if is_archive(filename):
+                archive = await receive_upload(file, filename, budget=budget)
+                try:
+                    members, skipped = await asyncio.to_thread(
+                        expand_archive, archive, DocumentLoader.SUPPORTED_SUFFIXES, budget=budget
+                    )
+                except Exception as e:
+                    job.skip_file(filename, f"could not read archive: {e}")
+                    continue
+                finally:
+                    if archive.data is not None:
+                        budget.give_back(archive.size)
+                    archive.cleanup()
+                for member in members:
+                    uploads.append((job.add_file(member.filename, member.sha256), member))
+                for name, reason in skipped:
+                    job.skip_file(f"{filename}/{name}", reason)
+            elif Path(filename).suffix.lower() in DocumentLoader.SUPPORTED_SUFFIXES:
+                upload = await receive_upload(file, filename, budget=budget)
+                uploads.append((job.add_file(filename, upload.sha256), upload))
+            else:
+                job.skip_file(filename, "unsupported file type")
+    except UploadTooLargeError as e:
+        for _, upload in uploads:
+            upload.cleanup()
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error(f"Background processing failed for {filename}: {e}")
-    finally:
-        # Cleanup
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.warning(f"Could not delete temp file {file_path}: {e}")
+        for _, upload in uploads:
+            upload.cleanup()
+        logger.error(f"Bulk ingestion setup error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not uploads:
+        raise HTTPException(status_code=415, detail="No supported documents in the upload")
+
+    logger.info(f"Bulk ingest job {job.id}: {len(uploads)} documents queued")
+    background_tasks.add_task(
+        process_upload_background, job=job, uploads=uploads, loader=loader, retrieval=retrieval, replace=replace
+    )
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
+@router.delete("/sources/{source:path}", dependencies=[Depends(require_admin)])
+async def delete_source(source: str, retrieval: RetrievalService = Depends(get_retrieval_service)):
+    """
+    Remove every chunk of a document (by its `source` name) from the live index.
+    """
+    try:
+        points = await asyncio.to_thread(retrieval.delete_source, source)
+    except Exception as e:
+        logger.error(f"Delete source error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not points:
+        raise HTTPException(status_code=404, detail=f"No indexed chunks for source: {source}")
+    return {"source": source, "points": points}
+
+async def process_upload_background(job: IngestionJob, uploads: List, loader: DocumentLoader, retrieval: RetrievalService,
+                                    replace: bool = False):
+    """
+    Heavy lifting function run in background with ASYNC to prevent blocking.
+    Loading, chunking, embedding and upserting all run in worker threads.
+    """
+    logger.info(f"Background: Starting job {job.id} ({len(uploads)} files)...")
+    try:
+        await IngestionPipeline(loader, retrieval, replace=replace).run(job, uploads)
+    except Exception as e:
+        logger.error(f"Background processing failed for job {job.id}: {e}")
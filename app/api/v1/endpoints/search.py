@@ -1,7 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.api.v1.endpoints.chat import get_rag_service, request_deadline
+from app.core.config import settings
+from app.schemas.chat import PrefetchRequest, PrefetchResponse
+from app.services.rag import RAGService
+from app.services.session import session_store
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/vector/{query}")
 async def search_vector(query: str):
     return {"results": [{"id": "1", "score": 0.9}]}
+
+@router.post("/prefetch", response_model=PrefetchResponse, dependencies=[Depends(request_deadline)])
+async def prefetch(
+    request: PrefetchRequest,
+    service: RAGService = Depends(get_rag_service)
+):
+    """
+    Retrieve for a question while it is still being typed. The candidates are
+    kept on the session for SEARCH_PREFETCH_TTL_SECONDS; POST /chat/ with the
+    same session_id uses them if the submitted query is close enough, leaving
+    only the LLM call on the critical path. Best-effort: failures are logged
+    and reported as zero candidates.
+    """
+    session = session_store.get_or_create(request.session_id)
+    if len(request.query.strip()) < settings.SEARCH_PREFETCH_MIN_CHARS:
+        return PrefetchResponse(session_id=session.id)
+    try:
+        candidates = await service.prefetch(
+            request.query,
+            session=session,
+            filters=request.filters,
+            history=request.history
+        )
+    except Exception as e:
+        logger.warning(f"Prefetch failed: {e}")
+        candidates = 0
+    return PrefetchResponse(session_id=session.id, candidates=candidates)
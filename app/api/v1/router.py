@@ -1,8 +1,9 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import documents, chat, search
+from app.api.v1.endpoints import documents, chat, search, admin
 
 api_router = APIRouter()
 
 api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -0,0 +1,347 @@
+"""
+Offline maintenance commands that bypass the HTTP API.
+
+    python -m app.cli index ./corpus [--workers 4] [--batch-size 256] [--restart]
+    python -m app.cli reindex [--from-dir ./corpus]
+    python -m app.cli delete-source handbook.pdf
+
+`index` walks a directory tree, extracts and chunks files in a process pool,
+embeds chunks in large batches and bulk-upserts them into the configured
+collection. Progress is checkpointed to a JSON file after every upsert, so
+an interrupted run picks up where it stopped when started again. Point ids
+are derived from chunk text, so re-upserting a partially indexed file is
+harmless.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = ".rag-index-checkpoint.json"
+
+
+def extract_file(path: str, source: str) -> List[Tuple[str, dict]]:
+    """
+    Load and chunk one file. Runs in a worker process, so it returns plain
+    (text, metadata) tuples instead of pydantic models.
+    """
+    from app.services.document.loader import DocumentLoader
+    from app.services.document.chunker import DocumentChunker
+
+    chunker = DocumentChunker()
+    # Chunk as the loader streams so only the (smaller) result list is held whole
+    return [
+        (chunk.text, chunk.metadata)
+        for document in DocumentLoader().iter_load(path, source_name=source)
+        for chunk in chunker.chunk_documents([document])
+    ]
+
+
+def _fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class Checkpoint:
+    """
+    Files fully indexed so far, keyed by path relative to the indexed root.
+    A file whose size or mtime changed since it was recorded is indexed again.
+    """
+
+    def __init__(self, path: Path, collection: str):
+        self.path = path
+        self.collection = collection
+        self.done: Dict[str, dict] = {}
+        self.failed: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path, collection: str) -> "Checkpoint":
+        checkpoint = cls(path, collection)
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("collection") == collection:
+                checkpoint.done = data.get("done", {})
+            else:
+                logger.warning(f"Checkpoint {path} is for collection {data.get('collection')!r}; starting over")
+        return checkpoint
+
+    def is_done(self, rel: str, fingerprint: str) -> bool:
+        entry = self.done.get(rel)
+        return entry is not None and entry.get("fingerprint") == fingerprint
+
+    def mark_done(self, rel: str, fingerprint: str, chunks: int):
+        self.done[rel] = {"fingerprint": fingerprint, "chunks": chunks}
+        self.failed.pop(rel, None)
+
+    def mark_failed(self, rel: str, error: str):
+        self.failed[rel] = error
+
+    def save(self):
+        # Write-then-rename so a crash mid-write never leaves a corrupt checkpoint
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "collection": self.collection,
+            "updated_at": time.time(),
+            "done": self.done,
+            "failed": self.failed,
+        }, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    def __init__(self, total_files: int, stream=None, interval: float = 1.0):
+        self.total_files = total_files
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.files_done = 0
+        self.files_failed = 0
+        self.chunks = 0
+        self._last_print = 0.0
+
+    def update(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last_print < self.interval:
+            return
+        self._last_print = now
+        elapsed = max(now - self.start, 1e-9)
+        self.stream.write(
+            f"\r[index] files {self.files_done + self.files_failed}/{self.total_files}"
+            f"  chunks {self.chunks}  {self.chunks / elapsed:.1f} chunks/s"
+            f"  {self.files_done / elapsed:.2f} files/s"
+        )
+        self.stream.flush()
+
+
+def discover_files(root: Path, suffixes) -> List[Path]:
+    return sorted(
+        p for p in root.rglob("*")
+        if p.is_file() and p.suffix.lower() in suffixes and not p.name.startswith(".")
+    )
+
+
+def index_directory(
+    root: Path,
+    retrieval=None,
+    workers: int = 0,
+    batch_size: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    restart: bool = False,
+    progress_stream=None,
+) -> dict:
+    """
+    Index every supported file under `root`. With `workers` > 0 extraction runs
+    in that many processes; 0 extracts in-process. Returns a summary dict.
+    """
+    from app.core.config import settings
+    from app.services.document.loader import DocumentLoader
+    from app.services.retrieval import RetrievalService
+    from app.schemas.document import Document
+
+    root = root.resolve()
+    batch_size = batch_size or settings.INGEST_EMBED_BATCH_SIZE
+    checkpoint_path = checkpoint_path or root / CHECKPOINT_NAME
+    checkpoint = Checkpoint(checkpoint_path, settings.VECTOR_COLLECTION_NAME)
+    if not restart:
+        checkpoint = Checkpoint.load(checkpoint_path, settings.VECTOR_COLLECTION_NAME)
+
+    files = discover_files(root, DocumentLoader.SUPPORTED_SUFFIXES)
+    todo = []
+    for path in files:
+        rel = path.relative_to(root).as_posix()
+        fingerprint = _fingerprint(path)
+        if not checkpoint.is_done(rel, fingerprint):
+            todo.append((rel, path, fingerprint))
+    resumed = len(files) - len(todo)
+    if resumed:
+        logger.info(f"Resuming: {resumed} of {len(files)} files already indexed")
+
+    retrieval = retrieval or RetrievalService()
+    progress = Progress(len(todo), stream=progress_stream)
+
+    # Chunks waiting for the next embed batch, and how many chunks of each file are still unwritten
+    pending: List[Tuple[str, Document]] = []
+    outstanding: Dict[str, int] = {}
+    fingerprints = {rel: fp for rel, _, fp in todo}
+    totals: Dict[str, int] = {}
+
+    def flush():
+        nonlocal pending
+        if not pending:
+            return
+        retrieval.index_chunks([doc for _, doc in pending])
+        progress.chunks += len(pending)
+        for rel, _ in pending:
+            outstanding[rel] -= 1
+            if outstanding[rel] == 0:
+                del outstanding[rel]
+                checkpoint.mark_done(rel, fingerprints[rel], totals[rel])
+                progress.files_done += 1
+        pending = []
+        checkpoint.save()
+        progress.update()
+
+    def accept(rel: str, chunks: List[Tuple[str, dict]]):
+        if not chunks:
+            checkpoint.mark_failed(rel, "no text could be extracted")
+            progress.files_failed += 1
+            return
+        totals[rel] = outstanding[rel] = len(chunks)
+        for text, metadata in chunks:
+            pending.append((rel, Document(text=text, metadata=metadata)))
+            if len(pending) >= batch_size:
+                flush()
+
+    def fail(rel: str, error: Exception):
+        logger.error(f"Failed to extract {rel}: {error}")
+        checkpoint.mark_failed(rel, str(error))
+        progress.files_failed += 1
+
+    interrupted = False
+    try:
+        if workers > 0:
+            import multiprocessing
+            # spawn: workers must not inherit the parent's Qdrant/ONNX handles
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                queue = iter(todo)
+                running = {}
+
+                def submit_next():
+                    for rel, path, _ in queue:
+                        running[pool.submit(extract_file, str(path), rel)] = rel
+                        return
+
+                # Bounded in-flight work keeps extracted-but-unembedded chunks off the heap
+                for _ in range(workers * 2):
+                    submit_next()
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        rel = running.pop(future)
+                        try:
+                            chunks = future.result()
+                        except Exception as e:
+                            fail(rel, e)
+                        else:
+                            accept(rel, chunks)
+                        submit_next()
+        else:
+            for rel, path, _ in todo:
+                try:
+                    chunks = extract_file(str(path), rel)
+                except Exception as e:
+                    fail(rel, e)
+                    continue
+                accept(rel, chunks)
+        flush()
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        checkpoint.save()
+        progress.update(force=True)
+        progress.stream.write("\n")
+
+    elapsed = time.perf_counter() - progress.start
+    return {
+        "root": str(root),
+        "collection": settings.VECTOR_COLLECTION_NAME,
+        "files_total": len(files),
+        "files_resumed": resumed,
+        "files_indexed": progress.files_done,
+        "files_failed": progress.files_failed,
+        "chunks_indexed": progress.chunks,
+        "elapsed_s": round(elapsed, 2),
+        "chunks_per_s": round(progress.chunks / elapsed, 2) if elapsed else 0.0,
+        "interrupted": interrupted,
+        "failed": dict(checkpoint.failed),
+        "checkpoint": str(checkpoint_path),
+    }
+
+
+def _print_summary(summary: dict):
+    print(f"Indexed {summary['files_indexed']} files ({summary['chunks_indexed']} chunks) "
+          f"into '{summary['collection']}' in {summary['elapsed_s']}s ({summary['chunks_per_s']} chunks/s)")
+    if summary["files_resumed"]:
+        print(f"Skipped {summary['files_resumed']} files already in the checkpoint")
+    for rel, error in summary["failed"].items():
+        print(f"FAILED {rel}: {error}")
+    if summary["interrupted"]:
+        print(f"Interrupted. Run the same command again to resume from {summary['checkpoint']}")
+
+
+def _reindex(parser, args) -> int:
+    from app.services.reindex import ReindexService
+
+    if args.from_dir is not None and not args.from_dir.is_dir():
+        parser.error(f"Not a directory: {args.from_dir}")
+    logging.getLogger("app.services.reindex").setLevel(logging.INFO)
+    status = ReindexService().run(directory=args.from_dir)
+    print(f"Reindexed {status.points} points into {status.target_collection} "
+          f"(was {status.source_collection}) in {status.finished_at - status.started_at:.1f}s")
+    if status.dropped:
+        print(f"Dropped old versions: {', '.join(status.dropped)}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="RAG backend maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Index a directory tree into the vector store.")
+    index.add_argument("directory", type=Path)
+    index.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="Extraction processes (0 = extract in this process).")
+    index.add_argument("--batch-size", type=int, default=None,
+                       help="Chunks per embed/upsert batch (default: INGEST_EMBED_BATCH_SIZE).")
+    index.add_argument("--checkpoint", type=Path, default=None,
+                       help=f"Checkpoint file (default: <directory>/{CHECKPOINT_NAME}).")
+    index.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+    index.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    reindex = commands.add_parser(
+        "reindex", help="Build a new collection version and swap the alias to it (zero downtime)."
+    )
+    reindex.add_argument("--from-dir", type=Path, default=None,
+                         help="Rebuild from source files instead of re-embedding the live collection.")
+
+    delete = commands.add_parser("delete-source", help="Remove a document's chunks from the index.")
+    delete.add_argument("source", help="The document's source name, as stored in the payload.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.command == "reindex":
+        return _reindex(parser, args)
+    if args.command == "delete-source":
+        from app.services.retrieval import RetrievalService
+        points = RetrievalService().delete_source(args.source)
+        print(f"Removed {args.source} ({points} points)")
+        return 0 if points else 1
+
+    if not args.directory.is_dir():
+        parser.error(f"Not a directory: {args.directory}")
+
+    summary = index_directory(
+        args.directory,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    )
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        _print_summary(summary)
+    if summary["interrupted"]:
+        return 130
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,14 +23,62 @@ class Settings(BaseSettings):
     # Paths
     BASE_DIR: Path = Path(__file__).resolve().parent.parent.parent
     UPLOAD_DIR: Path = BASE_DIR / "uploads"
+    # Per file. RequestBodyLimitMiddleware also caps the request body at this
+    # (plus multipart overhead), so an oversized upload is refused before it is spooled
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    # Uploads up to this size are parsed straight from memory and never written to disk
+    UPLOAD_IN_MEMORY_MAX_BYTES: int = 8 * 1024 * 1024
+    # ...and all files of one bulk request (archive members included) up to this total
+    UPLOAD_REQUEST_IN_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    # Bulk ingestion. MAX_BULK_UPLOAD_BYTES caps the whole /ingest/bulk request body
+    MAX_BULK_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+    MAX_ARCHIVE_EXTRACT_BYTES: int = 2 * 1024 * 1024 * 1024
+    MAX_ARCHIVE_FILES: int = 10000
+    INGEST_EMBED_BATCH_SIZE: int = 256
+    INGEST_MAX_JOBS: int = 500
+    # Local embedding model cache, populated ahead of time by download_model.py
+    EMBEDDING_CACHE_DIR: Path = BASE_DIR / "models"
 
     # LLM (Required)
     OPENAI_API_KEY: Optional[str] = None
     GROQ_API_KEY: str # Required for Groq
     
     LLM_MODEL: str = "llama-3.3-70b-versatile"
+    # Override to point at a Groq-compatible server (e.g. benchmarks/fake_groq.py)
+    GROQ_BASE_URL: Optional[str] = None
+    # Generation resilience: overall deadline per answer, per-attempt timeout, retries
+    LLM_DEADLINE_SECONDS: float = 30.0
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = 15.0
+    LLM_MAX_ATTEMPTS: int = 3
+    # Send a duplicate request once the primary has produced no output by this
+    # percentile of recent times to first token (None disables hedging);
+    # LLM_HEDGE_DELAY_SECONDS is used until LLM_HEDGE_MIN_SAMPLES calls have been observed.
+    LLM_HEDGE_PERCENTILE: Optional[float] = 95.0
+    LLM_HEDGE_DELAY_SECONDS: float = 3.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    # Threads for hedged duplicates (attempts themselves run on the caller's thread)
+    LLM_HEDGE_MAX_WORKERS: int = 16
+    # Route to the fallback model after this many consecutive retryable errors,
+    # for LLM_FAILOVER_COOLDOWN_SECONDS before trying the primary again
+    LLM_FALLBACK_MODEL: Optional[str] = "llama-3.1-8b-instant"
+    LLM_FAILOVER_ERRORS: int = 3
+    LLM_FAILOVER_COOLDOWN_SECONDS: float = 60.0
+    # Client-side rate limits per model until the API's x-ratelimit-* headers say otherwise
+    LLM_RATE_LIMIT_RPM: int = 30
+    LLM_RATE_LIMIT_TPM: int = 12000
+    # Tokens reserved for the completion on top of the prompt estimate
+    LLM_COMPLETION_TOKENS_ESTIMATE: int = 512
     # Default to Groq model
     EMBEDDING_MODEL: str = "nomic-embed-text-v1.5"
+    EMBEDDING_BATCH_SIZE: int = 64
+    # Intra-op threads for the query-path model (None = onnxruntime default)
+    EMBEDDING_QUERY_THREADS: Optional[int] = None
+    # Ingestion embedding pool: >1 shards bulk embedding across worker processes
+    EMBEDDING_INGEST_WORKERS: int = 0
+    EMBEDDING_INGEST_THREADS_PER_WORKER: int = 1
+    # Unix socket of a shared embedding sidecar (python -m app.services.vector.embedding_server)
+    EMBEDDING_SERVER_SOCKET: Optional[str] = None
 
 
 
@@ -38,8 +86,80 @@ class Settings(BaseSettings):
     # Allows HTTP URL or local path string
     VECTOR_DB_URL: Union[str, AnyHttpUrl] = "http://localhost:6333" 
     VECTOR_DB_API_KEY: Optional[str] = None
+    # Async client used by chat search and ingestion upserts (server Qdrant only):
+    # gRPC sends vectors as packed floats instead of JSON; the pool is channels (or
+    # HTTP connections without gRPC) shared by all requests in a worker
+    VECTOR_DB_PREFER_GRPC: bool = True
+    VECTOR_DB_GRPC_PORT: int = 6334
+    VECTOR_DB_POOL_SIZE: int = 4
 
+    # Alias over versioned collections (<name>_v1, <name>_v2, ...) swapped by reindexing
     VECTOR_COLLECTION_NAME: str = "documents"
+    # Old collection versions kept after a reindex swap (for rollback)
+    REINDEX_KEEP_PREVIOUS_VERSIONS: int = 0
+    REINDEX_EXTRACT_WORKERS: int = 2
+    # Two-stage search for Matryoshka embedders: candidates come from the first N
+    # components, then VECTOR_MATRYOSHKA_OVERSAMPLING x limit of them are rescored at
+    # full dimension. Applies to newly created collections; reindex to switch.
+    VECTOR_MATRYOSHKA_DIM: Optional[int] = None
+    VECTOR_MATRYOSHKA_OVERSAMPLING: float = 4.0
+
+    # Chunk text is kept out of Qdrant payloads, zlib-compressed in SQLite keyed by point id
+    # (one file per collection alias). Local-path Qdrant keeps it in its storage dir.
+    # Unset: on for local-path Qdrant, off for server Qdrant, whose text then stays in the
+    # payload. Enabling it with server Qdrant needs DOCSTORE_DIR on persistent storage that
+    # every API host and the ingest CLI share; otherwise searches return empty chunks.
+    DOCSTORE_ENABLED: Optional[bool] = None
+    DOCSTORE_DIR: Path = BASE_DIR / "docstore"
+
+    # Near-duplicate chunk suppression at ingest (MinHash/LSH)
+    DEDUP_ENABLED: bool = True
+    # Estimated Jaccard similarity of word shingles at which a chunk counts as a duplicate
+    DEDUP_THRESHOLD: float = 0.85
+    # Where the index lives for server Qdrant (local-path Qdrant keeps it in its storage dir).
+    # It is an SQLite file shared by the worker processes and the ingest CLI of one host only:
+    # other hosts keep their own, so they miss each other's duplicates and can race on merging
+    # references. Ingest from a single host, or set DEDUP_ENABLED=false. On a disk that does
+    # not persist, a restart only costs missed duplicates.
+    DEDUP_INDEX_DIR: Path = BASE_DIR / "dedup"
+
+    # Relevance gating: candidates fetched per query, absolute cosine floor, and the
+    # share of the top score a chunk must reach to be kept (adaptive k)
+    RETRIEVAL_MAX_K: int = 8
+    RETRIEVAL_MIN_SCORE: float = 0.5
+    RETRIEVAL_RELATIVE_SCORE: float = 0.8
+    # Top score at or above this reports "High" confidence
+    RETRIEVAL_HIGH_CONFIDENCE_SCORE: float = 0.75
+
+    # Conversation sessions (multi-turn chat)
+    SESSION_MAX_SESSIONS: int = 1000
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_TURNS: int = 10
+    # Follow-ups whose query vector is at least this similar to the previous one reuse its chunks
+    SESSION_REUSE_SIMILARITY: float = 0.9
+
+    # Speculative retrieval while the user types (POST /search/prefetch): candidates are
+    # parked on the session for a short while and used if the submitted query is this similar
+    SEARCH_PREFETCH_TTL_SECONDS: float = 30.0
+    SEARCH_PREFETCH_SIMILARITY: float = 0.9
+    # Shorter partial queries are too vague to be worth a search
+    SEARCH_PREFETCH_MIN_CHARS: int = 8
+
+    # End-to-end chat deadline: the X-Request-Timeout header (seconds, capped) or the default
+    REQUEST_DEADLINE_SECONDS: float = 30.0
+    REQUEST_DEADLINE_MAX_SECONDS: float = 120.0
+    # With less budget than this left, retrieval keeps only REQUEST_DEADLINE_REDUCED_K chunks
+    # (a shorter prompt generates faster)
+    REQUEST_DEADLINE_REDUCED_K_SECONDS: float = 10.0
+    REQUEST_DEADLINE_REDUCED_K: int = 3
+    # With less budget than this left after retrieval, skip the LLM and return the sources only
+    REQUEST_DEADLINE_MIN_GENERATION_SECONDS: float = 2.0
+
+    # Admin / Profiling (both disabled unless explicitly configured)
+    ADMIN_TOKEN: Optional[str] = None
+    PROFILING_ENABLED: bool = False
+    MEMORY_TRACE_ENABLED: bool = False
+    PROFILE_DIR: Path = BASE_DIR / "profiles"
 
     @computed_field
     @property
@@ -0,0 +1,103 @@
+"""
+End-to-end request deadlines for the chat path.
+
+A request's time budget comes from its X-Request-Timeout header (seconds) or
+REQUEST_DEADLINE_SECONDS. It is held in a context variable, so every stage
+can read it without it being passed around. This includes code run through
+asyncio.to_thread and Starlette's thread pool, which both copy the context.
+
+Stages use the remaining budget in two ways. They bound their own waits
+(`bounded` for awaitables; the LLM service shortens its deadline). They
+also degrade when the budget runs low: the chat path fetches fewer chunks
+and, near the end, returns retrieval-only results. `stage` logs and counts
+every stage that is still running when the deadline passes.
+
+Outside a request no deadline is set, and every stage runs unbounded as before.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    A required stage could not finish within the request deadline.
+    """
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget_s = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(seconds: Optional[float] = None) -> Deadline:
+    """
+    Start the current request's deadline. Client-supplied budgets are capped
+    at REQUEST_DEADLINE_MAX_SECONDS.
+    """
+    budget = settings.REQUEST_DEADLINE_SECONDS if seconds is None else min(seconds, settings.REQUEST_DEADLINE_MAX_SECONDS)
+    deadline = Deadline(budget)
+    _current.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Log a stage that is still running when the request deadline passes.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        yield
+        return
+    start = time.monotonic()
+    left = deadline.remaining()
+    try:
+        yield
+    finally:
+        if left > 0 and deadline.expired():
+            logger.warning(
+                f"Stage '{name}' overran the request deadline: ran {time.monotonic() - start:.2f}s "
+                f"with {left:.2f}s of the {deadline.budget_s:.1f}s budget left"
+            )
+            metrics.DEADLINE_OVERRUNS_TOTAL.labels(stage=name).inc()
+
+
+async def bounded(name: str, awaitable: Awaitable[T]) -> T:
+    """
+    Await a required stage, giving up when the request deadline passes.
+    Raises DeadlineExceeded then. Work running in a thread is abandoned,
+    not stopped.
+    """
+    deadline = current_deadline()
+    with stage(name):
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{name} did not finish within the {deadline.budget_s:.1f}s request deadline")
@@ -0,0 +1,106 @@
+"""
+Prometheus instrumentation for the chat and ingestion paths.
+
+All label values come from the fixed sets below (or from configured model
+names), so series cardinality stays bounded no matter what users send.
+Hot paths should use the pre-bound children (e.g. EMBED_QUERY_SECONDS)
+rather than calling `.labels()` per request.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Tuned for a range from sub-millisecond vector search to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+RAG_STAGES = ("embed_query", "vector_search", "format_context")
+INGEST_STAGES = ("load", "chunk", "embed", "upsert")
+TOKEN_KINDS = ("prompt", "completion")
+CACHE_RESULTS = ("hit", "miss")
+DEADLINE_STAGES = ("embed_query", "vector_search", "generation")
+DEADLINE_DEGRADATIONS = ("reduced_k", "retrieval_only")
+
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of the chat retrieval path.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "rag_llm_time_to_first_token_seconds",
+    "Time from sending the LLM request to receiving the first content token.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOTAL_SECONDS = Histogram(
+    "rag_llm_duration_seconds",
+    "Total wall-clock time of an LLM generation call.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "rag_llm_queue_wait_seconds",
+    "Time an LLM request waited for rate-limit budget before being sent.",
+    ["model", "priority"],
+    buckets=LATENCY_BUCKETS,
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_duration_seconds",
+    "Time spent in each ingestion stage, per call.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+INGEST_CHUNKS_TOTAL = Counter("rag_ingest_chunks_total", "Chunks produced by the chunker during ingestion.")
+INGEST_POINTS_TOTAL = Counter("rag_ingest_points_total", "Points upserted into the vector store.")
+INGEST_DUPLICATES_TOTAL = Counter("rag_ingest_duplicates_total", "Chunks folded into an existing near-duplicate point instead of being embedded.")
+LLM_TOKENS_TOTAL = Counter("rag_llm_tokens_total", "Tokens reported by the LLM provider.", ["model", "kind"])
+CACHE_LOOKUPS_TOTAL = Counter("rag_cache_lookups_total", "Cache lookups by cache name and result.", ["cache", "result"])
+EARLY_EXIT_TOTAL = Counter("rag_early_exit_total", "Queries answered without an LLM call because no chunk cleared the relevance threshold.")
+LLM_RETRIES_TOTAL = Counter("rag_llm_retries_total", "LLM retry attempts after a retryable error, by the model retried against.", ["model"])
+LLM_HEDGES_TOTAL = Counter("rag_llm_hedged_requests_total", "Duplicate LLM requests sent because the first was slow.", ["model"])
+LLM_HEDGE_WINS_TOTAL = Counter("rag_llm_hedge_wins_total", "Hedged LLM requests that answered before the original.", ["model"])
+LLM_QUEUE_DEPTH = Gauge("rag_llm_queue_depth", "LLM requests waiting for rate-limit budget.", ["model", "priority"])
+LLM_FAILOVERS_TOTAL = Counter("rag_llm_failovers_total", "Times the primary model was taken out of rotation after sustained errors.", ["model"])
+DEADLINE_OVERRUNS_TOTAL = Counter("rag_deadline_overruns_total", "Chat stages still running when the request deadline passed.", ["stage"])
+DEADLINE_DEGRADED_TOTAL = Counter("rag_deadline_degraded_total", "Chat requests degraded to stay within their deadline, by degradation.", ["mode"])
+
+# Pre-bound children for the hot path
+EMBED_QUERY_SECONDS = RAG_STAGE_SECONDS.labels(stage="embed_query")
+VECTOR_SEARCH_SECONDS = RAG_STAGE_SECONDS.labels(stage="vector_search")
+FORMAT_CONTEXT_SECONDS = RAG_STAGE_SECONDS.labels(stage="format_context")
+INGEST_LOAD_SECONDS = INGEST_STAGE_SECONDS.labels(stage="load")
+INGEST_CHUNK_SECONDS = INGEST_STAGE_SECONDS.labels(stage="chunk")
+INGEST_EMBED_SECONDS = INGEST_STAGE_SECONDS.labels(stage="embed")
+INGEST_UPSERT_SECONDS = INGEST_STAGE_SECONDS.labels(stage="upsert")
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS_TOTAL.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int):
+    if prompt_tokens:
+        LLM_TOKENS_TOTAL.labels(model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS_TOTAL.labels(model=model, kind="completion").inc(completion_tokens)
+
+
+@contextmanager
+def timed(histogram):
+    """
+    Observe the duration of the wrapped block on an (already labelled) histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def render_latest() -> tuple:
+    """
+    Returns (body, content_type) for the /metrics endpoint.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
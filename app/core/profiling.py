@@ -0,0 +1,231 @@
+"""
+On-demand request profiling and ingestion memory tracing.
+
+Both features are off by default. When PROFILING_ENABLED is false the
+middleware is never installed, and when MEMORY_TRACE_ENABLED is false
+`get_memory_tracer` hands out a no-op tracer, so the disabled cost is a
+single attribute lookup per call site.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_ARTIFACT_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+def profile_dir() -> Path:
+    settings.PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    return settings.PROFILE_DIR
+
+
+def resolve_artifact(name: str) -> Optional[Path]:
+    """
+    Map an artifact name from a URL to a file inside PROFILE_DIR, rejecting traversal.
+    """
+    if not _ARTIFACT_NAME.match(name):
+        return None
+    path = settings.PROFILE_DIR / name
+    return path if path.is_file() else None
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware that profiles a single request when it carries
+    `X-Profile: 1` and a valid `X-Admin-Token`.
+
+    Uses pyinstrument (sampling, async-aware, HTML flamegraph; listed in
+    requirements.txt). cProfile (.pstats) is only a fallback for
+    environments without it: it is deterministic, slows the profiled request
+    several-fold, and on the event-loop thread also records every other
+    request handled meanwhile. The artifact name is returned in the
+    `X-Profile-Id` response header and can be downloaded from
+    `/api/v1/admin/profiles/{id}`.
+
+    Profilers hook the whole interpreter, so one request is profiled at a
+    time. A request asking for a profile while another is being profiled is
+    served unprofiled (no `X-Profile-Id`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true") or not is_admin_token(
+            headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+        ):
+            return await self.app(scope, receive, send)
+
+        if not _profile_lock.acquire(blocking=False):
+            logger.info(f"Profile already running; serving {scope.get('method')} {scope.get('path')} unprofiled")
+            return await self.app(scope, receive, send)
+        try:
+            await self._profiled(scope, receive, send)
+        finally:
+            _profile_lock.release()
+
+    async def _profiled(self, scope, receive, send):
+        profiler = _start_profiler()
+        artifact = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{profiler.suffix}"
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(PROFILE_ID_HEADER, artifact.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            path = profiler.stop_and_save(profile_dir() / artifact)
+            logger.info(f"Profiled {scope.get('method')} {scope.get('path')} -> {path}")
+
+
+class _PyInstrumentProfiler:
+    suffix = ".html"
+
+    def __init__(self, profiler_cls):
+        self.profiler = profiler_cls(async_mode="enabled")
+        self.profiler.start()
+
+    def stop_and_save(self, path: Path) -> Path:
+        self.profiler.stop()
+        path.write_text(self.profiler.output_html(), encoding="utf-8")
+        return path
+
+
+class _CProfileProfiler:
+    suffix = ".pstats"
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_and_save(self, path: Path) -> Path:
+        self.profiler.disable()
+        self.profiler.dump_stats(str(path))
+        return path
+
+
+# Held while a request is being profiled
+_profile_lock = threading.Lock()
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("pyinstrument is not installed; falling back to cProfile (deterministic, much slower)")
+        return _CProfileProfiler()
+    return _PyInstrumentProfiler(Profiler)
+
+
+class NullMemoryTracer:
+    """
+    Stand-in used when memory tracing is disabled; every method is a no-op.
+    """
+    enabled = False
+
+    def mark(self, stage: str, **info):
+        pass
+
+    def finish(self) -> Optional[Path]:
+        return None
+
+
+class IngestMemoryTracer:
+    """
+    Records tracemalloc usage at ingestion stage boundaries.
+
+    Each `mark()` stores current traced memory, the peak since the previous
+    mark and the top allocation sites that grew in between. `finish()` writes
+    the report to PROFILE_DIR as JSON. tracemalloc is process-global, so
+    numbers are approximate when several uploads are traced at once.
+    """
+    enabled = True
+
+    _lock = threading.Lock()
+    _active = 0
+
+    def __init__(self, name: str, top_n: int = 5):
+        self.name = name
+        self.top_n = top_n
+        self.stages = []
+        with IngestMemoryTracer._lock:
+            if IngestMemoryTracer._active == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            IngestMemoryTracer._active += 1
+        tracemalloc.reset_peak()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._started = time.perf_counter()
+
+    def mark(self, stage: str, **info):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        growth = snapshot.compare_to(self._snapshot, "lineno")[: self.top_n]
+        entry = {
+            "stage": stage,
+            "elapsed_s": round(time.perf_counter() - self._started, 4),
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top_growth": [
+                {"site": str(stat.traceback[0]), "size_diff_bytes": stat.size_diff}
+                for stat in growth if stat.size_diff > 0
+            ],
+            **info,
+        }
+        pages = info.get("pages")
+        if pages:
+            entry["peak_bytes_per_page"] = peak // pages
+        self.stages.append(entry)
+        self._snapshot = snapshot
+        tracemalloc.reset_peak()
+
+    def finish(self) -> Optional[Path]:
+        with IngestMemoryTracer._lock:
+            IngestMemoryTracer._active -= 1
+            if IngestMemoryTracer._active == 0:
+                tracemalloc.stop()
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", self.name)[:80]
+        path = profile_dir() / f"memory-{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "stages": self.stages}, f, indent=2)
+
+        peak = max((s["peak_bytes"] for s in self.stages), default=0)
+        logger.info(f"Memory trace for {self.name}: peak {peak / 1e6:.1f} MB over {len(self.stages)} stages -> {path}")
+        return path
+
+
+_NULL_TRACER = NullMemoryTracer()
+
+
+def get_memory_tracer(name: str):
+    if not settings.MEMORY_TRACE_ENABLED:
+        return _NULL_TRACER
+    return IngestMemoryTracer(name)
@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessState:
+    """
+    Tracks background warm-up so the server can answer /health immediately
+    while the embedding model and vector store are still being prepared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "starting"  # starting -> ready | degraded
+        self.errors: Dict[str, str] = {}
+        self.started_at = time.time()
+        self.ready_at = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def finish(self, errors: Dict[str, str]):
+        with self._lock:
+            self.errors = errors
+            self.status = "degraded" if errors else "ready"
+            self.ready_at = time.time()
+
+    def to_dict(self) -> dict:
+        out = {"status": self.status, "errors": self.errors}
+        if self.ready_at:
+            out["warmup_seconds"] = round(self.ready_at - self.started_at, 3)
+        return out
+
+
+readiness = ReadinessState()
+
+
+def start_warmup(steps: List[Tuple[str, Callable[[], None]]]) -> threading.Thread:
+    """
+    Run named warm-up steps in a daemon thread and record the outcome on `readiness`.
+    A failing step is logged and reported but does not stop the remaining steps.
+    """
+    def run():
+        errors = {}
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                logger.info(f"Warm-up: {name} done in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.warning(f"Warm-up: {name} failed: {e}")
+                errors[name] = str(e)
+        readiness.finish(errors)
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,79 @@
+"""
+Request body size limits for the upload endpoints.
+
+Starlette parses a multipart body, spooling every file part to a temporary
+file, before the endpoint runs, so a per-file check in the handler only
+fires once the whole body has been received. This middleware caps the body
+itself: a declared `Content-Length` over the limit is refused before any of
+it is read, and a chunked body is cut off as soon as it passes the limit.
+"""
+import logging
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Room for the multipart boundaries and part headers around a single file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def upload_body_limits() -> Dict[str, int]:
+    """
+    Body limit per upload path, from the current settings.
+    """
+    prefix = f"{settings.API_V1_STR}/documents"
+    return {
+        f"{prefix}/ingest": settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        f"{prefix}/ingest/bulk": settings.MAX_BULK_UPLOAD_BYTES,
+    }
+
+
+def _too_large(limit: int) -> str:
+    return f"Request body exceeds the {limit} byte limit"
+
+
+class RequestBodyLimitMiddleware:
+    """
+    ASGI middleware that answers 413 for a request body over the limit of its path.
+
+    `limits` maps exact paths to byte limits; by default the upload paths
+    from `upload_body_limits`. Other paths pass through untouched.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limits = self.limits if self.limits is not None else upload_body_limits()
+        limit = limits.get(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            logger.warning(f"Refused {scope['path']} upload of {int(declared)} bytes (limit {limit})")
+            response = JSONResponse(status_code=413, content={"detail": _too_large(limit)})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    logger.warning(f"Cut off {scope['path']} upload after {received} bytes (limit {limit})")
+                    # Raised inside the body parser, so FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=_too_large(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,29 +1,43 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.core import metrics
+from app.core.profiling import RequestProfilerMiddleware
+from app.core.request_limits import RequestBodyLimitMiddleware
+from app.core.readiness import readiness, start_warmup
 from app.api.v1.router import api_router
 from app.services.vector.store import QdrantVectorStore
-from app.services.vector.embeddings import get_embedding_service
+from app.services.vector.async_store import close_async_vector_store, open_async_vector_store
+from app.services.vector.embeddings import get_embedding_service, shutdown_embedding_services
+from app.services.vector.dedup import close_dedup_indexes
+from app.services.vector.docstore import close_docstores
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Ensure vector collection exists
-    try:
+    # Startup: prepare the vector store and embedding model in a background thread
+    # so the server (and /health) is reachable immediately. /ready flips once done.
+    def ensure_vector_collection():
         store = QdrantVectorStore()
         # Default text-v1.5 is 768 dims. Ideally read from config or dynamic.
-        # For now, hardcoding 768 as per previous plan to ensure it's set.
+        # For now, hardcoding 384 (bge-small) to ensure it's set.
         store.ensure_collection(vector_size=384)
-        print(f"Startup: Verified collection '{settings.VECTOR_COLLECTION_NAME}' exists.")
-        
-        # Pre-load embedding model
-        print("Startup: Pre-loading embedding model...")
-        get_embedding_service()
-        print("Startup: Embedding model loaded.")
-    except Exception as e:
-        print(f"Startup Warning: Could not verify vector store: {e}")
+
+    print("Startup: Warming up vector store and embedding model in background...")
+    start_warmup([
+        ("vector_store", ensure_vector_collection),
+        ("embedding_model", get_embedding_service),
+    ])
+    # Awaitable search/upsert for request handlers; created on the running loop
+    open_async_vector_store()
     
     yield
-    # Shutdown logic if needed
+    # Shutdown: stop the ingestion embedding pool, if one was started,
+    # and close the vector clients, the near-duplicate indexes and the chunk text docstore
+    await close_async_vector_store()
+    shutdown_embedding_services()
+    close_dedup_indexes()
+    close_docstores()
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -42,11 +56,28 @@ app.add_middleware(
     allow_headers=["*"], # Allows all headers
 )
 
+# Refuse oversized uploads before Starlette spools the multipart body to disk
+app.add_middleware(RequestBodyLimitMiddleware)
+
+# Only installed when enabled so unprofiled deployments pay nothing
+if settings.PROFILING_ENABLED and settings.ADMIN_TOKEN:
+    app.add_middleware(RequestProfilerMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "version": "0.1.0"}
+    # Liveness: answers as soon as the process is up, even while warming up
+    return {"status": "ok", "version": "0.1.0", "ready": readiness.ready}
+
+@app.get("/ready")
+async def readiness_check():
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.to_dict())
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 async def root():
@@ -1,10 +1,14 @@
-from typing import Optional, Union, List
+from typing import Literal, Optional, Union, List
 from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
     query: str
     history: Optional[List[dict]] = None
     filters: Optional[dict] = None
+    # Returned by the first response; send it back to continue the conversation
+    session_id: Optional[str] = None
+    # Batch and eval clients should send "batch" so interactive chat is served first under rate limits
+    priority: Literal["interactive", "batch"] = "interactive"
 
 class SourceSnippet(BaseModel):
     text: str
@@ -15,4 +19,19 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[SourceSnippet]
     confidence: str = "Medium"
+    session_id: Optional[str] = None
+    # True when the request deadline left no time to generate: `sources` only, no real answer
+    partial: bool = False
 
+
+class PrefetchRequest(BaseModel):
+    # The question as typed so far; clients should debounce keystrokes
+    query: str
+    history: Optional[List[dict]] = None
+    filters: Optional[dict] = None
+    session_id: Optional[str] = None
+
+class PrefetchResponse(BaseModel):
+    # Send this session_id with the submitted question to use the prefetch
+    session_id: str
+    candidates: int = 0
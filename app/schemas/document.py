@@ -1,4 +1,4 @@
-from typing import Optional, Union
+from typing import List, Optional, Union
 from pydantic import BaseModel
 
 class DocumentIngestRequest(BaseModel):
@@ -12,4 +12,28 @@ class Document(BaseModel):
 class DocumentResponse(BaseModel):
     id: str
     message: str
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
+    job_id: Optional[str] = None
+
+class IngestFileStatus(BaseModel):
+    name: str
+    status: str
+    pages: int = 0
+    chunks: int = 0
+    indexed_chunks: int = 0
+    content_hash: Optional[str] = None
+    error: Optional[str] = None
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: float
+    finished_at: Optional[float] = None
+    total_files: int
+    indexed_files: int
+    failed_files: int
+    total_chunks: int
+    indexed_chunks: int
+    files: List[IngestFileStatus] = []
 
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, Field
 
 class VectorEmbedding(BaseModel):
@@ -7,3 +8,5 @@ class VectorEmbedding(BaseModel):
     text: str
     vector: list[float]
     metadata: dict = Field(default_factory=dict)
+    # Similarity to the query (cosine); set on search results only
+    score: Optional[float] = None
@@ -1,59 +1,158 @@
+import codecs
+import io
+import mmap
+import os
 import re
-from typing import Union
+import zipfile
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; cleaning runs over every line of every page
+_HORIZONTAL_SPACE = re.compile(r'[ \t]+')
+_PAGE_LABEL = re.compile(r'^(?:(?:page|pg)\.?\s*\d+|-\s*\d+\s*-)$', re.IGNORECASE)
+_DIGITS = re.compile(r'\d+')
+_HEADING_NAME = re.compile(r'^(?:heading \d|title)$')
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY, _W_P, _W_TBL, _W_TR, _W_TC = (_W + t for t in ("body", "p", "tbl", "tr", "tc"))
+_W_T, _W_TAB, _W_BR, _W_CR = (_W + t for t in ("t", "tab", "br", "cr"))
+
+
+def _docx_paragraph_text(paragraph) -> str:
+    parts = []
+    for node in paragraph.iter():
+        tag = node.tag
+        if tag == _W_T:
+            parts.append(node.text or "")
+        elif tag == _W_TAB:
+            parts.append("\t")
+        elif tag == _W_BR or tag == _W_CR:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _docx_outline_heading(props) -> Optional[bool]:
+    """
+    Whether the `w:outlineLvl` in paragraph properties marks a heading:
+    levels 0-8 do, 9 is body text. None when there is no outline level.
+    """
+    level = props.find(_W + "outlineLvl")
+    if level is None:
+        return None
+    value = level.get(_W + "val") or ""
+    return value.isdigit() and int(value) <= 8
+
+
+class _DocxSection:
+    """
+    Paragraphs of the section being read, under the current heading.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.heading: Optional[str] = None
+        self.paragraphs: List[str] = []
+        self.size = 0
+
+    def add(self, text: str):
+        if text:
+            self.paragraphs.append(text)
+            self.size += len(text) + 2
+
+    def full(self) -> bool:
+        return self.size >= self.max_chars
+
+    def take(self) -> str:
+        text = "\n\n".join(self.paragraphs)
+        self.paragraphs, self.size = [], 0
+        return text
+
 class DocumentLoader:
     """
     Service for loading and cleaning text from various file types (PDF, TXT, DOCX).
     """
 
-    def load(self, file_path: Union[str, Path]) -> list:
-        from app.schemas.document import Document
-        
+    SUPPORTED_SUFFIXES = (".pdf", ".txt", ".docx", ".doc")
+
+    # Running headers/footers: lines within this many lines of a page edge that
+    # repeat (digits ignored) on at least this share of pages, in documents of
+    # BOILERPLATE_MIN_PAGES or more. 0.4 still catches alternating odd/even headers.
+    BOILERPLATE_EDGE_LINES = 3
+    BOILERPLATE_MIN_PAGES = 3
+    BOILERPLATE_PAGE_RATIO = 0.4
+    # DOCX sections longer than this are emitted in several parts
+    DOCX_SECTION_MAX_CHARS = 20000
+    # TXT files are read, cleaned and emitted in windows of about this many bytes
+    TXT_WINDOW_BYTES = 1024 * 1024
+
+    def load(self, file_path: Union[str, Path], source_name: Optional[str] = None) -> list:
+        return list(self.iter_load(file_path, source_name))
+
+    def load_bytes(self, data: bytes, filename: str) -> list:
+        """
+        Load an upload held in memory. `filename` picks the parser and becomes the `source`.
+        """
+        return list(self.iter_load_bytes(data, filename))
+
+    def iter_load(self, file_path: Union[str, Path], source_name: Optional[str] = None) -> Iterator:
+        """
+        Like `load`, but yields documents as they are extracted. TXT and DOCX
+        stream in bounded memory; PDFs are cleaned as a whole (boilerplate
+        detection needs every page) and then yielded page by page.
+        """
         path = Path(file_path)
         if not path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
+        return self._iter_documents(path, source=source_name)
+
+    def iter_load_bytes(self, data: bytes, filename: str) -> Iterator:
+        return self._iter_documents(Path(filename), data=data)
 
+    def _iter_documents(self, path: Path, data: Optional[bytes] = None, source: Optional[str] = None) -> Iterator:
         suffix = path.suffix.lower()
 
         if suffix == ".pdf":
-            return self._load_pdf(path)
+            return iter(self._load_pdf(path, data=data, source=source))
         elif suffix == ".txt":
-            return self._load_txt(path)
+            return self._reraise_as_value_error(self._iter_txt(path, data=data, source=source), "TXT", path)
         elif suffix in [".docx", ".doc"]:
-            return self._load_docx(path)
+            return self._reraise_as_value_error(self._iter_docx(path, data=data, source=source), "DOCX", path)
         else:
             raise ValueError(f"Unsupported file type: {suffix}")
 
-    def _load_pdf(self, path: Path) -> list:
-        documents = []
-        from app.schemas.document import Document
+    @staticmethod
+    def _reraise_as_value_error(documents: Iterator, kind: str, path: Path) -> Iterator:
+        try:
+            yield from documents
+        except Exception as e:
+            logger.error(f"Error reading {kind} {path}: {e}")
+            raise ValueError(f"Failed to read {kind} file: {e}")
+
+    def _load_pdf(self, path: Path, data: Optional[bytes] = None, source: Optional[str] = None) -> list:
+        source = source or path.name
         
         # METHOD 1: Try PyMuPDF (Fast)
         try:
             import fitz  # PyMuPDF
-            doc = fitz.open(str(path))
+            doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(str(path))
             logger.info(f"Using PyMuPDF to load {path.name}")
             
+            pages = []
             for i, page in enumerate(doc):
                 try:
                     text = page.get_text()
                     if text:
-                        cleaned_page_text = self._clean_text(text, page_num=i+1)
-                        if cleaned_page_text:
-                            documents.append(Document(
-                                text=cleaned_page_text,
-                                metadata={"page": i+1, "source": path.name}
-                            ))
+                        pages.append((i+1, self._clean_lines(text, page_num=i+1)))
                 except Exception as e:
                     logger.warning(f"Failed to extract text from page {i+1} of {path.name}: {e}")
                     continue
             doc.close()
-            return documents
+            return self._page_documents(pages, source)
             
         except ImportError:
             logger.warning("PyMuPDF (fitz) not found. Falling back to pypdf (slower).")
@@ -64,110 +163,268 @@ class DocumentLoader:
         try:
             from pypdf import PdfReader
             logger.info(f"Using pypdf to load {path.name}")
-            reader = PdfReader(str(path))
+            reader = PdfReader(io.BytesIO(data) if data is not None else str(path))
             
+            pages = []
             for i, page in enumerate(reader.pages):
                 try:
                     text = page.extract_text()
                     if text:
-                        cleaned_page_text = self._clean_text(text, page_num=i+1)
-                        if cleaned_page_text:
-                            documents.append(Document(
-                                text=cleaned_page_text,
-                                metadata={"page": i+1, "source": path.name}
-                            ))
+                        pages.append((i+1, self._clean_lines(text, page_num=i+1)))
                 except Exception as e:
                     logger.warning(f"Failed to extract text from page {i+1} of {path.name}: {e}")
                     continue
-            return documents
+            return self._page_documents(pages, source)
             
         except Exception as e:
             logger.error(f"Error reading PDF {path} with pypdf: {e}")
             raise ValueError(f"Failed to read PDF: {e}. Ensure 'pymupdf' or 'pypdf' is installed.")
 
-    def _load_txt(self, path: Path) -> list:
+    def _iter_txt(self, path: Path, data: Optional[bytes] = None, source: Optional[str] = None) -> Iterator:
+        """
+        Memory-map the file (or use the in-memory upload) and yield one cleaned
+        Document per ~TXT_WINDOW_BYTES window, cut at the last newline in the
+        window. UTF-8 is decoded incrementally, so a character split across
+        windows is carried over. `page` is the window ordinal; `byte_start` and
+        `byte_end` locate it in the file.
+        """
+        source = source or path.name
+        if data is not None:
+            yield from self._txt_windows(data, source)
+            return
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield from self._txt_windows(mapped, source)
+
+    def _txt_windows(self, buf, source: str) -> Iterator:
         from app.schemas.document import Document
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-            
-            if not text:
-                return []
-                
-            cleaned_text = self._clean_text(text)
-            if not cleaned_text:
-                return []
-
-            # TXT files don't have pages, so we treat it as Page 1 or split?
-            # For simplicity, treating as single document for now, chunker will handle it.
-            return [Document(
-                text=cleaned_text,
-                metadata={"page": 1, "source": path.name}
-            )]
-        except Exception as e:
-            logger.error(f"Error reading TXT {path}: {e}")
-            raise ValueError(f"Failed to read TXT file: {e}")
 
-    def _load_docx(self, path: Path) -> list:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        size = len(buf)
+        start, ordinal = 0, 0
+        while start < size:
+            end = min(size, start + self.TXT_WINDOW_BYTES)
+            if end < size:
+                newline = buf.rfind(b"\n", start, end)
+                if newline != -1:
+                    end = newline + 1
+            text = decoder.decode(buf[start:end], final=end >= size)
+            cleaned = self._clean_text(text)
+            if cleaned:
+                ordinal += 1
+                yield Document(
+                    text=cleaned,
+                    metadata={"page": ordinal, "source": source, "byte_start": start, "byte_end": end}
+                )
+            start = end
+
+    def _iter_docx(self, path: Path, data: Optional[bytes] = None, source: Optional[str] = None) -> Iterator:
+        """
+        Stream `word/document.xml` and yield one Document per heading-delimited
+        section, split further past DOCX_SECTION_MAX_CHARS. `page` is the
+        section's ordinal in the file and `section` its heading. Paragraphs are
+        separated by blank lines; table rows become "cell | cell" lines.
+        Parsed elements are discarded as soon as they are read, so memory stays
+        bounded by the largest section rather than the file.
+        """
+        from xml.etree.ElementTree import iterparse
         from app.schemas.document import Document
+
+        source = source or path.name
+        with zipfile.ZipFile(io.BytesIO(data) if data is not None else path) as archive:
+            heading_styles = self._docx_heading_styles(archive)
+            section = _DocxSection(self.DOCX_SECTION_MAX_CHARS)
+            ordinal = 0
+            tables = []  # stack of open tables: [rows, cells, paragraphs]
+            body, depth, body_depth = None, 0, -1
+
+            def emit():
+                nonlocal ordinal
+                text = section.take()
+                if not text:
+                    return None
+                ordinal += 1
+                metadata = {"page": ordinal, "source": source}
+                if section.heading:
+                    metadata["section"] = section.heading
+                return Document(text=text, metadata=metadata)
+
+            with archive.open("word/document.xml") as xml:
+                for event, elem in iterparse(xml, events=("start", "end")):
+                    tag = elem.tag
+                    if event == "start":
+                        depth += 1
+                        if tag == _W_BODY:
+                            body, body_depth = elem, depth
+                        elif tag == _W_TBL:
+                            tables.append([[], [], []])
+                        continue
+
+                    if tag == _W_P:
+                        text = _docx_paragraph_text(elem)
+                        if tables:
+                            tables[-1][2].append(text)
+                        elif self._is_docx_heading(elem, heading_styles) and text.strip():
+                            doc = emit()
+                            if doc:
+                                yield doc
+                            section.heading = _HORIZONTAL_SPACE.sub(' ', text).strip()
+                            section.add(section.heading)
+                        else:
+                            section.add(self._clean_text(text))
+                        elem.clear()
+                    elif tag == _W_TC and tables:
+                        rows, cells, paragraphs = tables[-1]
+                        cells.append(" ".join(p for p in (_HORIZONTAL_SPACE.sub(' ', t).strip() for t in paragraphs) if p))
+                        paragraphs.clear()
+                    elif tag == _W_TR and tables:
+                        rows, cells, _ = tables[-1]
+                        if any(cells):
+                            rows.append(" | ".join(cells))
+                        cells.clear()
+                    elif tag == _W_TBL and tables:
+                        rows = tables.pop()[0]
+                        table_text = "\n".join(rows)
+                        if tables:
+                            # Nested table: its text belongs to the enclosing cell
+                            tables[-1][2].append(table_text)
+                        else:
+                            section.add(table_text)
+                        elem.clear()
+
+                    if depth == body_depth + 1 and body is not None:
+                        # Drop finished top-level blocks so the tree never grows
+                        body.clear()
+                    depth -= 1
+
+                    if section.full():
+                        doc = emit()
+                        if doc:
+                            yield doc
+
+            doc = emit()
+            if doc:
+                yield doc
+
+    @staticmethod
+    def _docx_heading_styles(archive: zipfile.ZipFile) -> set:
+        """
+        Paragraph style ids that mark headings: named "heading N"/"title" or
+        carrying a heading outline level (covers localized style names).
+        """
+        from xml.etree.ElementTree import fromstring
+
         try:
-            import docx  # python-docx
-            doc = docx.Document(path)
-            full_text = []
-            for para in doc.paragraphs:
-                full_text.append(para.text)
-            
-            text = "\n".join(full_text)
-            if not text:
-                return []
-
-            cleaned_text = self._clean_text(text)
-            if not cleaned_text:
-                return []
-                
-            return [Document(
-                text=cleaned_text, 
-                metadata={"page": 1, "source": path.name}
-            )]
-        except ImportError:
-            raise ImportError("python-docx not installed. Run `pip install python-docx`")
-        except Exception as e:
-            logger.error(f"Error reading DOCX {path}: {e}")
-            raise ValueError(f"Failed to read DOCX file: {e}")
+            styles = fromstring(archive.read("word/styles.xml"))
+        except KeyError:
+            return set()
+        ids = set()
+        for style in styles.iter(_W + "style"):
+            if style.get(_W + "type") != "paragraph":
+                continue
+            name = style.find(_W + "name")
+            name = (name.get(_W + "val") or "").lower() if name is not None else ""
+            props = style.find(_W + "pPr")
+            outline = _docx_outline_heading(props) if props is not None else None
+            # An explicit body-text outline level wins over a heading-like name
+            if outline or (outline is None and _HEADING_NAME.match(name)):
+                ids.add(style.get(_W + "styleId"))
+        return ids
+
+    @staticmethod
+    def _is_docx_heading(paragraph, heading_styles: set) -> bool:
+        props = paragraph.find(_W + "pPr")
+        if props is None:
+            return False
+        # Direct formatting overrides the style, including level 9 (body text) on a heading style
+        outline = _docx_outline_heading(props)
+        if outline is not None:
+            return outline
+        style = props.find(_W + "pStyle")
+        return style is not None and style.get(_W + "val") in heading_styles
+
+    def _page_documents(self, pages: List[Tuple[int, List[str]]], source: str) -> list:
+        from app.schemas.document import Document
+
+        documents = []
+        for page_num, lines in self._remove_boilerplate(pages):
+            if lines:
+                documents.append(Document(
+                    text="\n".join(lines),
+                    metadata={"page": page_num, "source": source}
+                ))
+        return documents
 
     def _clean_text(self, text: str, page_num: int = 0) -> str:
         """
         Apply heuristics to clean extracted text.
         """
-        # 1. Normalize whitespace
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # 2. Remove multiple newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        
-        lines = text.split('\n')
+        return "\n".join(self._clean_lines(text, page_num))
+
+    def _clean_lines(self, text: str, page_num: int = 0) -> List[str]:
+        # One substitution per page; [ \t]+ never spans lines
+        text = _HORIZONTAL_SPACE.sub(' ', text)
         cleaned_lines = []
-        
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             if not line:
                 continue
-                
-            if self._is_page_number(line, page_num):
-                continue
-                
+
             if len(line) < 4 and not line[0].isalnum():
-                 continue
+                continue
+
+            # Only lines starting with a digit, "p" or "-" can be page numbers
+            first = line[0]
+            if (first.isdigit() or first in 'pP-') and self._is_page_number(line, page_num):
+                continue
 
             cleaned_lines.append(line)
-            
-        return "\n".join(cleaned_lines)
+
+        return cleaned_lines
 
     def _is_page_number(self, line: str, page_num: int) -> bool:
         if line.isdigit() and (int(line) == page_num or int(line) < 1000):
             return True
-        if re.match(r'^(page|pg)\.?\s*\d+$', line, re.IGNORECASE):
-            return True
-        if re.match(r'^-\s*\d+\s*-$', line):
-            return True
-        return False
+        return _PAGE_LABEL.match(line) is not None
+
+    @staticmethod
+    def _boilerplate_key(line: str) -> str:
+        # "Annual Report 2023 - Page 14 of 200" matches on every page
+        return _DIGITS.sub('#', line.lower())
+
+    def _remove_boilerplate(self, pages: List[Tuple[int, List[str]]]) -> List[Tuple[int, List[str]]]:
+        """
+        Drop running headers and footers: lines near the top or bottom of a
+        page that recur across the document.
+        """
+        if len(pages) < self.BOILERPLATE_MIN_PAGES:
+            return pages
+        edge = self.BOILERPLATE_EDGE_LINES
+
+        # Keys of each page's edge lines, computed once for counting and filtering
+        key = self._boilerplate_key
+        edges = []
+        counts = Counter()
+        for _, lines in pages:
+            head = min(edge, len(lines))
+            tail = max(head, len(lines) - edge)
+            head_keys = [key(line) for line in lines[:head]]
+            tail_keys = [key(line) for line in lines[tail:]]
+            edges.append((head, tail, head_keys, tail_keys))
+            counts.update(set(head_keys + tail_keys))
+        min_pages = max(self.BOILERPLATE_MIN_PAGES, self.BOILERPLATE_PAGE_RATIO * len(pages))
+        boilerplate = {k for k, n in counts.items() if n >= min_pages}
+        if not boilerplate:
+            return pages
+
+        cleaned = []
+        for (page_num, lines), (head, tail, head_keys, tail_keys) in zip(pages, edges):
+            cleaned.append((page_num,
+                [line for line, k in zip(lines[:head], head_keys) if k not in boilerplate]
+                + lines[head:tail]
+                + [line for line, k in zip(lines[tail:], tail_keys) if k not in boilerplate]
+            ))
+        logger.info(f"Removed {len(boilerplate)} running header/footer line(s) across {len(pages)} pages")
+        return cleaned
@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+
+class StoredUpload:
+    """
+    An upload that has been fully received: small files stay in memory
+    (`data`), larger ones are spilled to a unique temp file (`path`).
+    """
+
+    def __init__(self, filename: str, size: int, sha256: str, data: Optional[bytes] = None, path: Optional[Path] = None):
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.data = data
+        self.path = path
+
+    def cleanup(self):
+        self.data = None
+        if self.path is not None:
+            try:
+                if self.path.exists():
+                    os.remove(self.path)
+            except Exception as e:
+                logger.warning(f"Could not delete temp file {self.path}: {e}")
+
+
+class MemoryBudget:
+    """
+    Bytes that the uploads of one request may keep in memory between them.
+    Once it is used up, further uploads spill to UPLOAD_DIR however small.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.remaining = max_bytes
+
+    def take(self, n: int) -> bool:
+        if n > self.remaining:
+            return False
+        self.remaining -= n
+        return True
+
+    def give_back(self, n: int):
+        self.remaining += n
+
+
+class _Spooler:
+    """
+    Accumulates an upload chunk by chunk: hashes it, enforces the size limit,
+    and keeps it in memory until it outgrows `in_memory_max_bytes` (or the
+    request's `budget`), after which everything goes to a uniquely named
+    file under UPLOAD_DIR.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, in_memory_max_bytes: int,
+                 budget: Optional[MemoryBudget] = None):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.in_memory_max_bytes = in_memory_max_bytes
+        self.budget = budget
+        self.hasher = hashlib.sha256()
+        self.buffer = bytearray()
+        self.size = 0
+        self.path = None
+        self.file = None
+
+    def accept(self, chunk: bytes) -> bool:
+        """
+        Account for `chunk`. Returns True when it must be passed to `spill()`.
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(self.max_bytes)
+        self.hasher.update(chunk)
+        if self.file is None and self.size <= self.in_memory_max_bytes and self._reserve(len(chunk)):
+            self.buffer += chunk
+            return False
+        return True
+
+    def _reserve(self, n: int) -> bool:
+        return self.budget is None or self.budget.take(n)
+
+    def _release_buffer(self):
+        if self.budget is not None:
+            self.budget.give_back(len(self.buffer))
+        self.buffer = bytearray()
+
+    def spill(self, chunk: bytes):
+        # Blocking file I/O
+        if self.file is None:
+            settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            self.path = settings.UPLOAD_DIR / f"{uuid.uuid4().hex}{Path(self.filename).suffix.lower()}"
+            self.file = open(self.path, "wb")
+            self.file.write(self.buffer)
+            self._release_buffer()
+        self.file.write(chunk)
+
+    def finish(self) -> StoredUpload:
+        if self.file is not None:
+            self.file.close()
+            return StoredUpload(self.filename, self.size, self.hasher.hexdigest(), path=self.path)
+        return StoredUpload(self.filename, self.size, self.hasher.hexdigest(), data=bytes(self.buffer))
+
+    def abort(self):
+        self._release_buffer()
+        if self.file is not None:
+            self.file.close()
+        if self.path is not None and self.path.exists():
+            os.remove(self.path)
+
+
+async def receive_upload(
+    stream,
+    filename: str,
+    max_bytes: Optional[int] = None,
+    in_memory_max_bytes: Optional[int] = None,
+    chunk_bytes: Optional[int] = None,
+    budget: Optional[MemoryBudget] = None,
+) -> StoredUpload:
+    """
+    Read an upload in chunks without blocking the event loop, hashing it on
+    the fly and enforcing the per-file size limit as bytes are read.
+
+    For an UploadFile, Starlette has already spooled the multipart body by
+    the time this runs, so the limit here only rejects the file; it does not
+    stop the body arriving. RequestBodyLimitMiddleware caps the request
+    itself before that.
+
+    `stream` is anything with an async `read(n)` (e.g. FastAPI's UploadFile).
+    Uploads up to `in_memory_max_bytes` never touch disk; bigger ones are
+    written to UPLOAD_DIR under a random name, so concurrent uploads that
+    share a filename cannot collide. A `budget` shared by the uploads of one
+    request also spills them once their in-memory total would exceed it.
+    """
+    chunk_bytes = chunk_bytes or settings.UPLOAD_CHUNK_BYTES
+    spooler = _Spooler(
+        filename,
+        max_bytes or settings.MAX_UPLOAD_BYTES,
+        settings.UPLOAD_IN_MEMORY_MAX_BYTES if in_memory_max_bytes is None else in_memory_max_bytes,
+        budget,
+    )
+    try:
+        while True:
+            chunk = await stream.read(chunk_bytes)
+            if not chunk:
+                break
+            if spooler.accept(chunk):
+                await asyncio.to_thread(spooler.spill, chunk)
+        upload = await asyncio.to_thread(spooler.finish)
+    except BaseException:
+        await asyncio.to_thread(spooler.abort)
+        raise
+
+    if upload.path is not None:
+        logger.info(f"Spooled upload {filename} ({upload.size} bytes) to {upload.path}")
+    return upload
+
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _store_member(name: str, fileobj, size_limit: int, budget: Optional[MemoryBudget] = None) -> StoredUpload:
+    """
+    Copy one archive member into memory or a temp file, hashing it as it streams.
+    """
+    spooler = _Spooler(name, size_limit, settings.UPLOAD_IN_MEMORY_MAX_BYTES, budget)
+    try:
+        while True:
+            chunk = fileobj.read(settings.UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if spooler.accept(chunk):
+                spooler.spill(chunk)
+        return spooler.finish()
+    except BaseException:
+        spooler.abort()
+        raise
+
+
+def expand_archive(upload: StoredUpload, supported_suffixes, max_total_bytes: Optional[int] = None,
+                   max_files: Optional[int] = None, budget: Optional[MemoryBudget] = None) -> tuple:
+    """
+    Unpack a zip/tar upload into one StoredUpload per supported member.
+
+    Blocking; run it in a thread. Members are named by their path inside the
+    archive (that becomes the document `source`). Total extracted size and
+    member count are capped to defuse archive bombs. Members share `budget`
+    for what they keep in memory, as in `receive_upload`. Returns
+    (uploads, skipped) where skipped is a list of (member name, reason).
+    """
+    import io
+    import tarfile
+    import zipfile
+
+    max_total_bytes = max_total_bytes or settings.MAX_ARCHIVE_EXTRACT_BYTES
+    max_files = max_files or settings.MAX_ARCHIVE_FILES
+    source = io.BytesIO(upload.data) if upload.data is not None else str(upload.path)
+
+    if upload.filename.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(source)
+        members = [(m.filename, m) for m in archive.infolist() if not m.is_dir()]
+        open_member = archive.open
+    else:
+        archive = tarfile.open(fileobj=source) if upload.data is not None else tarfile.open(source)
+        members = [(m.name, m) for m in archive.getmembers() if m.isfile()]
+        open_member = archive.extractfile
+
+    uploads, skipped = [], []
+    remaining = max_total_bytes
+    try:
+        for name, member in members:
+            base = Path(name).name
+            if name.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if Path(base).suffix.lower() not in supported_suffixes:
+                skipped.append((name, "unsupported file type"))
+                continue
+            if len(uploads) >= max_files:
+                skipped.append((name, f"archive file limit ({max_files}) reached"))
+                continue
+            try:
+                with open_member(member) as fileobj:
+                    stored = _store_member(name, fileobj, remaining, budget)
+            except UploadTooLargeError:
+                skipped.append((name, "archive extraction size limit reached"))
+                break
+            remaining -= stored.size
+            uploads.append(stored)
+    except BaseException:
+        for stored in uploads:
+            stored.cleanup()
+        raise
+    finally:
+        archive.close()
+    return uploads, skipped
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.profiling import get_memory_tracer
+from app.schemas.document import Document
+from app.services.document.loader import DocumentLoader
+from app.services.document.upload import StoredUpload
+from app.services.retrieval import RetrievalService
+
+logger = logging.getLogger(__name__)
+
+
+class FileStatus:
+    def __init__(self, name: str, content_hash: Optional[str] = None):
+        self.name = name
+        self.content_hash = content_hash
+        # queued -> processing -> indexed | partial | failed | skipped
+        # (partial: failed, but some chunks stayed indexed and could not be rolled back)
+        self.status = "queued"
+        self.pages = 0
+        self.chunks = 0
+        self.indexed_chunks = 0
+        self.loaded = False
+        self.error: Optional[str] = None
+
+    def fail(self, error: str):
+        self.status = "failed"
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "indexed_chunks": self.indexed_chunks,
+            "content_hash": self.content_hash,
+            "error": self.error,
+        }
+
+
+class IngestionJob:
+    """
+    Progress of one ingestion request (single file, many files or an archive).
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.files: "OrderedDict[str, FileStatus]" = OrderedDict()
+
+    def add_file(self, name: str, content_hash: Optional[str] = None) -> FileStatus:
+        # Same name twice in one job (e.g. two archives): keep both entries apart
+        key = name
+        n = 1
+        while key in self.files:
+            n += 1
+            key = f"{name} ({n})"
+        status = FileStatus(name, content_hash)
+        self.files[key] = status
+        return status
+
+    def skip_file(self, name: str, reason: str):
+        status = self.add_file(name)
+        status.status = "skipped"
+        status.error = reason
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is None:
+            return "running" if any(f.status != "queued" for f in self.files.values()) else "queued"
+        # Skipped members (unsupported types in an archive) are reported, not errors
+        states = {f.status for f in self.files.values()} - {"skipped"}
+        if states <= {"indexed"}:
+            return "completed"
+        if states & {"indexed", "partial"}:
+            return "completed_with_errors"
+        return "failed"
+
+    def to_dict(self) -> dict:
+        files = list(self.files.values())
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total_files": len(files),
+            "indexed_files": sum(1 for f in files if f.status == "indexed"),
+            "failed_files": sum(1 for f in files if f.status == "failed"),
+            "partial_files": sum(1 for f in files if f.status == "partial"),
+            "total_chunks": sum(f.chunks for f in files),
+            "indexed_chunks": sum(f.indexed_chunks for f in files),
+            "files": [f.to_dict() for f in files],
+        }
+
+
+class JobRegistry:
+    """
+    In-process, bounded registry of ingestion jobs (oldest evicted first).
+    """
+
+    def __init__(self, max_jobs: int = 500):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> IngestionJob:
+        job = IngestionJob(uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+job_registry = JobRegistry(max_jobs=settings.INGEST_MAX_JOBS)
+
+# One embed/upsert batch: (owning file, chunk) pairs, possibly spanning several files
+_Batch = List[Tuple[FileStatus, Document]]
+
+
+class IngestionPipeline:
+    """
+    Shared ingestion pipeline for one or many files.
+
+    A producer streams and chunks files one after another while a consumer
+    embeds and upserts fixed-size batches of chunks that may span document
+    boundaries, so throughput is bounded by embedding, not by file count.
+    The queue between them is small to keep memory bounded.
+
+    A file that fails (while loading, or because a batch holding some of its
+    chunks failed) must not stay half searchable: its queued chunks are
+    dropped, and once the run is over the chunks already indexed are rolled
+    back (see `_roll_back`).
+    """
+
+    def __init__(self, loader: DocumentLoader, retrieval: RetrievalService, embed_batch_size: Optional[int] = None,
+                 replace: bool = False):
+        self.loader = loader
+        self.retrieval = retrieval
+        self.embed_batch_size = embed_batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        # Drop a source's existing chunks before indexing its new version
+        self.replace = replace
+
+    async def run(self, job: IngestionJob, uploads: List[Tuple[FileStatus, StoredUpload]]):
+        tracer = get_memory_tracer(f"job-{job.id}")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        tracer.mark("start", files=len(uploads))
+        try:
+            consumer = asyncio.create_task(self._consume(queue, tracer))
+            try:
+                await self._produce(uploads, queue, tracer)
+            finally:
+                await queue.put(None)
+                await consumer
+        finally:
+            for _, upload in uploads:
+                upload.cleanup()
+            for status, _ in uploads:
+                if status.status in ("queued", "processing"):
+                    status.fail(status.error or "processing interrupted")
+            await self._roll_back(uploads)
+            job.finished_at = time.time()
+            tracer.finish()
+            logger.info(f"Ingestion job {job.id} finished: {job.status}")
+
+    async def _produce(self, uploads, queue: asyncio.Queue, tracer):
+        pending: _Batch = []
+        for status, upload in uploads:
+            status.status = "processing"
+            documents = None
+            load_s = 0.0
+            try:
+                if self.replace:
+                    await asyncio.to_thread(self.retrieval.delete_source, upload.filename)
+                start = time.perf_counter()
+                # Created in a thread: PDFs are parsed up front
+                if upload.data is not None:
+                    documents = await asyncio.to_thread(self.loader.iter_load_bytes, upload.data, upload.filename)
+                else:
+                    documents = await asyncio.to_thread(self.loader.iter_load, upload.path, upload.filename)
+                load_s += time.perf_counter() - start
+
+                # Chunks stream into batches as the file is read, so a huge file
+                # never has to be held in memory whole
+                exhausted = False
+                while not exhausted:
+                    chunks, pages, exhausted, spent = await asyncio.to_thread(
+                        self._next_chunks, documents, self.embed_batch_size
+                    )
+                    load_s += spent
+                    status.pages += pages
+                    status.chunks += len(chunks)
+                    for chunk in chunks:
+                        pending.append((status, chunk))
+                        if len(pending) >= self.embed_batch_size:
+                            await queue.put(pending)
+                            pending = []
+            except Exception as e:
+                logger.error(f"Ingestion: failed to load {status.name}: {e}")
+                status.fail(str(e))
+                pending = [(owner, chunk) for owner, chunk in pending if owner is not status]
+                continue
+            finally:
+                if hasattr(documents, "close"):
+                    documents.close()
+                upload.cleanup()
+                metrics.INGEST_LOAD_SECONDS.observe(load_s)
+
+            tracer.mark("load", file=status.name, pages=status.pages)
+            if not status.pages:
+                status.fail("no text could be extracted")
+                continue
+            status.loaded = True
+            if not status.chunks:
+                status.fail("no chunks produced")
+            elif status.status == "processing" and status.indexed_chunks >= status.chunks:
+                # Every batch was indexed before the end of the file was seen
+                status.status = "indexed"
+        if pending:
+            await queue.put(pending)
+
+    async def _roll_back(self, uploads: List[Tuple[FileStatus, StoredUpload]]):
+        """
+        Remove what failed files left in the index. With `replace` the source's
+        previous version is already gone, so deleting the source leaves nothing
+        of the file searchable. Without it the source may also hold an earlier
+        upload's chunks, which are not ours to delete: the file is reported as
+        `partial` instead.
+        """
+        for status, upload in uploads:
+            if status.status != "failed" or not status.indexed_chunks:
+                continue
+            if not self.replace:
+                status.status = "partial"
+                continue
+            try:
+                await asyncio.to_thread(self.retrieval.delete_source, upload.filename)
+                logger.info(f"Ingestion: rolled back {status.indexed_chunks} chunks of failed file {status.name}")
+                status.indexed_chunks = 0
+            except Exception as e:
+                logger.error(f"Ingestion: rollback of {status.name} failed: {e}")
+                status.status = "partial"
+                status.error = f"{status.error}; rollback failed: {e}"
+
+    def _next_chunks(self, documents: Iterator[Document], limit: int) -> Tuple[List[Document], int, bool, float]:
+        """
+        Pull documents until they produce at least `limit` chunks or run out.
+        Runs in a worker thread. Returns (chunks, documents pulled, exhausted, seconds spent loading).
+        """
+        chunks: List[Document] = []
+        pulled, load_s = 0, 0.0
+        while len(chunks) < limit:
+            start = time.perf_counter()
+            document = next(documents, None)
+            load_s += time.perf_counter() - start
+            if document is None:
+                return chunks, pulled, True, load_s
+            pulled += 1
+            chunks.extend(self.retrieval.chunk_documents([document]))
+        return chunks, pulled, False, load_s
+
+    async def _consume(self, queue: asyncio.Queue, tracer):
+        batch_no = 0
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            batch_no += 1
+            # Chunks of files that failed after they were queued would only be rolled back again
+            batch = [(status, chunk) for status, chunk in batch if status.status != "failed"]
+            if not batch:
+                continue
+            owners = {id(status): status for status, _ in batch}
+            try:
+                await self.retrieval.aindex_chunks([chunk for _, chunk in batch])
+            except Exception as e:
+                logger.error(f"Ingestion: batch {batch_no} failed: {e}")
+                for status in owners.values():
+                    status.fail(f"indexing failed: {e}")
+                continue
+
+            for status, _ in batch:
+                status.indexed_chunks += 1
+            for status in owners.values():
+                if status.loaded and status.status == "processing" and status.indexed_chunks >= status.chunks:
+                    status.status = "indexed"
+            tracer.mark("batch", batch=batch_no, chunks=len(batch), files=len(owners))
+            logger.info(f"Ingestion: indexed batch {batch_no} ({len(batch)} chunks from {len(owners)} files)")
@@ -1,23 +1,97 @@
 from abc import ABC, abstractmethod
-from groq import Groq
+import logging
+import threading
+import time
+from typing import Iterator, Optional
 from app.core.config import settings
+from app.core import metrics
+from app.services.llm.scheduler import get_llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class LLMTimeoutError(TimeoutError):
+    """
+    A single generation attempt ran past its timeout. Retryable.
+    """
+
+
+class LLMCancelledError(Exception):
+    """
+    The attempt was abandoned because a hedged duplicate answered first.
+    """
+
 
 class BaseLLMService(ABC):
     @abstractmethod
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, priority: str = "interactive") -> str:
         """
-        Generate a response for the given prompt.
+        Generate a response for the given prompt. `priority` is "interactive"
+        or "batch" and decides queueing order under rate limits.
         """
         pass
 
+    def stream(self, prompt: str, priority: str = "interactive", **options) -> Iterator[str]:
+        """
+        Yield the response in pieces as it is generated. Services that cannot
+        stream yield the whole answer at once.
+        """
+        yield self.generate(prompt, priority=priority, **options)
+
 class GroqLLMService(BaseLLMService):
     def __init__(self, api_key: str = settings.GROQ_API_KEY, model: str = settings.LLM_MODEL):
-        self.client = Groq(api_key=api_key)
+        from groq import NOT_GIVEN, Groq  # deferred to keep app start-up fast
+        self._not_given = NOT_GIVEN
+        # Retries are handled by ResilientLLMService, which also knows the overall deadline
+        self.client = Groq(api_key=api_key, base_url=settings.GROQ_BASE_URL, max_retries=0)
         self.model = model
+        # Pre-bind metric children; the model label is bounded by configuration
+        self._ttft = metrics.LLM_TTFT_SECONDS.labels(model=model)
+        self._total = metrics.LLM_TOTAL_SECONDS.labels(model=model)
+        self.scheduler = get_llm_scheduler(model)
+
+    def generate(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        priority: str = "interactive",
+    ) -> str:
+        """
+        `timeout` bounds the whole call, including time queued for rate-limit
+        budget, not just each read. Setting `cancel` makes the call close its
+        stream and raise LLMCancelledError.
+        """
+        return "".join(self.stream(prompt, timeout=timeout, cancel=cancel, priority=priority))
+
+    def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        priority: str = "interactive",
+    ) -> Iterator[str]:
+        """
+        Yield content deltas as Groq streams them; same `timeout` and `cancel`
+        semantics as `generate`. Closing the generator early closes the HTTP
+        stream and releases the rate-limit reservation.
+        """
+        from groq import RateLimitError
 
-    def generate(self, prompt: str) -> str:
+        reserved = self.scheduler.estimate(prompt)
         try:
-            chat_completion = self.client.chat.completions.create(
+            waited = self.scheduler.acquire(reserved, priority=priority, timeout=timeout)
+        except TimeoutError as e:
+            raise LLMTimeoutError(str(e)) from e
+        if timeout is not None:
+            timeout -= waited
+
+        # Always streamed so we can observe time-to-first-token
+        start = time.perf_counter()
+        stream = None
+        usage = None
+        try:
+            response = self.client.chat.completions.with_raw_response.create(
                 messages=[
                     {
                         "role": "user",
@@ -25,12 +99,57 @@ class GroqLLMService(BaseLLMService):
                     }
                 ],
                 model=self.model,
+                stream=True,
+                timeout=self._not_given if timeout is None else timeout,
             )
-            return chat_completion.choices[0].message.content
+            self.scheduler.observe_headers(response.headers, reserved=reserved)
+            stream = response.parse()
+            first = True
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    raise LLMCancelledError(self.model)
+                if timeout is not None and time.perf_counter() - start > timeout:
+                    raise LLMTimeoutError(f"{self.model} did not finish within {timeout:.1f}s")
+                # Groq reports usage on the final chunk (either top-level or under x_groq)
+                chunk_usage = chunk.usage or (chunk.x_groq.usage if chunk.x_groq else None)
+                if chunk_usage:
+                    usage = chunk_usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        self._ttft.observe(time.perf_counter() - start)
+                        first = False
+                    yield chunk.choices[0].delta.content
+
+            if usage:
+                metrics.record_llm_usage(self.model, usage.prompt_tokens, usage.completion_tokens)
+        except LLMCancelledError:
+            raise
+        except RateLimitError as e:
+            self.scheduler.observe_headers(e.response.headers, reserved=reserved, throttled=True)
+            logger.warning(f"Groq API rate limited model {self.model}: {e}")
+            raise
         except Exception as e:
-            # Helpful error logging
-            print(f"Error calling Groq API with model {self.model}: {e}")
-            raise e
+            logger.warning(f"Error calling Groq API with model {self.model}: {e}")
+            raise
+        finally:
+            if stream is not None:
+                stream.close()
+            self.scheduler.settle(reserved, usage.total_tokens if usage else None)
+            self._total.observe(time.perf_counter() - start)
+
+
+# Process-wide singleton so latency history and failover state outlive a request
+_llm_service: Optional[BaseLLMService] = None
+_llm_service_lock = threading.Lock()
 
 def get_llm_service() -> BaseLLMService:
-    return GroqLLMService()
+    global _llm_service
+    if _llm_service is None:
+        with _llm_service_lock:
+            if _llm_service is None:
+                from app.services.llm.resilient import ResilientLLMService
+                fallback = None
+                if settings.LLM_FALLBACK_MODEL and settings.LLM_FALLBACK_MODEL != settings.LLM_MODEL:
+                    fallback = GroqLLMService(model=settings.LLM_FALLBACK_MODEL)
+                _llm_service = ResilientLLMService(GroqLLMService(), fallback)
+    return _llm_service
@@ -0,0 +1,387 @@
+"""
+Deadline-bounded LLM generation with retries, hedged requests and model failover.
+
+Every answer gets an overall deadline. Within it, attempts are retried with
+jittered exponential backoff (tenacity) on transient errors: timeouts,
+connection errors, 429 and 5xx. An attempt that has produced no output by
+the configured percentile of recent times to first token gets a duplicate
+(hedged) request. The first copy to stream a piece wins and the other is
+cancelled there and then, so an answer is never paid for twice. Attempts
+run on the caller's thread; only hedges use the worker pool, so a busy
+pool delays hedges, not answers. After a run of consecutive errors the
+primary model is taken out of rotation for a cool-down and attempts go to
+the fallback model instead.
+
+Wrapped services must accept `timeout`, `cancel` and `priority` keyword
+arguments, like GroqLLMService.generate and .stream; attempts are streamed
+to observe the first piece. Hedges are skipped while the
+model's rate-limit queue is non-empty, since a duplicate would only queue too.
+
+The call's deadline is cut short by the request deadline (app.core.deadline),
+if one is running, so generation never outlives the request it serves.
+
+Streamed answers get the same deadline, retries and failover, but only until
+the first piece has been yielded: after that the caller has shown text, so
+an error ends the stream instead of starting the answer over. Streams are
+never hedged.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.deadline import current_deadline
+from app.services.llm.generator import BaseLLMService, LLMCancelledError, LLMTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """
+    No answer within the overall per-call deadline. Not retried.
+    """
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Every attempt failed with a transient error.
+    """
+
+
+def is_retryable(exc: BaseException) -> bool:
+    from groq import APIConnectionError, APIStatusError  # APITimeoutError is a connection error
+
+    if isinstance(exc, (LLMTimeoutError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+class LatencyWindow:
+    """
+    Sliding window of recent times to first token.
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+class ModelHealth:
+    """
+    Counts consecutive retryable errors; at `threshold` the model is out of
+    rotation for `cooldown_s`. After the cool-down one more error trips it again.
+    """
+
+    def __init__(self, threshold: int, cooldown_s: float):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.consecutive_errors = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_errors = 0
+            self.open_until = 0.0
+
+    def record_error(self) -> bool:
+        """
+        Returns True if this error took the model out of rotation.
+        """
+        with self._lock:
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= self.threshold and self.available():
+                self.open_until = time.monotonic() + self.cooldown_s
+                return True
+            return False
+
+
+class ResilientLLMService(BaseLLMService):
+    def __init__(
+        self,
+        primary: BaseLLMService,
+        fallback: Optional[BaseLLMService] = None,
+        deadline_s: Optional[float] = None,
+        attempt_timeout_s: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        hedge_percentile: Optional[float] = settings.LLM_HEDGE_PERCENTILE,
+        hedge_delay_s: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        failover_errors: Optional[int] = None,
+        failover_cooldown_s: Optional[float] = None,
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.deadline_s = deadline_s or settings.LLM_DEADLINE_SECONDS
+        self.attempt_timeout_s = attempt_timeout_s or settings.LLM_ATTEMPT_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or settings.LLM_MAX_ATTEMPTS
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay_s = settings.LLM_HEDGE_DELAY_SECONDS if hedge_delay_s is None else hedge_delay_s
+        self.hedge_min_samples = settings.LLM_HEDGE_MIN_SAMPLES if hedge_min_samples is None else hedge_min_samples
+        self.health = ModelHealth(
+            failover_errors or settings.LLM_FAILOVER_ERRORS,
+            settings.LLM_FAILOVER_COOLDOWN_SECONDS if failover_cooldown_s is None else failover_cooldown_s,
+        )
+        self._latency: Dict[int, LatencyWindow] = {id(primary): LatencyWindow()}
+        if fallback is not None:
+            self._latency[id(fallback)] = LatencyWindow()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+        )
+
+    @staticmethod
+    def _name(service: BaseLLMService) -> str:
+        return getattr(service, "model", type(service).__name__)
+
+    def _deadline(self) -> float:
+        deadline = time.monotonic() + self.deadline_s
+        request = current_deadline()
+        return deadline if request is None else min(deadline, request.expires_at)
+
+    def generate(self, prompt: str, priority: str = "interactive") -> str:
+        deadline = self._deadline()
+        backoff = wait_random_exponential(multiplier=0.25, max=4.0)
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            # Never sleep past the deadline; the next attempt then fails fast
+            wait=lambda state: min(backoff(state), max(0.0, deadline - time.monotonic())),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._log_retry,
+            reraise=True,
+        )
+        try:
+            for attempt in retrying:
+                with attempt:
+                    return self._attempt(prompt, deadline, priority)
+        except LLMDeadlineExceeded:
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                raise LLMUnavailableError(f"LLM unavailable after {self.max_attempts} attempts: {e}") from e
+            raise
+
+    def stream(self, prompt: str, priority: str = "interactive") -> Iterator[str]:
+        deadline = self._deadline()
+        for attempt in range(1, self.max_attempts + 1):
+            started = False
+            try:
+                for piece in self._attempt_stream(prompt, deadline, priority):
+                    started = True
+                    yield piece
+                return
+            except LLMDeadlineExceeded:
+                raise
+            except Exception as e:
+                if started or not is_retryable(e):
+                    raise
+                if attempt == self.max_attempts:
+                    raise LLMUnavailableError(f"LLM unavailable after {self.max_attempts} attempts: {e}") from e
+                logger.warning(f"LLM stream attempt {attempt} failed, retrying: {e}")
+                metrics.LLM_RETRIES_TOTAL.labels(model=self._name(self._pick())).inc()
+                # Same jittered exponential backoff as the tenacity policy in generate()
+                backoff = random.uniform(0, min(4.0, 0.25 * 2 ** attempt))
+                time.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+
+    def _attempt_stream(self, prompt: str, deadline: float, priority: str) -> Iterator[str]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"No LLM answer within {self.deadline_s:.1f}s")
+        service = self._pick()
+        pieces = service.stream(prompt, timeout=min(self.attempt_timeout_s, remaining), priority=priority)
+        try:
+            yield from pieces
+        except Exception as e:
+            self._record_failure(service, e)
+            if is_retryable(e) and time.monotonic() >= deadline:
+                raise LLMDeadlineExceeded(f"No LLM answer within {self.deadline_s:.1f}s") from e
+            raise
+        finally:
+            # An abandoned stream must still close its HTTP response
+            pieces.close()
+        if service is self.primary:
+            self.health.record_success()
+
+    def _log_retry(self, state):
+        logger.warning(f"LLM attempt {state.attempt_number} failed, retrying: {state.outcome.exception()}")
+        metrics.LLM_RETRIES_TOTAL.labels(model=self._name(self._pick())).inc()
+
+    def _pick(self) -> BaseLLMService:
+        if self.fallback is not None and not self.health.available():
+            return self.fallback
+        return self.primary
+
+    def _attempt(self, prompt: str, deadline: float, priority: str) -> str:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded(f"No LLM answer within {self.deadline_s:.1f}s")
+        service = self._pick()
+        timeout = min(self.attempt_timeout_s, remaining)
+        try:
+            text = self._hedged(service, prompt, timeout, priority)
+        except Exception as e:
+            self._record_failure(service, e)
+            if is_retryable(e) and time.monotonic() >= deadline:
+                raise LLMDeadlineExceeded(f"No LLM answer within {self.deadline_s:.1f}s") from e
+            raise
+        if service is self.primary:
+            self.health.record_success()
+        return text
+
+    def _record_failure(self, service: BaseLLMService, error: Exception):
+        if service is self.primary and is_retryable(error) and self.health.record_error():
+            logger.warning(
+                f"{self._name(service)} failed {self.health.consecutive_errors} times in a row; "
+                f"routing to {self._name(self.fallback) if self.fallback else 'nothing (no fallback)'} "
+                f"for {self.health.cooldown_s:.0f}s"
+            )
+            metrics.LLM_FAILOVERS_TOTAL.labels(model=self._name(service)).inc()
+
+    def hedge_delay(self, service: BaseLLMService) -> Optional[float]:
+        if self.hedge_percentile is None:
+            return None
+        window = self._latency[id(service)]
+        scheduler = getattr(service, "scheduler", None)
+        if scheduler is not None and scheduler.queue_depth():
+            return None
+        if len(window) < self.hedge_min_samples:
+            return self.hedge_delay_s
+        return window.percentile(self.hedge_percentile)
+
+    def _call(self, service: BaseLLMService, prompt: str, timeout: float, cancel: threading.Event, priority: str,
+              on_first_piece: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Stream one answer, recording its time to first token. `on_first_piece`
+        returns False when another copy got there first; this one then gives up.
+        """
+        start = time.monotonic()
+        parts = []
+        pieces = service.stream(prompt, timeout=timeout, cancel=cancel, priority=priority)
+        try:
+            for piece in pieces:
+                if not parts:
+                    self._latency[id(service)].observe(time.monotonic() - start)
+                    if on_first_piece is not None and not on_first_piece():
+                        raise LLMCancelledError(self._name(service))
+                parts.append(piece)
+        finally:
+            pieces.close()
+        return "".join(parts)
+
+    def _hedged(self, service: BaseLLMService, prompt: str, timeout: float, priority: str) -> str:
+        """
+        Run the attempt on the calling thread; a worker sends the hedge if no
+        first piece has arrived after the hedge delay. Whichever copy streams
+        first wins and the other is cancelled straight away.
+        """
+        delay = self.hedge_delay(service)
+        if delay is None or delay >= timeout:
+            return self._call(service, prompt, timeout, threading.Event(), priority)
+
+        race = _HedgeRace()
+        hedge = self._executor.submit(self._hedge_after, race, delay, service, prompt, timeout, priority)
+        try:
+            try:
+                return self._call(service, prompt, timeout, race.cancel["primary"], priority,
+                                  lambda: race.first_piece("primary"))
+            except LLMCancelledError:
+                if race.winner != "hedge":
+                    raise
+                error = None
+            except Exception as e:
+                error = e
+            if not race.stop_hedging():
+                # Failed before a hedge was sent: retrying is the caller's business
+                raise error
+            try:
+                return hedge.result()
+            except LLMCancelledError:
+                if error is None:
+                    raise
+                raise error
+        finally:
+            race.close()
+
+    def _hedge_after(self, race: "_HedgeRace", delay: float, service: BaseLLMService, prompt: str,
+                     timeout: float, priority: str) -> Optional[str]:
+        # Measured from the start of the attempt: this worker may have been queued
+        if race.settled.wait(max(0.0, race.started_at + delay - time.monotonic())) or not race.launch():
+            return None
+        metrics.LLM_HEDGES_TOTAL.labels(model=self._name(service)).inc()
+        remaining = timeout - (time.monotonic() - race.started_at)
+        text = self._call(service, prompt, remaining, race.cancel["hedge"], priority, lambda: race.first_piece("hedge"))
+        metrics.LLM_HEDGE_WINS_TOTAL.labels(model=self._name(service)).inc()
+        return text
+
+
+class _HedgeRace:
+    """
+    An attempt and its hedge: the first copy to stream a piece wins and the
+    other is cancelled. The hedge is only sent while neither has streamed.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.cancel = {"primary": threading.Event(), "hedge": threading.Event()}
+        # Set once the hedge is no longer wanted: a copy streamed, or the attempt ended
+        self.settled = threading.Event()
+        self.winner: Optional[str] = None
+        self.launched = False
+        self._lock = threading.Lock()
+
+    def first_piece(self, copy: str) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = copy
+                for other, cancel in self.cancel.items():
+                    if other != copy:
+                        cancel.set()
+                self.settled.set()
+            return self.winner == copy
+
+    def launch(self) -> bool:
+        with self._lock:
+            if self.settled.is_set():
+                return False
+            self.launched = True
+            return True
+
+    def stop_hedging(self) -> bool:
+        """
+        Settle the race; returns True if the hedge had already been sent.
+        """
+        with self._lock:
+            self.settled.set()
+            return self.launched
+
+    def close(self):
+        # The attempt is over: stop a hedge that is still waiting or streaming
+        with self._lock:
+            self.settled.set()
+            if self.winner != "hedge":
+                self.cancel["hedge"].set()
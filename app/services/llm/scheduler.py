@@ -0,0 +1,249 @@
+"""
+Client-side rate limiting for the Groq API.
+
+Each model gets an LLMScheduler with token buckets for requests per minute
+and tokens per minute, starting from the configured limits. The token bucket
+and a request-quota bucket are corrected from the x-ratelimit-* headers of
+every response, so several workers sharing one API key converge on the
+server's view of the quota. Groq reports its request quota per day, so that
+bucket is separate from the configured per-minute one.
+A request reserves its estimated prompt tokens plus a completion allowance.
+The reservation is settled against the reported usage when the response ends.
+
+Callers wait in priority order: interactive chat goes ahead of batch and
+eval traffic, and requests are FIFO within a class. A 429 pauses the whole
+model until its retry-after has passed.
+"""
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "batch")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse Groq reset durations such as "7.66s", "2m59.56s" or "120ms".
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Prompt size estimate with tiktoken's cl100k_base. Llama tokenizes a little
+    differently, but the error is small next to the completion allowance.
+    Falls back to ~4 characters per token if the encoding cannot be loaded
+    (it is downloaded on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+                    _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+class TokenBucket:
+    """
+    Not thread-safe on its own; LLMScheduler guards it.
+    """
+
+    def __init__(self, capacity: float, window_s: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / window_s
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """
+        Seconds until `amount` is available. Requests larger than the whole
+        bucket only wait for a full bucket, so they cannot block forever.
+        """
+        needed = min(amount, self.capacity) - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def observe(self, limit: Optional[float], remaining: Optional[float], reset_s: Optional[float], now: float):
+        self.refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            # Other workers spend the same quota, so the server's count wins
+            self.level = min(self.capacity, float(remaining))
+            if reset_s and self.capacity > remaining:
+                # The reset time is when the bucket would be full again
+                self.rate = (self.capacity - remaining) / reset_s
+
+
+class LLMScheduler:
+    def __init__(self, model: str, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute or settings.LLM_RATE_LIMIT_RPM)
+        self.tokens = TokenBucket(tokens_per_minute or settings.LLM_RATE_LIMIT_TPM)
+        # Created from the first response's request headers
+        self.request_quota: Optional[TokenBucket] = None
+        self.paused_until = 0.0
+        # Reserved but not yet settled; the server has not seen these in its counts yet
+        self._in_flight_requests = 0
+        self._in_flight_tokens = 0
+        self._cond = threading.Condition()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._depth = {p: metrics.LLM_QUEUE_DEPTH.labels(model=model, priority=p) for p in PRIORITIES}
+        self._wait = {p: metrics.LLM_QUEUE_WAIT_SECONDS.labels(model=model, priority=p) for p in PRIORITIES}
+
+    def estimate(self, prompt: str) -> int:
+        return count_tokens(prompt) + settings.LLM_COMPLETION_TOKENS_ESTIMATE
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._waiters)
+
+    def _buckets(self):
+        return [b for b in (self.requests, self.request_quota) if b is not None]
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        waits = [self.paused_until - now, 0.0]
+        for bucket in self._buckets():
+            bucket.refill(now)
+            waits.append(bucket.wait_for(1))
+        self.tokens.refill(now)
+        waits.append(self.tokens.wait_for(tokens))
+        return max(waits)
+
+    def acquire(self, tokens: int, priority: str = "interactive", timeout: Optional[float] = None) -> float:
+        """
+        Block until this request is at the head of the queue and every bucket
+        can cover it, then debit them. Returns the time spent waiting. Raises
+        TimeoutError if that takes longer than `timeout`.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        start = time.monotonic()
+        ticket = (PRIORITIES.index(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self._depth[priority].inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = None
+                    if self._waiters[0] == ticket:
+                        delay = self._wait_time(tokens, now)
+                        if delay == 0:
+                            for bucket in self._buckets():
+                                bucket.level -= 1
+                            self.tokens.level -= tokens
+                            self._in_flight_requests += 1
+                            self._in_flight_tokens += tokens
+                            break
+                    if timeout is not None:
+                        left = start + timeout - now
+                        if left <= 0:
+                            raise TimeoutError(f"Waited {timeout:.1f}s for {self.model} rate-limit budget")
+                        delay = left if delay is None else min(delay, left)
+                    self._cond.wait(delay)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._depth[priority].dec()
+                # The next waiter may be able to go now (or must re-check after a timeout)
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        self._wait[priority].observe(waited)
+        return waited
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """
+        Close a reservation made by `acquire`; must be called once per acquire.
+        With the actual usage the token bucket is corrected. Without it (e.g. a
+        failed or cancelled call) the reservation stands.
+        """
+        with self._cond:
+            self._in_flight_requests -= 1
+            self._in_flight_tokens -= reserved
+            if used is not None:
+                self.tokens.level += reserved - used
+            self._cond.notify_all()
+
+    def observe_headers(self, headers: Mapping[str, str], reserved: int = 0, throttled: bool = False):
+        """
+        Resync from a response's rate-limit headers. `reserved` is the calling
+        request's own reservation, which the server has already counted.
+        """
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        now = time.monotonic()
+        with self._cond:
+            own = 1 if reserved else 0
+            limit, remaining = number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests")
+            if limit and self.request_quota is None:
+                self.request_quota = TokenBucket(limit)
+            if self.request_quota is not None:
+                if remaining is not None:
+                    remaining -= self._in_flight_requests - own
+                self.request_quota.observe(limit, remaining, parse_duration(headers.get("x-ratelimit-reset-requests")), now)
+            remaining = number("x-ratelimit-remaining-tokens")
+            if remaining is not None:
+                remaining -= self._in_flight_tokens - reserved
+            self.tokens.observe(
+                number("x-ratelimit-limit-tokens"), remaining,
+                parse_duration(headers.get("x-ratelimit-reset-tokens")), now,
+            )
+            if throttled:
+                retry_after = parse_duration(headers.get("retry-after")) or 1.0
+                self.paused_until = max(self.paused_until, now + retry_after)
+                logger.warning(f"{self.model} rate limited; pausing for {retry_after:.1f}s")
+            self._cond.notify_all()
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_llm_scheduler(model: str) -> LLMScheduler:
+    scheduler = _schedulers.get(model)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(model)
+            if scheduler is None:
+                scheduler = _schedulers[model] = LLMScheduler(model)
+    return scheduler
@@ -1,13 +1,55 @@
-from typing import List
+import asyncio
+import logging
+from typing import Iterator, List, Optional, Tuple
 from app.core.prompts import STRICT_RAG_SYSTEM_PROMPT, RAG_USER_PROMPT_TEMPLATE
 from app.services.retrieval import RetrievalService
-from app.services.llm.generator import get_llm_service
+from app.services.llm.generator import BaseLLMService, get_llm_service
 from app.schemas.vector import VectorEmbedding
+from app.core import metrics
+from app.core.config import settings
+from app.core.deadline import bounded, current_deadline, stage
+from app.services.llm.resilient import LLMDeadlineExceeded
+from app.services.session import ConversationSession, condense_query
+
+logger = logging.getLogger(__name__)
+
+NO_ANSWER = "I don't know based on the provided documents."
+# Retrieval-only result: the request deadline left no time to generate an answer
+PARTIAL_ANSWER = "There was not enough time to write an answer. The most relevant passages are listed in the sources."
 
 class RAGService:
-    def __init__(self):
-        self.retrieval_service = RetrievalService()
-        self.llm_service = get_llm_service()
+    def __init__(
+        self,
+        retrieval_service: Optional[RetrievalService] = None,
+        llm_service: Optional[BaseLLMService] = None,
+        min_score: Optional[float] = None,
+    ):
+        self.retrieval_service = retrieval_service or RetrievalService()
+        self.llm_service = llm_service or get_llm_service()
+        self.min_score = settings.RETRIEVAL_MIN_SCORE if min_score is None else min_score
+
+    def select_chunks(self, chunks: List[VectorEmbedding]) -> List[VectorEmbedding]:
+        """
+        Adaptive top-k: drop chunks below the absolute floor, then keep only
+        those within RETRIEVAL_RELATIVE_SCORE of the best hit. A sharp query
+        keeps one or two chunks; a broad one keeps up to RETRIEVAL_MAX_K.
+        Chunks without a score (e.g. from a custom store) are kept as-is.
+        """
+        if not chunks or any(c.score is None for c in chunks):
+            return chunks
+        relevant = sorted((c for c in chunks if c.score >= self.min_score), key=lambda c: c.score, reverse=True)
+        if not relevant:
+            return []
+        cutoff = relevant[0].score * settings.RETRIEVAL_RELATIVE_SCORE
+        return [c for c in relevant if c.score >= cutoff]
+
+    def confidence(self, chunks: List[VectorEmbedding]) -> str:
+        if not chunks:
+            return "Low"
+        scores = [c.score for c in chunks if c.score is not None]
+        if not scores:
+            return "Medium"
+        return "High" if max(scores) >= settings.RETRIEVAL_HIGH_CONFIDENCE_SCORE else "Medium"
 
     def format_context(self, chunks: List[VectorEmbedding]) -> str:
         """
@@ -20,19 +62,17 @@ class RAGService:
             page = chunk.metadata.get("page", "Unknown")
             # Clean newline characters in text for cleaner context block
             clean_text = chunk.text.replace("\n", " ").strip()
-            formatted_chunks.append(f"{clean_text} [Source: {source}, Page: {page}]")
+            # DOCX chunks are located by section (ordinal + heading) rather than printed page
+            section = chunk.metadata.get("section")
+            locator = f"Page: {page}, Section: {section}" if section else f"Page: {page}"
+            formatted_chunks.append(f"{clean_text} [Source: {source}, {locator}]")
             
         return "\n\n".join(formatted_chunks)
 
-    def generate_answer(self, query: str, chunks: List[VectorEmbedding]) -> str:
-        """
-        Generate a strict answer using the provided chunks.
-        """
-        if not chunks:
-            return "I don't know based on the provided documents."
-
+    def build_prompt(self, query: str, chunks: List[VectorEmbedding]) -> str:
         # Format context
-        context_str = self.format_context(chunks)
+        with metrics.timed(metrics.FORMAT_CONTEXT_SECONDS):
+            context_str = self.format_context(chunks)
 
         # Construct Prompt
         prompt = RAG_USER_PROMPT_TEMPLATE.format(
@@ -41,28 +81,309 @@ class RAGService:
         )
         
         # Combine System + User Prompt
-        full_prompt = f"{STRICT_RAG_SYSTEM_PROMPT}\n\n{prompt}"
-        
-        return self.llm_service.generate(full_prompt)
+        return f"{STRICT_RAG_SYSTEM_PROMPT}\n\n{prompt}"
+
+    def generate_answer(self, query: str, chunks: List[VectorEmbedding], priority: str = "interactive") -> str:
+        """
+        Generate a strict answer using the provided chunks.
+        """
+        if not chunks:
+            return NO_ANSWER
+        return self.llm_service.generate(self.build_prompt(query, chunks), priority=priority)
+
+    def stream_answer(self, query: str, chunks: List[VectorEmbedding], priority: str = "interactive") -> Iterator[str]:
+        """
+        Like generate_answer, but yields the answer as the LLM produces it.
+        """
+        if not chunks:
+            yield NO_ANSWER
+            return
+        yield from self.llm_service.stream(self.build_prompt(query, chunks), priority=priority)
+
+    def retrieve(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+    ) -> Tuple[List[VectorEmbedding], bool]:
+        """
+        Retrieve and gate the chunks for a query. With a session, follow-ups
+        are condensed against earlier turns and reuse the previous turn's
+        chunks when their query vector stays close, or the candidates
+        prefetched while the question was being typed (see `prefetch`).
+        Returns (chunks, reused_context).
+        """
+        if session is None:
+            retrieval_query = condense_query(query, history)
+            # 1. Retrieve candidate chunks (the store already drops those below the floor)
+            with stage("vector_search"):
+                chunks = self.retrieval_service.search(
+                    retrieval_query, limit=self.retrieval_k(), filters=filters, score_threshold=self.min_score
+                )
+            reused = False
+        else:
+            with session.lock:
+                retrieval_query = condense_query(query, history or session.turns)
+                query_vector = session.prefetched_vector(retrieval_query, filters)
+                if query_vector is None:
+                    with stage("embed_query"):
+                        query_vector = self.retrieval_service.embed_query(retrieval_query)
+                chunks, reused = self._cached(session, query_vector, filters)
+                if chunks is None:
+                    with stage("vector_search"):
+                        chunks = self.retrieval_service.search_by_vector(
+                            query_vector, limit=self.retrieval_k(), filters=filters, score_threshold=self.min_score
+                        )
+                    session.remember(query_vector, chunks, filters)
+
+        return self._gate(chunks), reused
+
+    async def aretrieve(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+    ) -> Tuple[List[VectorEmbedding], bool]:
+        """
+        `retrieve` for the event loop: the query is embedded in a worker thread
+        and the vector search awaits the async Qdrant client. The session lock
+        is a thread lock, so it is only held around the in-memory bookkeeping
+        and never across an await.
+        Both stages give up at the request deadline (DeadlineExceeded).
+        """
+        if session is None:
+            query_vector = await self._embed(condense_query(query, history))
+            return self._gate(await self._search(query_vector, filters)), False
+
+        with session.lock:
+            retrieval_query = condense_query(query, history or session.turns)
+            query_vector = session.prefetched_vector(retrieval_query, filters)
+        if query_vector is None:
+            query_vector = await self._embed(retrieval_query)
+        with session.lock:
+            chunks, reused = self._cached(session, query_vector, filters)
+        if chunks is None:
+            chunks = await self._search(query_vector, filters)
+            with session.lock:
+                session.remember(query_vector, chunks, filters)
+        return self._gate(chunks), reused
+
+    async def _embed(self, query: str) -> List[float]:
+        return await bounded("embed_query", asyncio.to_thread(self.retrieval_service.embed_query, query))
 
-    def generate_response(self, query: str, filters: dict = None) -> dict:
+    async def _search(self, query_vector: List[float], filters: Optional[dict]) -> List[VectorEmbedding]:
+        return await bounded("vector_search", self.retrieval_service.asearch_by_vector(
+            query_vector, limit=self.retrieval_k(), filters=filters, score_threshold=self.min_score
+        ))
+
+    @staticmethod
+    def retrieval_k() -> int:
+        """
+        Chunks to fetch and keep: RETRIEVAL_MAX_K, or fewer once the request
+        deadline is close, so that the prompt (and generation) stays short.
+        """
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() < settings.REQUEST_DEADLINE_REDUCED_K_SECONDS:
+            return min(settings.REQUEST_DEADLINE_REDUCED_K, settings.RETRIEVAL_MAX_K)
+        return settings.RETRIEVAL_MAX_K
+
+    @staticmethod
+    def _cached(session: ConversationSession, query_vector: List[float],
+                filters: Optional[dict]) -> Tuple[Optional[List[VectorEmbedding]], bool]:
+        """
+        Chunks that need no search: the previous turn's (a close follow-up),
+        else a prefetch for this query. Returns (chunks or None, reused_context).
+        Call with the session lock held.
+        """
+        chunks = session.reusable_chunks(query_vector, filters, settings.SESSION_REUSE_SIMILARITY)
+        metrics.record_cache_lookup("session_retrieval", chunks is not None)
+        if chunks is not None:
+            return chunks, True
+        if session.prefetched is not None:
+            chunks = session.take_prefetched(query_vector, filters, settings.SEARCH_PREFETCH_SIMILARITY)
+            metrics.record_cache_lookup("search_prefetch", chunks is not None)
+            if chunks is not None:
+                session.remember(query_vector, chunks, filters)
+        return chunks, False
+
+    async def prefetch(
+        self,
+        query: str,
+        session: ConversationSession,
+        filters: dict = None,
+        history: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Speculative retrieval for a question still being typed: embed and
+        search now and park the candidates on the session, so that submitting
+        a close enough query skips both. Repeating the parked query is a no-op.
+        Returns the number of candidates parked.
+        """
+        with session.lock:
+            retrieval_query = condense_query(query, history or session.turns)
+            if session.prefetched_vector(retrieval_query, filters) is not None:
+                return len(session.prefetched.chunks)
+        query_vector = await self._embed(retrieval_query)
+        chunks = await self._search(query_vector, filters)
+        with session.lock:
+            session.park(retrieval_query, query_vector, chunks, filters, settings.SEARCH_PREFETCH_TTL_SECONDS)
+        return len(chunks)
+
+    def _gate(self, chunks: List[VectorEmbedding]) -> List[VectorEmbedding]:
+        # 2. Keep only chunks that are relevant enough; with none, answer without calling the LLM
+        chunks = self.select_chunks(chunks)
+        if not chunks:
+            metrics.EARLY_EXIT_TOTAL.inc()
+        k = self.retrieval_k()
+        if len(chunks) > k:
+            metrics.DEADLINE_DEGRADED_TOTAL.labels(mode="reduced_k").inc()
+            chunks = chunks[:k]
+        return chunks
+
+    @staticmethod
+    def out_of_time(chunks: List[VectorEmbedding]) -> bool:
+        """
+        True if the request deadline leaves too little time to call the LLM;
+        the caller then returns the retrieved chunks without an answer.
+        """
+        deadline = current_deadline()
+        if not chunks or deadline is None:
+            return False
+        if deadline.remaining() >= settings.REQUEST_DEADLINE_MIN_GENERATION_SECONDS:
+            return False
+        logger.warning(f"Skipping generation: {deadline.remaining():.2f}s of the request deadline left")
+        metrics.DEADLINE_DEGRADED_TOTAL.labels(mode="retrieval_only").inc()
+        return True
+
+    def generate_response(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+        priority: str = "interactive",
+    ) -> dict:
         """
         Orchestrate the RAG flow: Retrieve -> Generate.
+        `priority` ("interactive" or "batch") orders the LLM call under rate limits.
         Returns:
             dict: {
                 "answer": str,
-                "sources": List[VectorEmbedding]
+                "sources": List[VectorEmbedding],
+                "confidence": str,
+                "reused_context": bool,
+                "partial": bool  # retrieval only: the request deadline left no time to answer
             }
         """
-        # 1. Retrieve relevant chunks
-        chunks = self.retrieval_service.search(query, limit=5, filters=filters)
-        
-        # 2. Generate Answer
-        answer = self.generate_answer(query, chunks)
-        
+        chunks, reused = self.retrieve(query, filters=filters, session=session, history=history)
+        if self.out_of_time(chunks):
+            return self._result(PARTIAL_ANSWER, chunks, reused, partial=True)
+
+        # 3. Generate Answer
+        try:
+            with stage("generation"):
+                answer = self.generate_answer(query, chunks, priority=priority)
+        except LLMDeadlineExceeded as e:
+            return self._partial(chunks, reused, e)
+        self._record_turn(session, query, answer)
+        return self._result(answer, chunks, reused)
+
+    async def agenerate_response(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+        priority: str = "interactive",
+    ) -> dict:
+        """
+        `generate_response` for the event loop.
+        """
+        chunks, reused = await self.aretrieve(query, filters=filters, session=session, history=history)
+        if self.out_of_time(chunks):
+            return self._result(PARTIAL_ANSWER, chunks, reused, partial=True)
+        try:
+            # The Groq client is synchronous. It is not wrapped in `bounded`: the LLM
+            # service already stops at the request deadline, and a thread cannot be cancelled.
+            with stage("generation"):
+                answer = await asyncio.to_thread(self.generate_answer, query, chunks, priority)
+        except LLMDeadlineExceeded as e:
+            return self._partial(chunks, reused, e)
+        self._record_turn(session, query, answer)
+        return self._result(answer, chunks, reused)
+
+    @staticmethod
+    def _record_turn(session: Optional[ConversationSession], query: str, answer: str):
+        if session is not None:
+            with session.lock:
+                session.add_turn("user", query)
+                session.add_turn("assistant", answer)
+
+    def _partial(self, chunks: List[VectorEmbedding], reused: bool, error: LLMDeadlineExceeded) -> dict:
+        # The LLM gave up at the request deadline: retrieval-only. Its own deadline
+        # (no request deadline, or one with time left) is still an error.
+        deadline = current_deadline()
+        if deadline is None or not deadline.expired():
+            raise error
+        logger.warning("Generation hit the request deadline; returning sources only")
+        metrics.DEADLINE_DEGRADED_TOTAL.labels(mode="retrieval_only").inc()
+        return self._result(PARTIAL_ANSWER, chunks, reused, partial=True)
+
+    def _result(self, answer, chunks: List[VectorEmbedding], reused: bool, partial: bool = False) -> dict:
         return {
             "answer": answer,
-            "sources": chunks
+            "sources": chunks,
+            "confidence": self.confidence(chunks),
+            "reused_context": reused,
+            "partial": partial
         }
 
+    def stream_response(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+        priority: str = "interactive",
+    ) -> dict:
+        """
+        Retrieve now and return the same dict as generate_response, except
+        that "answer" is an iterator of text pieces. The turn is added to the
+        session once the answer has been streamed in full.
+        """
+        chunks, reused = self.retrieve(query, filters=filters, session=session, history=history)
+        return self._streamed(query, chunks, reused, session, priority)
+
+    async def astream_response(
+        self,
+        query: str,
+        filters: dict = None,
+        session: Optional[ConversationSession] = None,
+        history: Optional[List[dict]] = None,
+        priority: str = "interactive",
+    ) -> dict:
+        """
+        `stream_response` with retrieval on the event loop (see `aretrieve`).
+        The answer iterator is still synchronous.
+        """
+        chunks, reused = await self.aretrieve(query, filters=filters, session=session, history=history)
+        return self._streamed(query, chunks, reused, session, priority)
+
+    def _streamed(self, query: str, chunks: List[VectorEmbedding], reused: bool,
+                  session: Optional[ConversationSession], priority: str) -> dict:
+        if self.out_of_time(chunks):
+            def partial():
+                yield PARTIAL_ANSWER
+            return self._result(partial(), chunks, reused, partial=True)
+
+        def answer():
+            parts = []
+            with stage("generation"):
+                for piece in self.stream_answer(query, chunks, priority=priority):
+                    parts.append(piece)
+                    yield piece
+            self._record_turn(session, query, "".join(parts))
 
+        return self._result(answer(), chunks, reused)
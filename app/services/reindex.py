@@ -0,0 +1,248 @@
+"""
+Blue/green reindexing behind the collection alias.
+
+A reindex builds `<alias>_v<N+1>` while searches keep hitting the live
+version, then swaps the alias atomically and drops the old version(s).
+Ingestion and deletes keep going during a copy from the live collection;
+they are paused only while the reindex catches up on them and swaps the
+alias. A rebuild from a directory pauses them from start to swap, since
+the files, not the live version, are the source of truth. The pause only
+reaches writers on the same host (see app.services.vector.write_gate).
+Points are either re-embedded from the live collection's stored chunk text
+(embedding model or VECTOR_MATRYOSHKA_DIM change) or rebuilt from a
+directory of source files (chunking or loader change).
+"""
+import logging
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Optional, Set
+
+from app.core.config import settings
+from app.schemas.vector import VectorEmbedding
+from app.services.vector.dedup import drop_dedup_index, get_dedup_index, minhash_signature
+from app.services.vector.embeddings import BaseEmbeddingService, get_ingest_embedding_service
+from app.services.vector.store import QdrantVectorStore
+from app.services.vector.write_gate import paused_writes
+
+logger = logging.getLogger(__name__)
+
+
+class ReindexAlreadyRunningError(RuntimeError):
+    pass
+
+
+class ReindexStatus:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.state = "idle"  # idle -> running -> completed | failed
+        self.source_collection: Optional[str] = None
+        self.target_collection: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.points = 0
+        self.dropped: list = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+# One reindex per process at a time
+_reindex_lock = threading.Lock()
+reindex_status = ReindexStatus()
+
+
+class ReindexService:
+    def __init__(
+        self,
+        store: Optional[QdrantVectorStore] = None,
+        embedding_service: Optional[BaseEmbeddingService] = None,
+        batch_size: Optional[int] = None,
+        keep_previous: Optional[int] = None,
+    ):
+        self.store = store or QdrantVectorStore()
+        self._embedding_service = embedding_service
+        self.batch_size = batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        self.keep_previous = settings.REINDEX_KEEP_PREVIOUS_VERSIONS if keep_previous is None else keep_previous
+
+    @property
+    def embedding_service(self) -> BaseEmbeddingService:
+        if self._embedding_service is None:
+            self._embedding_service = get_ingest_embedding_service()
+        return self._embedding_service
+
+    def run(self, directory: Optional[Path] = None, status: Optional[ReindexStatus] = None) -> ReindexStatus:
+        """
+        Build the next collection version, swap the alias to it and garbage-collect.
+        Blocking; raises ReindexAlreadyRunningError if another reindex is in progress.
+        """
+        if not _reindex_lock.acquire(blocking=False):
+            raise ReindexAlreadyRunningError("A reindex is already running")
+        status = status or reindex_status
+        status.reset()
+        status.state = "running"
+        status.started_at = time.time()
+        status.mode = "directory" if directory else "collection"
+        try:
+            source = self.store.resolve_collection()
+            target = self.store.next_version_name()
+            status.source_collection, status.target_collection = source, target
+
+            dim = len(self.embedding_service.embed_batch(["dimension probe"], [{}])[0].vector)
+            self.store.create_collection(target, dim, settings.VECTOR_MATRYOSHKA_DIM)
+            target_store = self.store.for_collection(target)
+            with ExitStack() as paused:
+                try:
+                    if directory:
+                        # Nothing maps the live version's points onto a rebuild from files,
+                        # so writes through the alias wait for the whole rebuild instead
+                        paused.enter_context(paused_writes(self.store.collection_name))
+                        self._rebuild_from_directory(Path(directory), target_store, status)
+                    elif source:
+                        copied = self._copy(source, target_store, status)
+                        # Writes through the alias wait from here until the swap, so the
+                        # catch-up sees everything written to the live version meanwhile
+                        paused.enter_context(paused_writes(self.store.collection_name))
+                        self._catch_up(source, target_store, status, copied)
+                    else:
+                        paused.enter_context(paused_writes(self.store.collection_name))
+                except BaseException:
+                    self.store.drop_collection(target)
+                    drop_dedup_index(target)
+                    raise
+
+                self.store.swap_alias(target)
+                # After the swap, before writes resume: every id the live version uses is in the target
+                stale = self._stale_texts(target_store)
+                if stale:
+                    target_store.docstore.delete_many(stale)
+                    logger.info(f"Removed {len(stale)} chunk texts no longer in {target} from the docstore")
+            status.dropped = self._garbage_collect(keep=target)
+            status.state = "completed"
+            logger.info(f"Reindex finished: {source} -> {target} ({status.points} points)")
+        except Exception as e:
+            status.state = "failed"
+            status.error = str(e)
+            logger.error(f"Reindex failed: {e}")
+            raise
+        finally:
+            status.finished_at = time.time()
+            _reindex_lock.release()
+        return status
+
+    def _copy(self, source: str, target_store: QdrantVectorStore, status: ReindexStatus) -> Set[str]:
+        """
+        Re-embed every stored chunk of `source` into `target_store`, keeping payloads.
+        Returns the ids copied.
+        """
+        copied = set()
+        for points in self._scroll(source):
+            self._copy_points(source, points, target_store, status)
+            copied.update(str(p.id) for p in points)
+        return copied
+
+    def _catch_up(self, source: str, target_store: QdrantVectorStore, status: ReindexStatus, copied: Set[str]):
+        """
+        Apply what changed in `source` since `_copy`: points added since are
+        copied, points deleted since are removed and changed payloads (the
+        references of shared points) are re-applied. Run with writes paused.
+        """
+        from qdrant_client.http import models
+
+        live, changed = set(), {}
+        for points in self._scroll(source):
+            live.update(str(p.id) for p in points)
+            self._copy_points(source, [p for p in points if str(p.id) not in copied], target_store, status)
+            known = [p for p in points if str(p.id) in copied]
+            if not known:
+                continue
+            current = {
+                str(p.id): p.payload for p in target_store.client.retrieve(
+                    collection_name=target_store.collection_name, ids=[str(p.id) for p in known],
+                    with_payload=True, with_vectors=False,
+                )
+            }
+            for point in known:
+                payload = {k: v for k, v in point.payload.items() if k != "text"}
+                if {k: v for k, v in current.get(str(point.id), {}).items() if k != "text"} != payload:
+                    changed[str(point.id)] = payload
+        if changed:
+            target_store.set_payloads(changed)
+        gone = list(copied - live)
+        if gone:
+            target_store.client.delete(
+                collection_name=target_store.collection_name,
+                points_selector=models.PointIdsList(points=gone),
+            )
+            get_dedup_index(target_store.collection_name).remove(gone)
+        logger.info(f"Reindex catch-up: {len(live - copied)} added, {len(changed)} updated, {len(gone)} deleted")
+
+    def _scroll(self, source: str):
+        from qdrant_client.http import models
+        return self.store.scroll(collection=source, batch_size=self.batch_size,
+                                 with_payload=models.PayloadSelectorExclude(exclude=["text"]))
+
+    def _copy_points(self, source: str, points: list, target_store: QdrantVectorStore, status: ReindexStatus):
+        if not points:
+            return
+        stored = self.store.for_collection(source).fetch_texts([str(p.id) for p in points])
+        texts = [stored.get(str(p.id), "") for p in points]
+        metadatas = [dict(p.payload) for p in points]
+        vectors = self.embedding_service.embed_batch(texts, metadatas)
+        target_store.upsert([
+            VectorEmbedding(text=text, vector=v.vector, metadata=meta)
+            for text, v, meta in zip(texts, vectors, metadatas)
+        ])
+        index = get_dedup_index(target_store.collection_name)
+        with index.transaction():
+            for point, text in zip(points, texts):
+                index.add(str(point.id), minhash_signature(text))
+        status.points += len(points)
+
+    def _rebuild_from_directory(self, directory: Path, target_store: QdrantVectorStore, status: ReindexStatus):
+        from app.cli import index_directory
+        from app.services.retrieval import RetrievalService
+
+        retrieval = RetrievalService(
+            embedding_service=self.embedding_service,
+            vector_store=target_store,
+        )
+        with tempfile.TemporaryDirectory(prefix="rag-reindex-") as tmp:
+            summary = index_directory(
+                directory,
+                retrieval=retrieval,
+                workers=settings.REINDEX_EXTRACT_WORKERS,
+                checkpoint_path=Path(tmp) / "checkpoint.json",
+                restart=True,
+            )
+        status.points = summary["chunks_indexed"]
+        if summary["interrupted"]:
+            raise RuntimeError("Reindex from directory was interrupted")
+
+    def _stale_texts(self, target_store: QdrantVectorStore) -> list:
+        """
+        Docstore ids the new version does not use. Versions kept for rollback
+        may still need them, so nothing is stale unless all old versions go.
+        """
+        docstore = target_store.docstore
+        if docstore is None or self.keep_previous:
+            return []
+        live = set()
+        for points in target_store.scroll(batch_size=self.batch_size, with_payload=False):
+            live.update(str(p.id) for p in points)
+        return [pid for batch in docstore.ids() for pid in batch if pid not in live]
+
+    def _garbage_collect(self, keep: str) -> list:
+        old = [name for name in self.store.versions() if name != keep]
+        if self.keep_previous:
+            old = old[:-self.keep_previous]
+        for name in old:
+            self.store.drop_collection(name)
+            drop_dedup_index(name)
+        return old
@@ -1,20 +1,48 @@
+import asyncio
 from typing import List, Optional, Union, Dict, Any
-from app.services.vector.embeddings import BaseEmbeddingService, get_embedding_service
-from app.services.vector.store import QdrantVectorStore
-from app.services.vector.store import QdrantVectorStore
+from app.services.vector.embeddings import BaseEmbeddingService, get_embedding_service, get_ingest_embedding_service
+from app.services.vector.store import QdrantVectorStore, point_id_for
+from app.services.vector.async_store import AsyncQdrantVectorStore, get_async_vector_store
 from app.schemas.vector import VectorEmbedding
 from app.services.document.chunker import DocumentChunker
 from app.schemas.document import Document
+from app.core import metrics
+from app.core.config import settings
+from app.services.vector.dedup import MinHashLSHIndex, get_dedup_index, partition_duplicates, reference_of, reference_payload
 
 class RetrievalService:
-    def __init__(self):
+    def __init__(
+        self,
+        embedding_service: Optional[BaseEmbeddingService] = None,
+        vector_store: Optional[QdrantVectorStore] = None,
+        chunker: Optional[DocumentChunker] = None,
+        ingest_embedding_service: Optional[BaseEmbeddingService] = None,
+        dedup_index: Optional[MinHashLSHIndex] = None,
+        async_vector_store: Optional[AsyncQdrantVectorStore] = None,
+    ):
         import logging
         self.logger = logging.getLogger(__name__)
-        self.embedding_service = get_embedding_service()
-        self.embedding_service = get_embedding_service()
-        self.vector_store = QdrantVectorStore()
-        self.chunker = DocumentChunker()
-        
+        self.embedding_service = embedding_service or get_embedding_service()
+        # Resolved lazily so chat-only instances never start the ingestion pool.
+        # An injected query embedder doubles as the ingest embedder unless one is given.
+        self._ingest_embedding_service = ingest_embedding_service or embedding_service
+        self.vector_store = vector_store or QdrantVectorStore()
+        # The shared async client only serves the default collection; an injected
+        # store (e.g. a reindex target) is always used synchronously
+        if async_vector_store is None and vector_store is None:
+            async_vector_store = get_async_vector_store()
+        self.async_vector_store = async_vector_store
+        self.chunker = chunker or DocumentChunker()
+        self._ensured_dim = None
+        # Fixed if injected; otherwise looked up per batch (see dedup_index)
+        self._dedup_index = dedup_index
+
+    @property
+    def ingest_embedding_service(self) -> BaseEmbeddingService:
+        if self._ingest_embedding_service is None:
+            self._ingest_embedding_service = get_ingest_embedding_service()
+        return self._ingest_embedding_service
+
     def index_documents(self, texts: List[str], metadata_list: Optional[List[dict]] = None):
         """
         Generate embeddings and index documents.
@@ -25,37 +53,210 @@ class RetrievalService:
             Document(text=text, metadata=metadata_list[i] if metadata_list else {})
             for i, text in enumerate(texts)
         ]
-        chunked_docs = self.chunker.chunk_documents(raw_docs)
-        self.logger.info(f"Chunked {len(raw_docs)} documents into {len(chunked_docs)} chunks.")
+        chunked_docs = self.chunk_documents(raw_docs)
         
+        # 2. Embed + upsert chunks
+        self.index_chunks(chunked_docs)
+
+    def chunk_documents(self, raw_docs: List[Document]) -> List[Document]:
+        with metrics.timed(metrics.INGEST_CHUNK_SECONDS):
+            chunked_docs = self.chunker.chunk_documents(raw_docs)
+        metrics.INGEST_CHUNKS_TOTAL.inc(len(chunked_docs))
+        self.logger.info(f"Chunked {len(raw_docs)} documents into {len(chunked_docs)} chunks.")
+        return chunked_docs
+
+    def index_chunks(self, chunked_docs: List[Document]) -> int:
+        """
+        Embed already-chunked documents and upsert them. Returns the number of points written.
+
+        Near-duplicates of stored chunks (or of earlier chunks in the batch) are
+        not embedded; their (source, page) is appended to the existing point's
+        `references` instead.
+        """
+        embeddings, added, index = self._prepare(chunked_docs)
+        try:
+            written = self._write(embeddings)
+        except Exception:
+            self._forget(index, added)
+            raise
+        self._mark_ready(index, added)
+        return written
+
+    async def aindex_chunks(self, chunked_docs: List[Document]) -> int:
+        """
+        `index_chunks` for the event loop: embedding and near-duplicate checks
+        run in a worker thread, the upsert on the async client.
+        """
+        store = self.async_vector_store
+        if store is None:
+            return await asyncio.to_thread(self.index_chunks, chunked_docs)
+
+        embeddings, added, index = await asyncio.to_thread(self._prepare, chunked_docs)
+        try:
+            written = 0
+            if embeddings:
+                with metrics.timed(metrics.INGEST_UPSERT_SECONDS):
+                    await store.upsert(embeddings)
+                metrics.INGEST_POINTS_TOTAL.inc(len(embeddings))
+                written = len(embeddings)
+        except Exception:
+            await asyncio.to_thread(self._forget, index, added)
+            raise
+        await asyncio.to_thread(self._mark_ready, index, added)
+        return written
+
+    def _prepare(self, chunked_docs: List[Document]) -> tuple:
+        """
+        Embed the chunks that are not near-duplicates and fold the rest into
+        their existing points' references. Returns (embeddings to upsert, ids
+        added to the dedup index as pending, that index).
+        """
         if not chunked_docs:
-            return
+            return [], [], None
 
-        # 2. Embed chunks
-        chunk_texts = [doc.text for doc in chunked_docs]
-        chunk_metadatas = [doc.metadata for doc in chunked_docs]
-        
-        embeddings = self.embedding_service.embed_batch(chunk_texts, chunk_metadatas)
-        
-        if embeddings:
-            # Check dimension of first embedding to ensure collection exists with correct size
-            dim = len(embeddings[0].vector)
+        pairs = None
+        if self._ensured_dim is None:
+            # First batch: the vector size is needed before the collection (and so the
+            # dedup index next to it) can be trusted, so embed before deduplicating
+            embeddings = self._embed(chunked_docs)
+            if not embeddings:
+                return [], [], None
+            self._ensure_collection(len(embeddings[0].vector))
+            pairs = list(zip(chunked_docs, embeddings))
+
+        index = self.dedup_index
+        if index is None:
+            embeddings = [e for _, e in pairs] if pairs is not None else self._embed(chunked_docs)
+            return embeddings, [], None
+
+        with index.transaction():
+            fresh, duplicates, added = partition_duplicates(index, chunked_docs, point_id_for)
+            if duplicates:
+                # Merged against the stored payload under the index's cross-process lock,
+                # so concurrent writers never drop each other's references
+                missing = self.vector_store.merge_references(
+                    {pid: [reference_of(doc.metadata) for doc in docs] for pid, docs in duplicates.items()}
+                )
+                if missing:
+                    # Deleted since it was indexed: store these chunks as points of their own
+                    index.remove(missing)
+                    orphans = [doc for pid in missing for doc in duplicates[pid]]
+                    for doc in orphans:
+                        doc.metadata.update(reference_payload([reference_of(doc.metadata)]))
+                    fresh.extend(orphans)
+        if len(fresh) < len(chunked_docs):
+            metrics.INGEST_DUPLICATES_TOTAL.inc(len(chunked_docs) - len(fresh))
+            self.logger.info(f"Dedup: {len(chunked_docs) - len(fresh)} of {len(chunked_docs)} chunks are near-duplicates")
+
+        if pairs is not None:
+            fresh_ids = {id(doc) for doc in fresh}
+            embeddings = []
+            for doc, emb in pairs:
+                if id(doc) in fresh_ids:
+                    emb.metadata.update(reference_payload(doc.metadata["references"]))
+                    embeddings.append(emb)
+        else:
+            embeddings = self._embed(fresh)
+        return embeddings, added, index
+
+    def _forget(self, index: Optional[MinHashLSHIndex], added: List[str]):
+        # Forget points that never made it into the store so later copies are not dropped
+        if index is not None and added:
+            index.remove(added)
+
+    def _mark_ready(self, index: Optional[MinHashLSHIndex], added: List[str]):
+        # Only now may other batches and processes fold duplicates into these points
+        if index is not None and added:
+            index.mark_ready(added)
+
+    @property
+    def dedup_index(self) -> Optional[MinHashLSHIndex]:
+        """
+        Near-duplicate index of the collection version currently behind the alias.
+
+        Resolved on every access rather than cached, so a long-lived service
+        moves to the new version's index as soon as a reindex swaps the alias
+        (the old one may already be garbage collected). Callers hold on to
+        the returned index for the rest of a batch.
+        """
+        if self._dedup_index is not None or not settings.DEDUP_ENABLED:
+            return self._dedup_index
+        physical = self.vector_store.resolve_collection() or self.vector_store.collection_name
+        return get_dedup_index(physical)
+
+    def delete_source(self, source: str) -> int:
+        """
+        Remove a document's chunks from the index. Returns the number of points touched.
+        """
+        index = self.dedup_index
+        if index is None:
+            deleted, updated = self.vector_store.delete_source(source)
+            return len(deleted) + len(updated)
+        # Under the index lock: the reference updates are read-modify-write too
+        with index.transaction():
+            deleted, updated = self.vector_store.delete_source(source)
+            index.remove(deleted)
+        return len(deleted) + len(updated)
+
+    def _embed(self, docs: List[Document]) -> List[VectorEmbedding]:
+        if not docs:
+            return []
+        with metrics.timed(metrics.INGEST_EMBED_SECONDS):
+            return self.ingest_embedding_service.embed_batch([doc.text for doc in docs], [doc.metadata for doc in docs])
+
+    def _ensure_collection(self, dim: int):
+        # Only once per size: ensure_collection costs two round trips to Qdrant.
+        if self._ensured_dim != dim:
             self.vector_store.ensure_collection(vector_size=dim)
-            
+            self._ensured_dim = dim
+
+    def _write(self, embeddings: List[VectorEmbedding]) -> int:
+        if not embeddings:
+            return 0
+        self._ensure_collection(len(embeddings[0].vector))
+        with metrics.timed(metrics.INGEST_UPSERT_SECONDS):
             self.vector_store.upsert(embeddings)
-            
-    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[VectorEmbedding]:
+        metrics.INGEST_POINTS_TOTAL.inc(len(embeddings))
+        return len(embeddings)
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+               score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
         """
-        Search for relevant documents.
+        Search for relevant documents. Results carry their similarity `score`.
         """
-        # 1. Embed query
-        query_embedding_obj = self.embedding_service.embed_batch([query])[0]
-        
-        # 2. Search vector store
-        results = self.vector_store.search(
-            query_vector=query_embedding_obj.vector,
-            limit=limit,
-            filters=filters
-        )
-        
-        return results
+        return self.search_by_vector(self.embed_query(query), limit=limit, filters=filters, score_threshold=score_threshold)
+
+    def embed_query(self, query: str) -> List[float]:
+        with metrics.timed(metrics.EMBED_QUERY_SECONDS):
+            return self.embedding_service.embed_batch([query])[0].vector
+
+    async def asearch(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+                      score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
+        # Embedding is CPU-bound: keep it off the event loop
+        query_vector = await asyncio.to_thread(self.embed_query, query)
+        return await self.asearch_by_vector(query_vector, limit=limit, filters=filters, score_threshold=score_threshold)
+
+    async def asearch_by_vector(self, query_vector: List[float], limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+                                score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
+        store = self.async_vector_store
+        if store is None:
+            return await asyncio.to_thread(
+                self.search_by_vector, query_vector, limit=limit, filters=filters, score_threshold=score_threshold
+            )
+        with metrics.timed(metrics.VECTOR_SEARCH_SECONDS):
+            return await store.search(
+                query_vector=query_vector,
+                limit=limit,
+                filters=filters,
+                score_threshold=score_threshold
+            )
+
+    def search_by_vector(self, query_vector: List[float], limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+                         score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
+        with metrics.timed(metrics.VECTOR_SEARCH_SECONDS):
+            return self.vector_store.search(
+                query_vector=query_vector,
+                limit=limit,
+                filters=filters,
+                score_threshold=score_threshold
+            )
@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.vector import VectorEmbedding
+
+# Openers that make a question depend on the previous turn ("what about X?", "and the deadline?")
+_FOLLOW_UP_START = re.compile(
+    r"^(and|but|also|so|then|what about|how about|why|how come|same for|and what|what else|more on)\b",
+    re.IGNORECASE,
+)
+_REFERENCE_WORDS = re.compile(r"\b(it|its|they|them|their|this|that|these|those|he|she|his|her|there)\b", re.IGNORECASE)
+
+
+def condense_query(query: str, history: Optional[List[dict]]) -> str:
+    """
+    Rewrite a follow-up into a standalone retrieval query without an LLM call.
+
+    Short questions that open with a connective or lean on pronouns are
+    prefixed with the previous user question, so "what about for seniors?"
+    retrieves against "Who is eligible for the pension? what about for seniors?".
+    Self-contained questions are returned unchanged.
+    """
+    query = query.strip()
+    previous = next(
+        (turn.get("content", "") for turn in reversed(history or []) if turn.get("role") == "user"),
+        "",
+    ).strip()
+    if not previous or previous == query:
+        return query
+    words = query.split()
+    if _FOLLOW_UP_START.match(query) or (len(words) <= 8 and _REFERENCE_WORDS.search(query)):
+        return f"{previous} {query}"
+    return query
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / denom if denom else 0.0
+
+
+class PrefetchedRetrieval:
+    """
+    Candidates retrieved speculatively for a partial query (POST /search/prefetch),
+    held until the question is submitted or `expires_at` passes.
+    """
+
+    def __init__(self, query: str, query_vector: List[float], chunks: List[VectorEmbedding],
+                 filters: Optional[dict], expires_at: float):
+        self.query = query
+        self.query_vector = query_vector
+        self.chunks = chunks
+        self.filters = filters
+        self.expires_at = expires_at
+
+
+class ConversationSession:
+    """
+    Server-side state of one conversation: recent turns plus the chunk set
+    retrieved for the last query, kept so close follow-ups can reuse it.
+    """
+
+    def __init__(self, session_id: str, max_turns: int = 10):
+        self.id = session_id
+        self.max_turns = max_turns
+        self.turns: List[dict] = []
+        self.query_vector: Optional[List[float]] = None
+        self.chunks: List[VectorEmbedding] = []
+        self.filters: Optional[dict] = None
+        self.prefetched: Optional[PrefetchedRetrieval] = None
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add_turn(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+        del self.turns[:-self.max_turns]
+
+    def reusable_chunks(self, query_vector: List[float], filters: Optional[dict], threshold: float) -> Optional[List[VectorEmbedding]]:
+        if not self.chunks or self.query_vector is None or filters != self.filters:
+            return None
+        if cosine_similarity(query_vector, self.query_vector) < threshold:
+            return None
+        return self.chunks
+
+    def remember(self, query_vector: List[float], chunks: List[VectorEmbedding], filters: Optional[dict]):
+        self.query_vector = query_vector
+        self.chunks = chunks
+        self.filters = filters
+
+    def park(self, query: str, query_vector: List[float], chunks: List[VectorEmbedding],
+             filters: Optional[dict], ttl_seconds: float):
+        self.prefetched = PrefetchedRetrieval(query, query_vector, chunks, filters, time.monotonic() + ttl_seconds)
+
+    def _live_prefetch(self) -> Optional[PrefetchedRetrieval]:
+        if self.prefetched is not None and time.monotonic() >= self.prefetched.expires_at:
+            self.prefetched = None
+        return self.prefetched
+
+    def prefetched_vector(self, query: str, filters: Optional[dict]) -> Optional[List[float]]:
+        """
+        The parked query vector if `query` is exactly the prefetched text, so it need not be embedded again.
+        """
+        prefetched = self._live_prefetch()
+        if prefetched is None or prefetched.query != query or prefetched.filters != filters:
+            return None
+        return prefetched.query_vector
+
+    def take_prefetched(self, query_vector: List[float], filters: Optional[dict], threshold: float) -> Optional[List[VectorEmbedding]]:
+        """
+        Hand over the parked candidates if the submitted query is close enough
+        to the prefetched one. A prefetch is used at most once.
+        """
+        prefetched = self._live_prefetch()
+        if prefetched is None or filters != prefetched.filters:
+            return None
+        if cosine_similarity(query_vector, prefetched.query_vector) < threshold:
+            return None
+        self.prefetched = None
+        return prefetched.chunks
+
+
+class SessionStore:
+    """
+    In-process, bounded session store: least recently used sessions are
+    evicted past `max_sessions`, and sessions idle longer than `ttl_seconds` expire.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, max_turns: int = 10):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.updated_at <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.updated_at = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ConversationSession:
+        session = self.get(session_id) if session_id else None
+        if session is not None:
+            return session
+        session = ConversationSession(session_id or uuid.uuid4().hex, max_turns=self.max_turns)
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore(
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+    ttl_seconds=settings.SESSION_TTL_SECONDS,
+    max_turns=settings.SESSION_MAX_TURNS,
+)
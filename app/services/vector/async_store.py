@@ -0,0 +1,178 @@
+"""
+Awaitable vector store for the request paths (chat search, ingestion upserts).
+
+Wraps AsyncQdrantClient over gRPC by default. Vectors go over the wire as
+packed floats rather than JSON, and a pool of VECTOR_DB_POOL_SIZE channels
+(or HTTP connections when gRPC is off) is shared by every request. The
+process-wide instance is opened in the app lifespan and closed at shutdown.
+Collection management (aliases, reindexing, payload indexes) stays on the
+synchronous QdrantVectorStore.
+
+Local-path Qdrant storage can only be opened by one client per process, and
+the synchronous client already holds it. In that mode no async store is
+opened, and callers run the synchronous store in a worker thread instead.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.schemas.vector import VectorEmbedding
+from app.services.vector.store import (
+    _build_filter,
+    _docstore_for,
+    _drop_texts,
+    _matryoshka_dims,
+    _point_structs,
+    _put_texts,
+    _query_request,
+    _search_results,
+    _vector_layout,
+    point_id_for,
+)
+from app.services.vector.write_gate import async_shared_writes
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncQdrantVectorStore:
+    def __init__(self, client, collection_name: Optional[str] = None):
+        self.client = client
+        # Usually an alias over versioned physical collections (<name>_v1, <name>_v2, ...)
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION_NAME
+
+    @classmethod
+    def connect(cls, collection_name: Optional[str] = None) -> "AsyncQdrantVectorStore":
+        from qdrant_client import AsyncQdrantClient
+        client = AsyncQdrantClient(
+            url=str(settings.VECTOR_DB_URL),
+            api_key=settings.VECTOR_DB_API_KEY,
+            prefer_grpc=settings.VECTOR_DB_PREFER_GRPC,
+            grpc_port=settings.VECTOR_DB_GRPC_PORT,
+            pool_size=settings.VECTOR_DB_POOL_SIZE,
+            # The synchronous client already checks the server version at start-up
+            check_compatibility=False,
+        )
+        return cls(client, collection_name)
+
+    @property
+    def docstore(self):
+        return _docstore_for(self.collection_name)
+
+    async def resolve_collection(self) -> Optional[str]:
+        for alias in (await self.client.get_aliases()).aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        if await self.client.collection_exists(self.collection_name):
+            return self.collection_name
+        return None
+
+    async def matryoshka_dim(self, refresh: bool = False) -> Optional[int]:
+        """
+        Same cache as QdrantVectorStore.matryoshka_dim.
+        """
+        if refresh or self.collection_name not in _matryoshka_dims:
+            target = await self.resolve_collection()
+            if target is None:
+                return None
+            info = await self.client.get_collection(target)
+            _matryoshka_dims[self.collection_name] = _vector_layout(info.config.params.vectors)[1]
+        return _matryoshka_dims[self.collection_name]
+
+    async def _with_layout(self, operation):
+        dim = await self.matryoshka_dim()
+        try:
+            return await operation(dim)
+        except Exception:
+            # Another process may have reindexed the alias into a different vector layout
+            fresh = await self.matryoshka_dim(refresh=True)
+            if fresh == dim:
+                raise
+            return await operation(fresh)
+
+    async def upsert(self, embeddings: List[VectorEmbedding]):
+        if not embeddings:
+            return
+
+        ids = [point_id_for(emb.text) for emb in embeddings]
+        docstore = self.docstore
+        async with async_shared_writes(self.collection_name):
+            # SQLite can wait on another process's write lock: keep it off the event loop
+            added = await asyncio.to_thread(_put_texts, docstore, ids, embeddings)
+            try:
+                await self._with_layout(lambda dim: self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=_point_structs(ids, embeddings, dim, with_text=docstore is None)
+                ))
+            except Exception:
+                await asyncio.to_thread(_drop_texts, docstore, added)
+                raise
+
+    async def set_payloads(self, payloads: Dict[str, dict]):
+        async with async_shared_writes(self.collection_name):
+            for point_id, payload in payloads.items():
+                await self.client.set_payload(
+                    collection_name=self.collection_name,
+                    payload=payload,
+                    points=[point_id]
+                )
+
+    async def search(self, query_vector: List[float], limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+                     score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
+        query_filter = _build_filter(filters)
+        with_text = self.docstore is None
+
+        async def query(dim):
+            response = await self.client.query_points(
+                **_query_request(self.collection_name, query_vector, dim, query_filter, limit, score_threshold, with_text)
+            )
+            return response.points
+
+        results = await self._with_layout(query)
+        if with_text:
+            texts = {str(hit.id): hit.payload.get("text", "") for hit in results}
+        else:
+            texts = await self.fetch_texts([str(hit.id) for hit in results])
+        return _search_results(results, texts, filters)
+
+    async def fetch_texts(self, point_ids: List[str]) -> Dict[str, str]:
+        docstore = self.docstore
+        texts = await asyncio.to_thread(docstore.get_many, point_ids) if docstore is not None else {}
+        missing = [pid for pid in point_ids if pid not in texts]
+        if missing:
+            for point in await self.client.retrieve(
+                collection_name=self.collection_name, ids=missing, with_payload=["text"], with_vectors=False
+            ):
+                texts[str(point.id)] = (point.payload or {}).get("text", "")
+        return texts
+
+    async def close(self):
+        await self.client.close()
+
+
+_async_store: Optional[AsyncQdrantVectorStore] = None
+
+
+def open_async_vector_store() -> Optional[AsyncQdrantVectorStore]:
+    """
+    Create the process-wide async store. Call once, from the running event loop
+    (gRPC channels bind to it). Returns None for local-path Qdrant.
+    """
+    global _async_store
+    if _async_store is None and str(settings.VECTOR_DB_URL).startswith("http"):
+        _async_store = AsyncQdrantVectorStore.connect()
+        logger.info(
+            f"Async Qdrant client ready (grpc={settings.VECTOR_DB_PREFER_GRPC}, pool={settings.VECTOR_DB_POOL_SIZE})"
+        )
+    return _async_store
+
+
+def get_async_vector_store() -> Optional[AsyncQdrantVectorStore]:
+    return _async_store
+
+
+async def close_async_vector_store():
+    global _async_store
+    if _async_store is not None:
+        store, _async_store = _async_store, None
+        await store.close()
@@ -0,0 +1,281 @@
+"""
+Ingest-time near-duplicate detection with MinHash signatures and an LSH index.
+
+Each chunk gets a MinHash signature over its word shingles. Signatures are
+split into bands; chunks sharing any band bucket are candidates, and a
+candidate whose estimated Jaccard similarity clears the threshold is a
+near-duplicate. The index maps every stored point to its signature; the
+(source, page) references of all the chunks a point stands for live in its
+Qdrant payload. The index is an SQLite file next to the collection,
+`<collection>.minhash.sqlite`, shared by every process that writes to it.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: candidates from roughly 0.7 Jaccard upwards
+SHINGLE_WORDS = 5
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD = re.compile(r"\w+")
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> List[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in set(shingles(text))), dtype=np.uint64
+    )
+    if hashes.size == 0:
+        return np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # (a * x + b) mod p with 32-bit x and a, b: a * x fits in uint64
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def reference_of(metadata: dict) -> dict:
+    return {"source": metadata.get("source", "Unknown"), "page": metadata.get("page", 0)}
+
+
+def reference_payload(references: List[dict]) -> dict:
+    """
+    Payload for a point standing in for `references`. A point shared by several
+    documents stores `source` as a list, so keyword filters on any of them match.
+    """
+    sources = list(dict.fromkeys(ref["source"] for ref in references))
+    return {"references": references, "source": sources[0] if len(sources) == 1 else sources}
+
+
+class MinHashLSHIndex:
+    """
+    Signatures and LSH band buckets in SQLite, so every worker process and
+    the ingest CLI share one index per collection (WAL mode, like the
+    docstore). Write transactions (`transaction`) are serialized across
+    processes; references are not kept here but in the points' payloads.
+
+    A point becomes matchable once it is `ready`: ingest adds its new
+    points pending and marks them ready after the upsert succeeds, so no
+    process folds a chunk into a point that may never be written.
+    """
+
+    def __init__(self, path: Optional[Path] = None, threshold: float = 0.85):
+        """
+        `path=None` keeps the index in memory (for tests and in-memory Qdrant).
+        """
+        self.path = path
+        self.threshold = threshold
+        self._rows = NUM_PERM // BANDS
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Writers hold the lock across a Qdrant round trip (see `transaction`)
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS points (id TEXT PRIMARY KEY, signature BLOB NOT NULL, ready INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER, key BLOB, id TEXT, PRIMARY KEY (band, key, id)) WITHOUT ROWID"
+        )
+        # Re-entrant: helpers called inside `transaction` take it again
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the index's write lock, across threads and processes, until the
+        block ends. Changes made in the block commit together, or not at all
+        if it raises. Nested use joins the outer transaction.
+        """
+        with self._lock:
+            if self._conn.in_transaction:
+                yield
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(BANDS):
+            yield band, signature[band * self._rows:(band + 1) * self._rows].tobytes()
+
+    def find(self, signature: np.ndarray, pending: Iterable[str] = ()) -> Optional[str]:
+        """
+        Return the id of the most similar ready point at or above the threshold.
+        Ids in `pending` (the caller's own unwritten points) count as ready.
+        """
+        pending = set(pending)
+        best, best_score = None, self.threshold
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(row[0] for row in self._conn.execute(
+                    "SELECT id FROM bands WHERE band = ? AND key = ?", (band, key)
+                ))
+            for point_id in candidates:
+                row = self._conn.execute("SELECT signature, ready FROM points WHERE id = ?", (point_id,)).fetchone()
+                if row is None or not (row[1] or point_id in pending):
+                    continue
+                score = estimated_jaccard(signature, np.frombuffer(row[0], dtype=np.uint64))
+                if score >= best_score:
+                    best, best_score = point_id, score
+        return best
+
+    def add(self, point_id: str, signature: np.ndarray, ready: bool = True):
+        signature = np.asarray(signature, dtype=np.uint64)
+        with self.transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO points (id, signature, ready) VALUES (?, ?, ?)",
+                (point_id, signature.tobytes(), int(ready)),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bands (band, key, id) VALUES (?, ?, ?)",
+                [(band, key, point_id) for band, key in self._band_keys(signature)],
+            )
+
+    def mark_ready(self, point_ids: Iterable[str]):
+        with self.transaction():
+            self._conn.executemany("UPDATE points SET ready = 1 WHERE id = ?", [(pid,) for pid in point_ids])
+
+    def remove(self, point_ids: Iterable[str]):
+        with self.transaction():
+            for point_id in point_ids:
+                row = self._conn.execute("SELECT signature FROM points WHERE id = ?", (point_id,)).fetchone()
+                if row is None:
+                    continue
+                signature = np.frombuffer(row[0], dtype=np.uint64)
+                self._conn.executemany(
+                    "DELETE FROM bands WHERE band = ? AND key = ? AND id = ?",
+                    [(band, key, point_id) for band, key in self._band_keys(signature)],
+                )
+                self._conn.execute("DELETE FROM points WHERE id = ?", (point_id,))
+
+    def clear(self):
+        with self.transaction():
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute("DELETE FROM points")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def index_path(collection_name: str) -> Path:
+    """
+    Local-path Qdrant: inside the storage directory. Server Qdrant: DEDUP_INDEX_DIR.
+    """
+    url = str(settings.VECTOR_DB_URL)
+    base = settings.DEDUP_INDEX_DIR if url.startswith("http") else Path(url)
+    return Path(base) / f"{collection_name}.minhash.sqlite"
+
+
+_indexes: Dict[str, MinHashLSHIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_dedup_index(collection_name: str) -> MinHashLSHIndex:
+    index = _indexes.get(collection_name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(collection_name)
+            if index is None:
+                path = None if str(settings.VECTOR_DB_URL) == ":memory:" else index_path(collection_name)
+                index = _indexes[collection_name] = MinHashLSHIndex(path, settings.DEDUP_THRESHOLD)
+                logger.info(f"Opened near-duplicate index for {collection_name} at {path or ':memory:'}")
+    return index
+
+
+def reset_dedup_index(collection_name: str):
+    index = get_dedup_index(collection_name)
+    with index.transaction():
+        if len(index):
+            logger.info(f"Clearing near-duplicate index for new collection {collection_name}")
+            index.clear()
+
+
+def drop_dedup_index(collection_name: str):
+    """
+    Forget the index of a dropped collection, including its file.
+    """
+    with _indexes_lock:
+        _indexes.pop(collection_name, None)
+    # Services still holding the index keep working on the unlinked file until they let go
+    path = index_path(collection_name)
+    for file in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+        if file.exists():
+            file.unlink()
+
+
+def close_dedup_indexes():
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
+
+
+def partition_duplicates(index: MinHashLSHIndex, chunks, point_id_fn) -> Tuple[list, Dict[str, list], List[str]]:
+    """
+    Split `chunks` (objects with .text and .metadata) into new chunks and
+    near-duplicates of stored points. Call inside `index.transaction()`.
+
+    New chunks are added to the index as pending points (so duplicates later
+    in the same batch collapse onto them) and get a `references` list in
+    their metadata (see `reference_payload`). Returns (new_chunks, {existing
+    point id: its duplicate chunks}, ids added) - the caller merges the
+    duplicates' references into the stored points, marks the added ids ready
+    once they are written and removes them if the upsert fails.
+    """
+    fresh: Dict[str, tuple] = {}
+    duplicates: Dict[str, list] = {}
+    for chunk in chunks:
+        signature = minhash_signature(chunk.text)
+        reference = reference_of(chunk.metadata)
+        match = index.find(signature, pending=fresh)
+        if match in fresh:
+            # Duplicates of a point added in this batch just extend its payload before upsert
+            refs = fresh[match][1]
+            if reference not in refs:
+                refs.append(reference)
+        elif match is not None:
+            duplicates.setdefault(match, []).append(chunk)
+        else:
+            point_id = point_id_fn(chunk.text)
+            index.add(point_id, signature, ready=False)
+            fresh[point_id] = (chunk, [reference])
+    for chunk, refs in fresh.values():
+        chunk.metadata.update(reference_payload(refs))
+    return [chunk for chunk, _ in fresh.values()], duplicates, list(fresh)
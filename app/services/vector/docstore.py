@@ -0,0 +1,160 @@
+"""
+Chunk text stored outside Qdrant, zlib-compressed in SQLite.
+
+Point ids are derived from the chunk text (see `point_id_for`), so one
+docstore per logical collection serves every versioned physical collection
+behind its alias: a reindex re-uses the same ids. Qdrant payloads then only
+hold the filterable metadata, and searches fetch the text of their hits in
+one batched lookup. Several worker processes can share the file (WAL mode).
+
+Points written before the docstore existed still carry `text` in their
+payload; readers fall back to it for ids the docstore does not know.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on bound parameters is 999 in older builds
+_BATCH = 500
+_VERSION_SUFFIX = re.compile(r"_v\d+$")
+
+
+class DocStore:
+    def __init__(self, path: Optional[Path] = None, level: int = 6):
+        """
+        `path=None` keeps the store in memory (for in-memory Qdrant).
+        """
+        self.path = path
+        self.level = level
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text BLOB NOT NULL) WITHOUT ROWID")
+        self._lock = threading.Lock()
+
+    def put_many(self, texts: Dict[str, str]):
+        if not texts:
+            return
+        rows = [(pid, zlib.compress(text.encode("utf-8"), self.level)) for pid, text in texts.items()]
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO chunks (id, text) VALUES (?, ?)", rows)
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Text of every known id in `ids`; unknown ids are left out.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), _BATCH):
+                batch = ids[i:i + _BATCH]
+                rows = self._conn.execute(
+                    f"SELECT id, text FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(rows)
+        return {pid: zlib.decompress(blob).decode("utf-8") for pid, blob in found.items()}
+
+    def known(self, ids: Iterable[str]) -> Set[str]:
+        """
+        The ids in `ids` that have text stored.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = set()
+        with self._lock:
+            for i in range(0, len(ids), _BATCH):
+                batch = ids[i:i + _BATCH]
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ))
+        return found
+
+    def delete_many(self, ids: Iterable[str]) -> int:
+        ids = list(ids)
+        deleted = 0
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for i in range(0, len(ids), _BATCH):
+                    batch = ids[i:i + _BATCH]
+                    deleted += self._conn.execute(
+                        f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                    ).rowcount
+        return deleted
+
+    def ids(self) -> Iterator[List[str]]:
+        """
+        Yield every stored id, a batch at a time.
+        """
+        last = ""
+        while True:
+            with self._lock:
+                batch = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (last, _BATCH)
+                )]
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def logical_name(collection_name: str) -> str:
+    """
+    The alias a versioned collection (`<name>_v<N>`) belongs to.
+    """
+    return _VERSION_SUFFIX.sub("", collection_name)
+
+
+def docstore_path(name: str) -> Optional[Path]:
+    """
+    Local-path Qdrant: inside the storage directory. Server Qdrant: DOCSTORE_DIR.
+    In-memory Qdrant gets an in-memory docstore (None).
+    """
+    url = str(settings.VECTOR_DB_URL)
+    if url == ":memory:":
+        return None
+    base = settings.DOCSTORE_DIR if url.startswith("http") else Path(url)
+    return Path(base) / f"{name}.docstore.sqlite"
+
+
+_docstores: Dict[str, DocStore] = {}
+_docstores_lock = threading.Lock()
+
+
+def get_docstore(collection_name: str) -> DocStore:
+    name = logical_name(collection_name)
+    store = _docstores.get(name)
+    if store is None:
+        with _docstores_lock:
+            store = _docstores.get(name)
+            if store is None:
+                store = _docstores[name] = DocStore(docstore_path(name))
+                logger.info(f"Opened docstore for {name} at {store.path or ':memory:'}")
+    return store
+
+
+def close_docstores():
+    with _docstores_lock:
+        for store in _docstores.values():
+            store.close()
+        _docstores.clear()
@@ -0,0 +1,215 @@
+"""
+Shared embedding sidecar for multi-worker deployments.
+
+Loads the embedding model once per node and serves every API worker over a
+Unix socket, micro-batching concurrent requests into single model calls.
+
+    python -m app.services.vector.embedding_server --socket /tmp/rag-embed.sock
+    EMBEDDING_SERVER_SOCKET=/tmp/rag-embed.sock uvicorn app.main:app --workers 4
+
+Wire format (both directions): a 4-byte big-endian header length, then a
+JSON header. Requests are {"texts": [...]}; responses are {"count", "dim"}
+(or {"error"}) followed by count*dim little-endian float32 values, which
+the client maps straight into a numpy array without copying.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">I")
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+
+def encode_header(payload: dict) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+async def read_header(reader: asyncio.StreamReader) -> dict:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_HEADER_BYTES:
+        raise ValueError(f"Header too large: {length}")
+    return json.loads(await reader.readexactly(length))
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests and embeds them together.
+    A batch is flushed when it reaches `max_batch` texts or the oldest
+    request has waited `max_wait_ms`.
+    """
+
+    def __init__(self, embed_fn, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [t for item_texts, _ in pending for t in item_texts]
+            try:
+                # Model runs in a thread so the loop keeps accepting requests meanwhile
+                vectors = await loop.run_in_executor(None, self.embed_fn, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for item_texts, future in pending:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class EmbeddingServer:
+    def __init__(self, socket_path: str, embed_fn, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.socket_path = socket_path
+        self.batcher = MicroBatcher(embed_fn, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_header(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                texts = request.get("texts") or []
+                try:
+                    vectors = await self.batcher.submit(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+                except Exception as e:
+                    writer.write(encode_header({"error": str(e)}))
+                    await writer.drain()
+                    continue
+                vectors = np.ascontiguousarray(vectors, dtype="<f4")
+                count, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+                writer.write(encode_header({"count": count, "dim": dim}))
+                writer.write(memoryview(vectors).cast("B"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        batcher_task = asyncio.create_task(self.batcher.run())
+        logger.info(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class RemoteEmbeddingClient:
+    """
+    Blocking client for EmbeddingServer. One connection per instance;
+    not thread-safe (RemoteEmbeddingService keeps one per thread).
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+
+    def _connect(self):
+        import socket
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._sock = sock
+
+    def _recv_exact(self, size: int) -> bytearray:
+        buf = bytearray(size)
+        view = memoryview(buf)
+        received = 0
+        while received < size:
+            n = self._sock.recv_into(view[received:], size - received)
+            if n == 0:
+                raise ConnectionError("Embedding server closed the connection")
+            received += n
+        return buf
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._sock is None:
+            self._connect()
+        try:
+            self._sock.sendall(encode_header({"texts": texts}))
+            (length,) = HEADER.unpack(self._recv_exact(HEADER.size))
+            header = json.loads(self._recv_exact(length))
+            if "error" in header:
+                raise RuntimeError(f"Embedding server error: {header['error']}")
+            count, dim = header["count"], header["dim"]
+            payload = self._recv_exact(count * dim * 4)
+        except (OSError, ConnectionError):
+            self.close()
+            raise
+        return np.frombuffer(payload, dtype="<f4").reshape(count, dim)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve embeddings to API workers over a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/rag-embed.sock"))
+    parser.add_argument("--max-batch", type=int, default=256, help="Flush a batch at this many texts.")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Max time a request waits for batch-mates.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from app.services.vector.embeddings import TinyLocalEmbeddingService
+    from app.core.config import settings
+
+    start = time.perf_counter()
+    model = TinyLocalEmbeddingService().model
+    logger.info(f"Model loaded in {time.perf_counter() - start:.1f}s")
+
+    def embed_fn(texts: List[str]) -> np.ndarray:
+        return np.asarray(list(model.embed(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)), dtype=np.float32)
+
+    asyncio.run(EmbeddingServer(args.socket, embed_fn, args.max_batch, args.max_wait_ms).serve())
+
+
+if __name__ == "__main__":
+    main()
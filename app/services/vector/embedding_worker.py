@@ -0,0 +1,31 @@
+"""
+Worker-process side of ParallelEmbeddingService.
+
+Kept free of app imports so spawned workers start quickly and do not need
+the API settings; each worker owns one ONNX session with pinned intra-op threads.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+
+_model = None
+_batch_size = 64
+
+
+def init_worker(model_name: str, threads: int, batch_size: int, load_kwargs: Optional[dict] = None):
+    global _model, _batch_size
+    # Pin BLAS/OpenMP pools too, otherwise every worker grabs all cores
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    from fastembed import TextEmbedding
+    _model = TextEmbedding(model_name=model_name, threads=threads, **(load_kwargs or {}))
+    _batch_size = batch_size
+
+
+def embed_shard(texts: List[str]) -> np.ndarray:
+    """
+    Embed one contiguous shard; returns a (len(texts), dim) float32 array.
+    """
+    vectors = list(_model.embed(texts, batch_size=_batch_size))
+    return np.asarray(vectors, dtype=np.float32)
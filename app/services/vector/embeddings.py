@@ -1,12 +1,24 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional, Union
+import threading
 # from groq import Groq # Switching to local
 from app.core.config import settings
 from app.schemas.vector import VectorEmbedding
-from fastembed import TextEmbedding
-from functools import lru_cache
+# fastembed (and onnxruntime) are imported inside the services: they dominate cold-start import time.
 
 
+def model_load_kwargs(model_name: str) -> dict:
+    """
+    Keyword arguments for fastembed's TextEmbedding.
+    Models live in EMBEDDING_CACHE_DIR (populated by download_model.py); once
+    that directory holds this model we never go to the network for it again.
+    """
+    cache_dir = settings.EMBEDDING_CACHE_DIR
+    kwargs = {"cache_dir": str(cache_dir)}
+    short_name = model_name.split("/")[-1]
+    if cache_dir.is_dir() and any(short_name in p.name for p in cache_dir.iterdir()):
+        kwargs["local_files_only"] = True
+    return kwargs
 
 class BaseEmbeddingService(ABC):
     @abstractmethod
@@ -18,8 +30,9 @@ class FastEmbedEmbeddingService(BaseEmbeddingService):
         # "nomic-ai/nomic-embed-text-v1.5" is a good balance of speed/quality (768 dim)
         import logging
         self.logger = logging.getLogger(__name__)
+        from fastembed import TextEmbedding
         self.logger.info(f"Loading FastEmbed model: {model_name}...")
-        self.model = TextEmbedding(model_name=model_name)
+        self.model = TextEmbedding(model_name=model_name, **model_load_kwargs(model_name))
         self.logger.info("FastEmbed model loaded successfully.")
 
     def embed_batch(self, texts: List[str], metadata_list: Optional[List[dict]] = None) -> List[VectorEmbedding]:
@@ -114,29 +127,178 @@ class GroqEmbeddingService(BaseEmbeddingService):
 # all-MiniLM-L6-v2 is standard.
 
 class TinyLocalEmbeddingService(BaseEmbeddingService):
+    # This model is ~22MB - 80MB. Very small.
+    MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
     def __init__(self):
         from fastembed import TextEmbedding
         import logging
         self.logger = logging.getLogger(__name__)
-        # This model is ~22MB - 80MB. Very small.
-        self.model_name = "BAAI/bge-small-en-v1.5" 
+        self.model_name = self.MODEL_NAME
         self.logger.info(f"Loading Tiny Local Model: {self.model_name}...")
-        self.model = TextEmbedding(model_name=self.model_name)
+        self.model = TextEmbedding(
+            model_name=self.model_name,
+            threads=settings.EMBEDDING_QUERY_THREADS,
+            **model_load_kwargs(self.model_name)
+        )
         self.logger.info("Tiny model loaded.")
 
     def embed_batch(self, texts: List[str], metadata_list: Optional[List[dict]] = None) -> List[VectorEmbedding]:
          # Same logic as FastEmbed
-         embeddings = list(self.model.embed(texts))
+         embeddings = list(self.model.embed(texts, batch_size=settings.EMBEDDING_BATCH_SIZE))
          results = []
          for i, v in enumerate(embeddings):
              meta = metadata_list[i] if metadata_list and i < len(metadata_list) else {}
              results.append(VectorEmbedding(text=texts[i], vector=v.tolist(), metadata=meta))
          return results
 
-@lru_cache()
+class ParallelEmbeddingService(BaseEmbeddingService):
+    """
+    Bulk-ingestion embedder: shards a chunk list across a pool of worker
+    processes, each with its own ONNX session and pinned intra-op threads,
+    and reassembles the vectors in input order.
+
+    Kept separate from the query-path model so large uploads cannot starve
+    chat requests of embedding capacity.
+    """
+
+    def __init__(
+        self,
+        model_name: str = TinyLocalEmbeddingService.MODEL_NAME,
+        workers: int = 2,
+        threads_per_worker: int = 1,
+        batch_size: int = 64,
+        executor=None,
+    ):
+        import logging
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers
+        self.batch_size = batch_size
+        if executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from app.services.vector import embedding_worker
+            # spawn, not fork: forking after onnxruntime has started threads is unsafe
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=embedding_worker.init_worker,
+                initargs=(model_name, threads_per_worker, batch_size, model_load_kwargs(model_name)),
+            )
+            self.logger.info(f"Started {workers} embedding workers x {threads_per_worker} threads for {model_name}")
+        self.executor = executor
+
+    def shard(self, count: int) -> List[tuple]:
+        """
+        Contiguous (start, end) ranges: at most one per worker, and never
+        smaller than one model batch so tiny inputs don't pay IPC per worker.
+        """
+        if count == 0:
+            return []
+        per_shard = max(self.batch_size, -(-count // self.workers))
+        return [(start, min(start + per_shard, count)) for start in range(0, count, per_shard)]
+
+    def embed_batch(self, texts: List[str], metadata_list: Optional[List[dict]] = None) -> List[VectorEmbedding]:
+        if not texts:
+            return []
+        from app.services.vector import embedding_worker
+
+        shards = [texts[start:end] for start, end in self.shard(len(texts))]
+        # map() yields in submission order, so output order matches input order
+        results = []
+        i = 0
+        for vectors in self.executor.map(embedding_worker.embed_shard, shards):
+            for v in vectors:
+                meta = metadata_list[i] if metadata_list and i < len(metadata_list) else {}
+                results.append(VectorEmbedding(text=texts[i], vector=v.tolist(), metadata=meta))
+                i += 1
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class RemoteEmbeddingService(BaseEmbeddingService):
+    """
+    Client for the shared embedding sidecar (embedding_server.py). Every API
+    worker talks to the one model loaded by the sidecar, so memory per node
+    stays flat as workers are added and requests from all workers batch together.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 60.0):
+        import logging
+        self.logger = logging.getLogger(__name__)
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # One connection per thread: requests on a connection are strictly sequential
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from app.services.vector.embedding_server import RemoteEmbeddingClient
+            client = RemoteEmbeddingClient(self.socket_path, timeout=self.timeout)
+            self._local.client = client
+        return client
+
+    def embed_batch(self, texts: List[str], metadata_list: Optional[List[dict]] = None) -> List[VectorEmbedding]:
+        if not texts:
+            return []
+        try:
+            vectors = self._client().embed(texts)
+        except (OSError, ConnectionError) as e:
+            # The sidecar may have restarted; retry once on a fresh connection
+            self.logger.warning(f"Embedding server connection failed ({e}); reconnecting...")
+            vectors = self._client().embed(texts)
+
+        results = []
+        for i, v in enumerate(vectors):
+            meta = metadata_list[i] if metadata_list and i < len(metadata_list) else {}
+            results.append(VectorEmbedding(text=texts[i], vector=v.tolist(), metadata=meta))
+        return results
+
+# Process-wide singleton. Guarded by a lock because the start-up warm-up thread
+# and early requests may race to load the model.
+_embedding_service: Optional[BaseEmbeddingService] = None
+_embedding_service_lock = threading.Lock()
+
 def get_embedding_service() -> BaseEmbeddingService:
-    # Switch to Tiny Local Service to avoid 600MB download
-    return TinyLocalEmbeddingService()
-    # return OpenAIEmbeddingService()
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                if settings.EMBEDDING_SERVER_SOCKET:
+                    # Shared sidecar: no model in this worker's memory
+                    _embedding_service = RemoteEmbeddingService(settings.EMBEDDING_SERVER_SOCKET)
+                else:
+                    # Switch to Tiny Local Service to avoid 600MB download
+                    _embedding_service = TinyLocalEmbeddingService()
+                    # _embedding_service = OpenAIEmbeddingService()
+    return _embedding_service
+
+
+
+_ingest_embedding_service: Optional[BaseEmbeddingService] = None
 
+def get_ingest_embedding_service() -> BaseEmbeddingService:
+    """
+    Embedder for bulk ingestion. Uses a process pool when EMBEDDING_INGEST_WORKERS > 1,
+    otherwise shares the query-path model.
+    """
+    global _ingest_embedding_service
+    if settings.EMBEDDING_INGEST_WORKERS <= 1:
+        return get_embedding_service()
+    if _ingest_embedding_service is None:
+        with _embedding_service_lock:
+            if _ingest_embedding_service is None:
+                _ingest_embedding_service = ParallelEmbeddingService(
+                    workers=settings.EMBEDDING_INGEST_WORKERS,
+                    threads_per_worker=settings.EMBEDDING_INGEST_THREADS_PER_WORKER,
+                    batch_size=settings.EMBEDDING_BATCH_SIZE,
+                )
+    return _ingest_embedding_service
 
+def shutdown_embedding_services():
+    global _ingest_embedding_service
+    if isinstance(_ingest_embedding_service, ParallelEmbeddingService):
+        _ingest_embedding_service.close()
+    _ingest_embedding_service = None
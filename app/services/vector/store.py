@@ -1,8 +1,8 @@
+import math
 from typing import List, Optional, Dict, Any
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
 from app.core.config import settings
 from app.schemas.vector import VectorEmbedding
+from app.services.vector.write_gate import shared_writes
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,13 +10,42 @@ logger = logging.getLogger(__name__)
 # Global client instance for local mode concurrency handling
 _client_instance = None
 
+# Named vectors of a two-stage (Matryoshka) collection: a truncated prefix that is
+# searched, and the full embedding that only rescores the prefetched candidates
+FULL_VECTOR = "full"
+MATRYOSHKA_VECTOR = "mrl"
+# Truncated size per collection name (None: a single unnamed full-size vector)
+_matryoshka_dims: Dict[str, Optional[int]] = {}
+
+def point_id_for(text: str) -> str:
+    # uuid5 of the text keeps upserts idempotent
+    import uuid
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, text))
+
+class CollectionSchemaError(ValueError):
+    """
+    The live collection cannot hold vectors of the requested size or layout; run a reindex.
+    """
+
+
+def _vector_layout(vectors_config) -> tuple:
+    """
+    (full size, truncated size or None) of a collection's vectors config.
+    """
+    if isinstance(vectors_config, dict):
+        return vectors_config[FULL_VECTOR].size, vectors_config[MATRYOSHKA_VECTOR].size
+    return vectors_config.size, None
+
+
 class QdrantVectorStore:
-    def __init__(self):
+    def __init__(self, collection_name: Optional[str] = None):
         global _client_instance
         
         if _client_instance:
             self.client = _client_instance
         else:
+            # Imported lazily: qdrant_client adds over a second to app import time
+            from qdrant_client import QdrantClient
             url = str(settings.VECTOR_DB_URL)
             if url.startswith("http"):
                 self.client = QdrantClient(url=url, api_key=settings.VECTOR_DB_API_KEY)
@@ -26,120 +55,506 @@ class QdrantVectorStore:
             # Cache the instance
             _client_instance = self.client
         
-        self.collection_name = settings.VECTOR_COLLECTION_NAME
+        # Usually an alias over versioned physical collections (<name>_v1, <name>_v2, ...)
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION_NAME
+
+    def for_collection(self, name: str) -> "QdrantVectorStore":
+        """
+        A store on the same client that reads and writes `name` directly.
+        """
+        import copy
+        other = copy.copy(self)
+        other.collection_name = name
+        return other
 
+    @property
+    def docstore(self):
+        """
+        Where chunk text lives (shared by every version of this collection),
+        or None with the docstore off (see `docstore_enabled`), in which case text stays in the payload.
+        """
+        return _docstore_for(self.collection_name)
+
+    def resolve_collection(self) -> Optional[str]:
+        """
+        Physical collection behind `collection_name`: the alias target, the
+        collection itself for pre-alias installs, or None if neither exists.
+        """
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        if self.client.collection_exists(self.collection_name):
+            return self.collection_name
+        return None
 
-    def ensure_collection(self, vector_size: int = 768):
+    def ensure_collection(self, vector_size: int = 768,
+                          matryoshka_dim: Optional[int] = settings.VECTOR_MATRYOSHKA_DIM) -> bool:
         """
         Create collection if it doesn't exist.
-        If it exists but has wrong vector size, delete and recreate.
+        A fresh install gets `<name>_v1` behind the alias `<name>`, so a reindex
+        can later swap versions without downtime. If the live collection has a
+        different vector size or layout this raises instead of wiping it: run a reindex.
+        With `matryoshka_dim` the collection is searched in two stages (see create_collection).
+        Returns True if a collection was created.
         """
-        collections = self.client.get_collections()
-        exists = any(c.name == self.collection_name for c in collections.collections)
-        
-        if exists:
-            # Check config
-            collection_info = self.client.get_collection(self.collection_name)
-            current_size = collection_info.config.params.vectors.size
-            if current_size != vector_size:
-                logger.warning(f"Collection {self.collection_name} exists but has wrong size {current_size} != {vector_size}. Recreating...")
-                self.client.delete_collection(self.collection_name)
-                exists = False
-
-        if not exists:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(
+        target = self.resolve_collection()
+        if target is None:
+            target = f"{self.collection_name}_v1"
+            self.create_collection(target, vector_size, matryoshka_dim)
+            self._point_alias(target, previous=None)
+            return True
+
+        # Check config
+        collection_info = self.client.get_collection(target)
+        current_size, current_dim = _vector_layout(collection_info.config.params.vectors)
+        if current_size != vector_size:
+            raise CollectionSchemaError(
+                f"Collection {target} holds {current_size}-d vectors but {vector_size}-d were requested. "
+                f"Run a reindex (python -m app.cli reindex) to migrate without downtime."
+            )
+        if current_dim != (matryoshka_dim or None):
+            raise CollectionSchemaError(
+                f"Collection {target} has truncated vector size {current_dim} but {matryoshka_dim} was requested. "
+                f"Run a reindex (python -m app.cli reindex) to migrate without downtime."
+            )
+
+        # Check if payload index exists significantly reduces API overhead
+        try:
+            # payload_schema is a dict like {'source': PayloadSchemaInfo(...)}
+            if "source" not in collection_info.payload_schema:
+                logger.info("Index for 'source' missing. Creating...")
+                self._create_source_index(target)
+        except Exception as e:
+            logger.error(f"Failed to check/create index: {e}")
+        return False
+
+    def create_collection(self, name: str, vector_size: int,
+                          matryoshka_dim: Optional[int] = settings.VECTOR_MATRYOSHKA_DIM):
+        """
+        Create a physical collection (with the `source` keyword index).
+
+        With `matryoshka_dim` each point stores two named vectors: the first
+        `matryoshka_dim` components, which carry the HNSW index and serve the
+        candidate search, and the full vector, kept on disk without an index
+        and read only to rescore those candidates. This only keeps recall for
+        Matryoshka-trained embedders such as nomic-embed-text-v1.5.
+        """
+        from qdrant_client.http import models
+        if matryoshka_dim:
+            if matryoshka_dim >= vector_size:
+                raise ValueError(f"Truncated size {matryoshka_dim} must be below the vector size {vector_size}")
+            vectors_config = {
+                MATRYOSHKA_VECTOR: models.VectorParams(size=matryoshka_dim, distance=models.Distance.COSINE),
+                FULL_VECTOR: models.VectorParams(
                     size=vector_size,
-                    distance=models.Distance.COSINE
-                )
+                    distance=models.Distance.COSINE,
+                    on_disk=True,
+                    hnsw_config=models.HnswConfigDiff(m=0),
+                ),
+            }
+        else:
+            vectors_config = models.VectorParams(
+                size=vector_size,
+                distance=models.Distance.COSINE
             )
-            logger.info(f"Created collection {self.collection_name} with size {vector_size}")
-            
-        if exists:
-            # Check if payload index exists significantly reduces API overhead
-            try:
-                # Get collection info again (or reuse if optimal) - here reusing
-                collection_info = self.client.get_collection(self.collection_name)
-                # payload_schema is a dict like {'source': PayloadSchemaInfo(...)}
-                if "source" not in collection_info.payload_schema:
-                     logger.info("Index for 'source' missing. Creating...")
-                     self.client.create_payload_index(
-                        collection_name=self.collection_name,
-                        field_name="source",
-                        field_schema=models.PayloadSchemaType.KEYWORD
-                     )
-                     logger.info("Created keyword index for 'source' field")
-            except Exception as e:
-                 logger.error(f"Failed to check/create index: {e}") 
-
-        # If not exists, we created it above, so we should create index too
-        if not exists:
-             self.client.create_payload_index(
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=vectors_config
+        )
+        _matryoshka_dims[name] = matryoshka_dim or None
+        logger.info(f"Created collection {name} with size {vector_size} (truncated: {matryoshka_dim or 'none'})")
+        self._create_source_index(name)
+        # A fresh collection invalidates any near-duplicate index left under its name
+        from app.services.vector.dedup import reset_dedup_index
+        reset_dedup_index(name)
+
+    def _create_source_index(self, name: str):
+        from qdrant_client.http import models
+        self.client.create_payload_index(
+            collection_name=name,
+            field_name="source",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+        logger.info(f"Created keyword index for 'source' field on {name}")
+
+    def _point_alias(self, target: str, previous: Optional[str]):
+        from qdrant_client.http import models
+        actions = []
+        if previous is not None and previous != self.collection_name:
+            actions.append(models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=self.collection_name)
+            ))
+        actions.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=target, alias_name=self.collection_name)
+        ))
+        # Both actions are applied atomically: searches never see a missing alias
+        self.client.update_collection_aliases(change_aliases_operations=actions)
+        _matryoshka_dims.pop(self.collection_name, None)
+
+    def swap_alias(self, target: str) -> Optional[str]:
+        """
+        Point `collection_name` at `target`; returns the previous physical collection.
+        """
+        previous = self.resolve_collection()
+        if previous == self.collection_name:
+            # Pre-alias install: the name is taken by a real collection, which has to go
+            # before the alias can exist. Searches miss for the duration of one delete.
+            logger.warning(f"Migrating {self.collection_name} to an alias; dropping the unversioned collection")
+            self.client.delete_collection(self.collection_name)
+        self._point_alias(target, previous)
+        logger.info(f"Alias {self.collection_name} now points to {target} (was {previous})")
+        return previous
+
+    def versions(self) -> List[str]:
+        """
+        Physical collections named `<collection_name>_v<N>`, oldest first.
+        """
+        prefix = f"{self.collection_name}_v"
+        names = [c.name for c in self.client.get_collections().collections]
+        versioned = [n for n in names if n.startswith(prefix) and n[len(prefix):].isdigit()]
+        return sorted(versioned, key=lambda n: int(n[len(prefix):]))
+
+    def matryoshka_dim(self, refresh: bool = False) -> Optional[int]:
+        """
+        Truncated vector size of the collection, or None if it holds a single
+        full-size vector. Cached per collection name; `refresh` re-reads it.
+        """
+        if refresh or self.collection_name not in _matryoshka_dims:
+            target = self.resolve_collection()
+            if target is None:
+                return None
+            _, dim = _vector_layout(self.client.get_collection(target).config.params.vectors)
+            _matryoshka_dims[self.collection_name] = dim
+        return _matryoshka_dims[self.collection_name]
+
+    def _with_layout(self, operation):
+        """
+        Call `operation(matryoshka_dim)`. If it fails, re-read the layout and
+        retry once when it changed: another process may have reindexed the
+        alias into a different vector layout.
+        """
+        dim = self.matryoshka_dim()
+        try:
+            return operation(dim)
+        except Exception:
+            fresh = self.matryoshka_dim(refresh=True)
+            if fresh == dim:
+                raise
+            return operation(fresh)
+
+    def next_version_name(self) -> str:
+        versions = self.versions()
+        last = int(versions[-1].rsplit("_v", 1)[1]) if versions else 0
+        return f"{self.collection_name}_v{last + 1}"
+
+    def drop_collection(self, name: str):
+        self.client.delete_collection(name)
+        _matryoshka_dims.pop(name, None)
+        logger.info(f"Dropped collection {name}")
+
+    def scroll(self, collection: Optional[str] = None, batch_size: int = 256, with_payload=True, query_filter=None):
+        """
+        Yield lists of points from `collection` (default: this store's), page by page.
+        """
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection or self.collection_name,
+                scroll_filter=query_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=False
+            )
+            if points:
+                yield points
+            if offset is None:
+                return
+
+    def delete_source(self, source: str) -> tuple:
+        """
+        Remove every chunk of `source`. Points shared with other documents
+        (near-duplicates) only lose that source's references.
+        Returns (deleted point ids, {updated point id: remaining references}).
+        """
+        with shared_writes(self.collection_name):
+            return self._delete_source(source)
+
+    def _delete_source(self, source: str) -> tuple:
+        from qdrant_client.http import models
+        query_filter = models.Filter(must=[
+            models.FieldCondition(key="source", match=models.MatchValue(value=source))
+        ])
+        deleted, updated = [], {}
+        for points in self.scroll(with_payload=["source", "references"], query_filter=query_filter):
+            for point in points:
+                sources = point.payload.get("source")
+                if isinstance(sources, list) and any(s != source for s in sources):
+                    updated[str(point.id)] = [r for r in point.payload.get("references", []) if r.get("source") != source]
+                else:
+                    deleted.append(str(point.id))
+        if deleted:
+            self.client.delete(
                 collection_name=self.collection_name,
-                field_name="source",
-                field_schema=models.PayloadSchemaType.KEYWORD
-             )
-             logger.info("Created keyword index for 'source' field (new collection)")
+                points_selector=models.PointIdsList(points=deleted)
+            )
+            if self.docstore is not None:
+                # The docstore is shared by every version behind the alias
+                kept = self._held_by_other_versions(deleted)
+                self.docstore.delete_many([pid for pid in deleted if pid not in kept])
+        if updated:
+            from app.services.vector.dedup import reference_payload
+            self._set_payloads({pid: reference_payload(refs) for pid, refs in updated.items()})
+        logger.info(f"Deleted source {source}: {len(deleted)} points removed, {len(updated)} shared points updated")
+        return deleted, updated
+
+    def _held_by_other_versions(self, point_ids: List[str]) -> set:
+        """
+        Ids among `point_ids` still stored in a version other than the live one
+        (kept for rollback, or a reindex in progress): their text has to stay.
+        """
+        live = self.resolve_collection()
+        held = set()
+        for name in self.versions():
+            if name == live:
+                continue
+            held.update(str(p.id) for p in self.client.retrieve(
+                collection_name=name, ids=point_ids, with_payload=False, with_vectors=False
+            ))
+        return held
 
     def upsert(self, embeddings: List[VectorEmbedding]):
         if not embeddings:
             return
 
-        points = []
-        for i, emb in enumerate(embeddings):
-            # Using simple auto-id or hash of text could be better
-            # For now, let's assume UUIDs are generated or use simple index if not provided
-            # Better: Use uuid5 of text to ensure idempotency
-            import uuid
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, emb.text))
-            
-            points.append(models.PointStruct(
-                id=point_id,
-                vector=emb.vector,
-                payload={
-                    "text": emb.text,
-                    **emb.metadata
-                }
-            ))
+        ids = [point_id_for(emb.text) for emb in embeddings]
+        docstore = self.docstore
+        with shared_writes(self.collection_name):
+            added = _put_texts(docstore, ids, embeddings)
+            try:
+                self._with_layout(lambda dim: self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=_point_structs(ids, embeddings, dim, with_text=docstore is None)
+                ))
+            except Exception:
+                _drop_texts(docstore, added)
+                raise
 
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
+    def set_payloads(self, payloads: Dict[str, dict]):
+        """
+        Merge payload keys into existing points, one call per point.
+        """
+        with shared_writes(self.collection_name):
+            self._set_payloads(payloads)
 
-    def search(self, query_vector: List[float], limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[VectorEmbedding]:
+    def _set_payloads(self, payloads: Dict[str, dict]):
+        for point_id, payload in payloads.items():
+            self.client.set_payload(
+                collection_name=self.collection_name,
+                payload=payload,
+                points=[point_id]
+            )
+
+    def merge_references(self, additions: Dict[str, List[dict]]) -> List[str]:
+        """
+        Add references to existing points by read-merge-write on their current
+        payload, so references written by other processes are kept. Callers
+        serialize this with the near-duplicate index's transaction.
+        Returns the ids that no longer exist.
+        """
+        from app.services.vector.dedup import reference_of, reference_payload
+        with shared_writes(self.collection_name):
+            points = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(additions),
+                with_payload=["references", "source", "page"],
+                with_vectors=False
+            )
+            found = {str(point.id): point.payload or {} for point in points}
+            changed = {}
+            for point_id, refs in additions.items():
+                payload = found.get(point_id)
+                if payload is None:
+                    continue
+                merged = list(payload.get("references") or [reference_of(payload)])
+                known = len(merged)
+                for ref in refs:
+                    if ref not in merged:
+                        merged.append(ref)
+                if len(merged) > known:
+                    changed[point_id] = reference_payload(merged)
+            if changed:
+                self._set_payloads(changed)
+        return [point_id for point_id in additions if point_id not in found]
+
+    def search(self, query_vector: List[float], limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+               score_threshold: Optional[float] = None) -> List[VectorEmbedding]:
         # 'search' method deprecated/missing in this client version. Using query_points.
-        
-        query_filter = None
-        if filters:
-            must_conditions = []
-            for key, value in filters.items():
-                must_conditions.append(
-                    models.FieldCondition(
-                        key=key,
-                        match=models.MatchValue(value=value)
-                    )
+        query_filter = _build_filter(filters)
+        with_text = self.docstore is None
+        results = self._with_layout(lambda dim: self.client.query_points(
+            **_query_request(self.collection_name, query_vector, dim, query_filter, limit, score_threshold, with_text)
+        ).points)
+        if with_text:
+            texts = {str(hit.id): hit.payload.get("text", "") for hit in results}
+        else:
+            texts = self.fetch_texts([str(hit.id) for hit in results])
+        return _search_results(results, texts, filters)
+
+    def fetch_texts(self, point_ids: List[str]) -> Dict[str, str]:
+        """
+        Chunk text by point id: one batched docstore lookup, then the payload
+        `text` of points written before the docstore existed.
+        """
+        texts = self.docstore.get_many(point_ids) if self.docstore is not None else {}
+        missing = [pid for pid in point_ids if pid not in texts]
+        if missing:
+            for point in self.client.retrieve(
+                collection_name=self.collection_name, ids=missing, with_payload=["text"], with_vectors=False
+            ):
+                texts[str(point.id)] = (point.payload or {}).get("text", "")
+        return texts
+
+
+# Request building shared with AsyncQdrantVectorStore
+
+def docstore_enabled() -> bool:
+    """
+    DOCSTORE_ENABLED, defaulting to on only for local-path Qdrant: a server's
+    clients may run on hosts that do not share (or keep) a local disk.
+    """
+    if settings.DOCSTORE_ENABLED is None:
+        return not str(settings.VECTOR_DB_URL).startswith("http")
+    return settings.DOCSTORE_ENABLED
+
+
+def _docstore_for(collection_name: str):
+    if not docstore_enabled():
+        return None
+    from app.services.vector.docstore import get_docstore
+    return get_docstore(collection_name)
+
+
+def _put_texts(docstore, ids: List[str], embeddings: List[VectorEmbedding]) -> List[str]:
+    """
+    Store chunk text ahead of the points, so a search can never hit a point
+    whose text is missing. Returns the ids that had no text before, which
+    `_drop_texts` removes again if the upsert fails.
+    """
+    if docstore is None:
+        return []
+    known = docstore.known(ids)
+    docstore.put_many(dict(zip(ids, (emb.text for emb in embeddings))))
+    return [pid for pid in dict.fromkeys(ids) if pid not in known]
+
+
+def _drop_texts(docstore, added: List[str]):
+    if docstore is not None and added:
+        docstore.delete_many(added)
+
+
+def _build_filter(filters: Optional[Dict[str, Any]]):
+    from qdrant_client.http import models
+
+    query_filter = None
+    if filters:
+        must_conditions = []
+        for key, value in filters.items():
+            must_conditions.append(
+                models.FieldCondition(
+                    key=key,
+                    match=models.MatchValue(value=value)
                 )
-            if must_conditions:
-                query_filter = models.Filter(must=must_conditions)
-                logger.info(f"🔍 Searching with filter: {query_filter}")
-            else:
-                logger.info(f"⚠️ Filters provided {filters} but no conditions created.")
+            )
+        if must_conditions:
+            query_filter = models.Filter(must=must_conditions)
+            logger.info(f"🔍 Searching with filter: {query_filter}")
+        else:
+            logger.info(f"⚠️ Filters provided {filters} but no conditions created.")
+    return query_filter
+
 
-        results = self.client.query_points(
-            collection_name=self.collection_name,
+def _point_structs(ids: List[str], embeddings: List[VectorEmbedding], dim: Optional[int], with_text: bool) -> list:
+    from qdrant_client.http import models
+
+    points = []
+    for point_id, emb in zip(ids, embeddings):
+        payload = dict(emb.metadata)
+        if with_text:
+            payload["text"] = emb.text
+
+        points.append(models.PointStruct(
+            id=point_id,
+            # Qdrant normalizes cosine vectors, so the prefix needs no rescaling
+            vector={FULL_VECTOR: emb.vector, MATRYOSHKA_VECTOR: emb.vector[:dim]} if dim else emb.vector,
+            payload=payload
+        ))
+    return points
+
+
+def _query_request(collection_name: str, query_vector: List[float], dim: Optional[int], query_filter, limit: int,
+                   score_threshold: Optional[float], with_text: bool) -> dict:
+    """
+    Keyword arguments for `query_points`.
+    """
+    from qdrant_client.http import models
+    # Without text in the payload request, only metadata travels back
+    with_payload = True if with_text else models.PayloadSelectorExclude(exclude=["text"])
+    if not dim:
+        return dict(
+            collection_name=collection_name,
             query=query_vector,
             query_filter=query_filter,
-            limit=limit
-        ).points
-        
-        return [
-            VectorEmbedding(
-                text=hit.payload.get("text", ""),
-                vector=[], # Optimization: Don't return vector in search results unless needed
-                metadata={k:v for k,v in hit.payload.items() if k != "text"}
-            )
-            for hit in results
-        ]
+            limit=limit,
+            score_threshold=score_threshold,
+            with_payload=with_payload
+        )
+
+    # Stage 1 finds candidates with the truncated prefix; stage 2 rescores them with
+    # the full vector, so scores (and the threshold) mean the same as in a flat collection
+    candidates = max(limit, math.ceil(limit * settings.VECTOR_MATRYOSHKA_OVERSAMPLING))
+    return dict(
+        collection_name=collection_name,
+        prefetch=models.Prefetch(
+            query=query_vector[:dim],
+            using=MATRYOSHKA_VECTOR,
+            filter=query_filter,
+            limit=candidates
+        ),
+        query=query_vector,
+        using=FULL_VECTOR,
+        query_filter=query_filter,
+        limit=limit,
+        score_threshold=score_threshold,
+        with_payload=with_payload
+    )
+
+
+def _search_results(hits, texts: Dict[str, str], filters: Optional[Dict[str, Any]]) -> List[VectorEmbedding]:
+    return [
+        VectorEmbedding(
+            text=texts.get(str(hit.id), ""),
+            vector=[], # Optimization: Don't return vector in search results unless needed
+            metadata=_display_metadata(hit.payload, filters),
+            score=hit.score
+        )
+        for hit in hits
+    ]
+
+
+def _display_metadata(payload: dict, filters: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    Payload minus the text. A deduplicated point shared by several documents has
+    a list `source`; report the one the caller filtered on (or the first) with its page.
+    """
+    metadata = {k: v for k, v in payload.items() if k != "text"}
+    sources = metadata.get("source")
+    if isinstance(sources, list) and sources:
+        wanted = (filters or {}).get("source")
+        source = wanted if wanted in sources else sources[0]
+        metadata["source"] = source
+        page = next((r.get("page") for r in metadata.get("references", []) if r.get("source") == source), None)
+        if page is not None:
+            metadata["page"] = page
+    return metadata
 
@@ -0,0 +1,101 @@
+"""
+Cross-process gate on writes through a collection alias.
+
+Upserts, payload updates and deletes through the alias hold the gate
+shared; a reindex holds it exclusively while it catches up on those
+writes and swaps the alias, so nothing written to the live version in
+that window is lost. Writes to a named version (`<alias>_v<N>`, as the
+reindex itself does) are not gated.
+
+The gate is an flock on `<alias>.writes.lock` next to the docstore. Worker
+processes and the ingest CLI on the same host see it; writers on other
+hosts (several API instances on one Qdrant server) do not. Run those with
+writes stopped during a reindex, or from a single host. Without fcntl
+(Windows) writes are not gated.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+from app.services.vector.docstore import docstore_path, logical_name
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# How often an async writer re-checks a gate held by a reindex
+_POLL_SECONDS = 0.05
+
+
+def lock_path(name: str) -> Path:
+    path = docstore_path(name)
+    if path is None:
+        # In-memory Qdrant: one process, any local file will do
+        return Path(tempfile.gettempdir()) / f"{name}.writes.lock"
+    return path.with_name(f"{name}.writes.lock")
+
+
+def _gated(collection_name: str) -> bool:
+    return fcntl is not None and logical_name(collection_name) == collection_name
+
+
+def _open(name: str) -> int:
+    path = lock_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+@contextmanager
+def _held(collection_name: str, mode: int):
+    if not _gated(collection_name):
+        yield
+        return
+    fd = _open(collection_name)
+    try:
+        fcntl.flock(fd, mode)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def shared_writes(collection_name: str):
+    """
+    Hold the gate while writing through `collection_name`.
+    """
+    return _held(collection_name, fcntl.LOCK_SH if fcntl else 0)
+
+
+def paused_writes(collection_name: str):
+    """
+    Wait for writes in flight through the alias, then hold off new ones until the block ends.
+    """
+    if _gated(collection_name):
+        logger.info(f"Pausing writes through {collection_name}")
+    return _held(collection_name, fcntl.LOCK_EX if fcntl else 0)
+
+
+@asynccontextmanager
+async def async_shared_writes(collection_name: str):
+    """
+    `shared_writes` for the event loop: polls instead of blocking it.
+    """
+    if not _gated(collection_name):
+        yield
+        return
+    fd = _open(collection_name)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(_POLL_SECONDS)
+        yield
+    finally:
+        os.close(fd)
@@ -0,0 +1,2 @@
+# Offline performance benchmarks for the RAG backend.
+# Run with: python -m benchmarks.run --help
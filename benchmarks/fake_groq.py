@@ -0,0 +1,133 @@
+"""
+Groq-compatible stand-in for load testing without spending LLM quota.
+
+Serves POST /openai/v1/chat/completions (streaming and non-streaming) with
+configurable time-to-first-token, token rate and completion length, and
+returns Groq-style x-ratelimit-* headers.
+
+    python -m benchmarks.fake_groq --port 9100 --latency 0.3 --tokens-per-sec 250
+    GROQ_BASE_URL=http://127.0.0.1:9100 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER = (
+    "Answer:\nThe document states the requested information in the provided context. "
+    "This is a synthetic response generated by the local load-test backend.\n\n"
+    "Sources:\n- test_doc.pdf, Page 1"
+)
+
+
+class FakeGroqConfig:
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, tokens_per_sec: float = 250.0,
+                 completion_tokens: int = 120, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+
+
+def _words(n: int):
+    words = ANSWER.split(" ")
+    return [words[i % len(words)] for i in range(n)]
+
+
+def _usage(prompt: str, completion_tokens: int) -> dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _rate_limit_headers() -> dict:
+    return {
+        "x-ratelimit-limit-requests": "14400",
+        "x-ratelimit-remaining-requests": "14399",
+        "x-ratelimit-limit-tokens": "1000000",
+        "x-ratelimit-remaining-tokens": "999000",
+        "x-ratelimit-reset-requests": "6s",
+        "x-ratelimit-reset-tokens": "60ms",
+    }
+
+
+def create_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI(title="Fake Groq")
+
+    @app.get("/openai/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model"}]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        n_tokens = config.completion_tokens
+        per_token = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+        if config.error_rate and random.random() < config.error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "fake upstream error", "type": "server_error"}})
+
+        await asyncio.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+        if not body.get("stream"):
+            await asyncio.sleep(per_token * n_tokens)
+            return JSONResponse(headers=_rate_limit_headers(), content={
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(_words(n_tokens))},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(prompt, n_tokens),
+            })
+
+        async def events():
+            base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            for i, word in enumerate(_words(n_tokens)):
+                chunk = dict(base, choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}])
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(per_token)
+            final = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                         x_groq={"id": completion_id, "usage": _usage(prompt, n_tokens)})
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=_rate_limit_headers())
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a Groq-compatible fake LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +/- jitter on latency (seconds).")
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    config = FakeGroqConfig(args.latency, args.jitter, args.tokens_per_sec, args.completion_tokens, args.error_rate)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import random
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.schemas.vector import VectorEmbedding
+from app.services.llm.generator import BaseLLMService
+from app.services.vector.embeddings import BaseEmbeddingService
+
+_WORDS = (
+    "government policy section article clause notification scheme eligibility applicant "
+    "department ministry district officer annual report budget allocation committee review "
+    "public service citizen benefit amendment schedule provision registration authority "
+    "compliance procedure application document record period financial year state central"
+).split()
+
+
+def synthetic_paragraph(rng: random.Random, sentences: int = 5) -> str:
+    out = []
+    for _ in range(sentences):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 20))]
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+def synthetic_text(size_bytes: int, seed: int = 7) -> str:
+    """
+    Deterministic paragraph-structured text of roughly `size_bytes` characters.
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size_bytes:
+        para = synthetic_paragraph(rng)
+        parts.append(para)
+        total += len(para) + 2
+    return "\n\n".join(parts)
+
+
+def build_synthetic_pdf(path: Path, pages: int, seed: int = 7) -> Path:
+    """
+    Write a PDF with `pages` pages of paragraph text plus a running header,
+    footer and page number, the way scanned government circulars look.
+    """
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_no in range(1, pages + 1):
+        page = doc.new_page()
+        body = "\n\n".join(synthetic_paragraph(rng) for _ in range(4))
+        page.insert_text((72, 48), "Ministry of Public Administration - Official Circular", fontsize=9)
+        page.insert_textbox(fitz.Rect(72, 72, 540, 740), body, fontsize=10)
+        page.insert_text((72, 780), "Confidential - For official use only", fontsize=8)
+        page.insert_text((300, 800), str(page_no), fontsize=8)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+class HashingEmbeddingService(BaseEmbeddingService):
+    """
+    Deterministic, model-free embedder used when the ONNX model is not
+    available offline. Cost is negligible, so it isolates pipeline overhead.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vec / np.linalg.norm(vec)
+
+    def embed_batch(self, texts: List[str], metadata_list: Optional[List[dict]] = None) -> List[VectorEmbedding]:
+        results = []
+        for i, text in enumerate(texts):
+            meta = metadata_list[i] if metadata_list and i < len(metadata_list) else {}
+            results.append(VectorEmbedding(text=text, vector=self._vector(text).tolist(), metadata=meta))
+        return results
+
+
+class StubLLMService(BaseLLMService):
+    """
+    Returns a canned answer after an optional fixed delay.
+    """
+
+    def __init__(self, delay_s: float = 0.0):
+        self.delay_s = delay_s
+
+    def generate(self, prompt: str, priority: str = "interactive") -> str:
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        return "Answer:\nStubbed answer.\n\nSources:\n- bench.pdf, Page 1"
+
+
+def legacy_clean_page(text: str, page_num: int = 0) -> str:
+    """
+    The per-page DocumentLoader cleaner before document-level boilerplate
+    removal, kept as the baseline for the loader.cleaning benchmarks.
+    """
+    import re
+
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    cleaned_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.isdigit() and (int(line) == page_num or int(line) < 1000):
+            continue
+        if re.match(r'^(page|pg)\.?\s*\d+$', line, re.IGNORECASE) or re.match(r'^-\s*\d+\s*-$', line):
+            continue
+        if len(line) < 4 and not line[0].isalnum():
+            continue
+        cleaned_lines.append(line)
+    return "\n".join(cleaned_lines)
+
+
+def random_unit_vectors(count: int, dim: int, seed: int = 7) -> np.ndarray:
+    vecs = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
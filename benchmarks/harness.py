@@ -0,0 +1,131 @@
+import json
+import math
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Metric direction markers used when comparing two runs
+LOWER = "lower"
+HIGHER = "higher"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile (pct in 0..100) of a list of samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def time_calls(fn: Callable[[], Any], repeat: int = 5, warmup: int = 1) -> List[float]:
+    """
+    Run `fn` `warmup` times untimed, then `repeat` times and return wall-clock durations in seconds.
+    """
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def latency_metrics(samples: List[float], prefix: str = "") -> Dict[str, dict]:
+    """
+    Summarise latency samples (seconds) as p50/p95/mean metrics.
+    """
+    return {
+        f"{prefix}p50_s": metric(percentile(samples, 50), "s", LOWER),
+        f"{prefix}p95_s": metric(percentile(samples, 95), "s", LOWER),
+        f"{prefix}mean_s": metric(statistics.fmean(samples) if samples else 0.0, "s", LOWER),
+    }
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(float(value), 6), "unit": unit, "better": better}
+
+
+class BenchmarkRun:
+    """
+    Collects results of individual benchmark cases and serialises them to JSON.
+    """
+
+    def __init__(self):
+        self.cases: Dict[str, dict] = {}
+        self.meta = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        }
+
+    def add(self, name: str, metrics: Dict[str, dict], params: Optional[dict] = None):
+        self.cases[name] = {"metrics": metrics, "params": params or {}}
+
+    def skip(self, name: str, reason: str):
+        self.cases[name] = {"skipped": reason}
+
+    def to_dict(self) -> dict:
+        return {"meta": self.meta, "cases": self.cases}
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        return path
+
+
+def load_results(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.15) -> List[dict]:
+    """
+    Compare two result documents metric by metric.
+
+    Returns one row per metric present in both runs. A row is flagged as a
+    regression when the metric moved in its "worse" direction by more than
+    `threshold` (relative).
+    """
+    rows = []
+    base_cases = baseline.get("cases", {})
+    for case_name, case in current.get("cases", {}).items():
+        base_case = base_cases.get(case_name)
+        if not base_case or "metrics" not in case or "metrics" not in base_case:
+            continue
+        for metric_name, cur in case["metrics"].items():
+            base = base_case["metrics"].get(metric_name)
+            if not base:
+                continue
+            old, new = base["value"], cur["value"]
+            change = (new - old) / old if old else 0.0
+            worse = change > threshold if cur["better"] == LOWER else change < -threshold
+            rows.append({
+                "case": case_name,
+                "metric": metric_name,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": worse,
+            })
+    return rows
+
+
+def format_comparison(rows: List[dict]) -> str:
+    lines = []
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['case']:<28} {row['metric']:<24} {row['baseline']:>12.6g} -> {row['current']:>12.6g} "
+            f"({row['change'] * 100:+.1f}%) {flag}".rstrip()
+        )
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Replay recorded chat and ingest requests against a running API.
+
+Each JSONL line is one request:
+    {"type": "chat", "query": "...", "filters": {"source": "doc.pdf"}}
+    {"type": "ingest", "path": "test_doc.pdf"}
+Lines without a "type" but with "query" (or backlog-style "title"/"body")
+are replayed as chat requests.
+
+Closed loop (N workers back to back):
+    python -m benchmarks.loadtest requests.jsonl --concurrency 16 --duration 60
+Open loop (Poisson arrivals at a fixed rate, independent of response time):
+    python -m benchmarks.loadtest requests.jsonl --rate 20 --duration 60
+
+Pair with benchmarks/fake_groq.py (GROQ_BASE_URL) to measure the API itself.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.harness import percentile
+
+
+def load_records(path: Path) -> List[dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            raw = json.loads(line)
+            kind = raw.get("type")
+            if kind == "ingest":
+                records.append({"type": "ingest", "path": raw["path"]})
+            elif kind == "chat" or "query" in raw:
+                records.append({"type": "chat", "query": raw["query"], "filters": raw.get("filters")})
+            elif "title" in raw or "body" in raw:
+                records.append({"type": "chat", "query": raw.get("title") or raw.get("body", "")[:500]})
+    return records
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status = defaultdict(int)
+
+    def add(self, kind: str, latency: float, status: Optional[int], error: bool):
+        self.latencies[kind].append(latency)
+        self.status[str(status) if status else "exception"] += 1
+        if error:
+            self.errors[kind] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        out = {"elapsed_s": round(elapsed, 3), "status_codes": dict(self.status), "by_type": {}}
+        all_latencies = []
+        total_errors = 0
+        for kind, samples in self.latencies.items():
+            all_latencies.extend(samples)
+            total_errors += self.errors[kind]
+            out["by_type"][kind] = self._stats(samples, self.errors[kind], elapsed)
+        out["overall"] = self._stats(all_latencies, total_errors, elapsed)
+        return out
+
+    @staticmethod
+    def _stats(samples: List[float], errors: int, elapsed: float) -> dict:
+        count = len(samples)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "p50_s": round(percentile(samples, 50), 4),
+            "p95_s": round(percentile(samples, 95), 4),
+            "p99_s": round(percentile(samples, 99), 4),
+        }
+
+
+async def send(client: httpx.AsyncClient, record: dict, recorder: Recorder):
+    start = time.perf_counter()
+    status = None
+    try:
+        if record["type"] == "ingest":
+            path = Path(record["path"])
+            with open(path, "rb") as f:
+                response = await client.post("/documents/ingest", files={"file": (path.name, f.read())})
+        else:
+            payload = {"query": record["query"]}
+            if record.get("filters"):
+                payload["filters"] = record["filters"]
+            response = await client.post("/chat/", json=payload)
+        status = response.status_code
+        error = status >= 400
+    except httpx.HTTPError:
+        error = True
+    recorder.add(record["type"], time.perf_counter() - start, status, error)
+
+
+async def run_closed_loop(client, records, recorder, concurrency: int, duration: float):
+    deadline = time.perf_counter() + duration
+    cursor = iter(range(sys.maxsize))
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await send(client, records[next(cursor) % len(records)], recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_open_loop(client, records, recorder, rate: float, duration: float, max_in_flight: int):
+    # Arrivals do not wait for responses, so queueing in the server shows up as latency
+    deadline = time.perf_counter() + duration
+    limiter = asyncio.Semaphore(max_in_flight)
+    tasks = []
+    i = 0
+
+    async def fire(record):
+        async with limiter:
+            await send(client, record, recorder)
+
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(fire(records[i % len(records)])))
+        i += 1
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+
+
+async def run(args) -> dict:
+    records = load_records(args.requests)
+    if args.only:
+        records = [r for r in records if r["type"] == args.only]
+    if not records:
+        raise SystemExit(f"No replayable records in {args.requests}")
+    if args.shuffle:
+        random.Random(args.seed).shuffle(records)
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+    async with httpx.AsyncClient(base_url=args.base_url.rstrip("/"), timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        if args.rate:
+            await run_open_loop(client, records, recorder, args.rate, args.duration, args.max_in_flight)
+        else:
+            await run_closed_loop(client, records, recorder, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+
+    summary = recorder.summary(elapsed)
+    summary["config"] = {
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "records": len(records),
+    }
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded requests against the RAG API.")
+    parser.add_argument("requests", type=Path, help="JSONL file of recorded requests.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop workers.")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate (req/s). Enables open-loop mode.")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop cap on outstanding requests.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (seconds).")
+    parser.add_argument("--only", choices=["chat", "ingest"], help="Replay only one request type.")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="Write the JSON summary here as well.")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args))
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
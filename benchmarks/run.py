@@ -0,0 +1,277 @@
+"""
+Offline benchmark suite for the ingestion and retrieval path.
+
+Usage:
+    python -m benchmarks.run                          # all suites, results to benchmarks/results/
+    python -m benchmarks.run --suite chunker --quick
+    python -m benchmarks.run --compare benchmarks/results/baseline.json --threshold 0.15
+
+Everything runs in-process against a throwaway local-path Qdrant; the LLM is
+always stubbed. The embedding suite needs the ONNX model in the local cache
+and is recorded as skipped otherwise.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Must be set before app.core.config is imported anywhere.
+_BENCH_DIR = tempfile.mkdtemp(prefix="rag-bench-")
+os.environ.setdefault("GROQ_API_KEY", "bench-offline")
+os.environ["VECTOR_DB_URL"] = os.path.join(_BENCH_DIR, "qdrant")
+os.environ["VECTOR_COLLECTION_NAME"] = "bench"
+
+from benchmarks.harness import (  # noqa: E402
+    HIGHER, LOWER, BenchmarkRun, compare_results, format_comparison,
+    latency_metrics, load_results, metric, time_calls,
+)
+from benchmarks import fixtures  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SUITES = ["loader", "chunker", "embedder", "store", "rag"]
+
+
+def bench_loader(run: BenchmarkRun, quick: bool):
+    from app.services.document.loader import DocumentLoader
+
+    loader = DocumentLoader()
+    repeat = 3 if quick else 5
+    for pages in ([20] if quick else [20, 200]):
+        path = fixtures.build_synthetic_pdf(Path(_BENCH_DIR) / f"synthetic_{pages}.pdf", pages)
+        samples = time_calls(lambda: loader.load(path), repeat=repeat)
+        metrics = latency_metrics(samples)
+        metrics["pages_per_s"] = metric(pages / min(samples), "pages/s", HIGHER)
+        run.add(f"loader.synthetic_pdf_{pages}p", metrics, {"pages": pages})
+
+    # Cleaning alone, on pre-extracted page text: per-page baseline vs the
+    # document-level pass that also strips running headers and footers
+    import fitz  # PyMuPDF
+
+    pages = 200 if quick else 1000
+    path = fixtures.build_synthetic_pdf(Path(_BENCH_DIR) / f"synthetic_{pages}.pdf", pages)
+    with fitz.open(str(path)) as doc:
+        raw = [page.get_text() for page in doc]
+
+    def clean_legacy():
+        return [fixtures.legacy_clean_page(text, i + 1) for i, text in enumerate(raw)]
+
+    def clean_document():
+        return loader._remove_boilerplate([(i + 1, loader._clean_lines(text, i + 1)) for i, text in enumerate(raw)])
+
+    chars_before = sum(len(t) for t in clean_legacy())
+    chars_after = sum(len("\n".join(lines)) for _, lines in clean_document())
+    for name, fn in (("legacy_per_page", clean_legacy), ("document", clean_document)):
+        samples = time_calls(fn, repeat=repeat)
+        metrics = latency_metrics(samples)
+        metrics["pages_per_s"] = metric(pages / min(samples), "pages/s", HIGHER)
+        run.add(f"loader.cleaning_{name}_{pages}p", metrics, {"pages": pages})
+    run.add(
+        f"loader.cleaning_boilerplate_removed_{pages}p",
+        {"chars_removed_pct": metric(100.0 * (chars_before - chars_after) / max(1, chars_before), "%", HIGHER)},
+        {"pages": pages},
+    )
+
+    real_pdf = REPO_ROOT / "test_doc.pdf"
+    if real_pdf.exists():
+        samples = time_calls(lambda: loader.load(real_pdf), repeat=repeat)
+        run.add("loader.test_doc_pdf", latency_metrics(samples), {"file": real_pdf.name})
+    else:
+        run.skip("loader.test_doc_pdf", f"{real_pdf} not found")
+
+
+def bench_chunker(run: BenchmarkRun, quick: bool):
+    from app.schemas.document import Document
+    from app.services.document.chunker import DocumentChunker
+
+    chunker = DocumentChunker()
+    for mb in ([1] if quick else [1, 4]):
+        text = fixtures.synthetic_text(mb * 1024 * 1024)
+        docs = [Document(text=text, metadata={"source": "bench.txt", "page": 1})]
+        chunks = chunker.chunk_documents(docs)
+        samples = time_calls(lambda: chunker.chunk_documents(docs), repeat=3)
+        metrics = latency_metrics(samples)
+        metrics["mb_per_s"] = metric(len(text) / (1024 * 1024) / min(samples), "MB/s", HIGHER)
+        metrics["chunks"] = metric(len(chunks), "chunks", LOWER)
+        run.add(f"chunker.{mb}mb", metrics, {"chunk_size": chunker.chunk_size, "chunk_overlap": chunker.chunk_overlap})
+
+
+_embedder_error = None
+
+
+def _load_real_embedder():
+    # Remember a failed load so the download retries are only paid once per run
+    global _embedder_error
+    if _embedder_error:
+        raise _embedder_error
+    from app.services.vector.embeddings import get_embedding_service
+    try:
+        return get_embedding_service()
+    except Exception as e:
+        _embedder_error = e
+        raise
+
+
+def bench_embedder(run: BenchmarkRun, quick: bool):
+    try:
+        service = _load_real_embedder()
+    except Exception as e:
+        run.skip("embedder", f"embedding model unavailable offline: {e}")
+        return
+
+    texts = [fixtures.synthetic_paragraph(random.Random(i)) for i in range(128 if quick else 512)]
+    for batch_size in ([16, 64] if quick else [1, 16, 64, 256]):
+        samples = time_calls(lambda: list(service.model.embed(texts, batch_size=batch_size)), repeat=2)
+        metrics = latency_metrics(samples)
+        metrics["texts_per_s"] = metric(len(texts) / min(samples), "texts/s", HIGHER)
+        run.add(f"embedder.batch_{batch_size}", metrics, {"texts": len(texts), "batch_size": batch_size})
+
+    from app.services.vector.embeddings import ParallelEmbeddingService
+    for workers in sorted({2, max(2, (os.cpu_count() or 2) // 2)}):
+        pool = ParallelEmbeddingService(workers=workers, threads_per_worker=1, batch_size=64)
+        try:
+            samples = time_calls(lambda: pool.embed_batch(texts), repeat=2)
+        finally:
+            pool.close()
+        metrics = latency_metrics(samples)
+        metrics["texts_per_s"] = metric(len(texts) / min(samples), "texts/s", HIGHER)
+        run.add(f"embedder.parallel_{workers}w", metrics, {"texts": len(texts), "workers": workers, "threads_per_worker": 1})
+
+
+def _populate_store(store, count: int, dim: int, batch: int = 256):
+    from app.schemas.vector import VectorEmbedding
+
+    vectors = fixtures.random_unit_vectors(count, dim)
+    embeddings = [
+        VectorEmbedding(
+            text=f"bench chunk {i} " + fixtures.synthetic_paragraph(random.Random(i), sentences=2),
+            vector=vectors[i].tolist(),
+            metadata={"source": f"doc_{i % 20}.pdf", "page": i % 50 + 1},
+        )
+        for i in range(count)
+    ]
+    start = time.perf_counter()
+    for i in range(0, count, batch):
+        store.upsert(embeddings[i:i + batch])
+    return time.perf_counter() - start
+
+
+def bench_store(run: BenchmarkRun, quick: bool):
+    from app.services.vector.store import QdrantVectorStore
+
+    dim = 384
+    count = 1000 if quick else 5000
+    store = QdrantVectorStore()
+    store.ensure_collection(vector_size=dim)
+    elapsed = _populate_store(store, count, dim)
+    run.add("store.upsert", {
+        "total_s": metric(elapsed, "s", LOWER),
+        "points_per_s": metric(count / elapsed, "points/s", HIGHER),
+    }, {"points": count, "dim": dim, "batch": 256})
+
+    queries = fixtures.random_unit_vectors(100 if quick else 300, dim, seed=11)
+    samples = []
+    filtered = []
+    for q in queries:
+        start = time.perf_counter()
+        store.search(q.tolist(), limit=5)
+        samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.search(q.tolist(), limit=5, filters={"source": "doc_3.pdf"})
+        filtered.append(time.perf_counter() - start)
+    run.add("store.search", latency_metrics(samples), {"points": count, "limit": 5})
+    run.add("store.search_filtered", latency_metrics(filtered), {"points": count, "limit": 5})
+
+
+def bench_rag(run: BenchmarkRun, quick: bool):
+    from app.services.rag import RAGService
+    from app.services.retrieval import RetrievalService
+    from app.services.vector.store import QdrantVectorStore
+
+    try:
+        embedder = _load_real_embedder()
+        embedder_name = "local-onnx"
+    except Exception:
+        embedder = fixtures.HashingEmbeddingService()
+        embedder_name = "hashing-stub"
+
+    store = QdrantVectorStore()
+    dim = len(embedder.embed_batch(["probe"])[0].vector)
+    store.ensure_collection(vector_size=dim)
+    retrieval = RetrievalService(embedding_service=embedder, vector_store=store)
+    retrieval.index_documents(
+        [fixtures.synthetic_text(4000, seed=i) for i in range(50)],
+        [{"source": f"rag_{i}.pdf", "page": 1} for i in range(50)],
+    )
+    # min_score=-1 disables relevance gating so every query goes through the LLM path
+    rag = RAGService(retrieval_service=retrieval, llm_service=fixtures.StubLLMService(), min_score=-1.0)
+
+    questions = [fixtures.synthetic_paragraph(random.Random(100 + i), sentences=1) for i in range(30 if quick else 100)]
+    samples = []
+    for q in questions:
+        start = time.perf_counter()
+        rag.generate_response(q)
+        samples.append(time.perf_counter() - start)
+    run.add("rag.generate_response", latency_metrics(samples), {"embedder": embedder_name, "llm": "stub", "queries": len(questions)})
+
+    # Off-topic questions with an unreachable floor: the early-exit path, no LLM call
+    gated = RAGService(retrieval_service=retrieval, llm_service=fixtures.StubLLMService(delay_s=0.5), min_score=1.01)
+    samples = []
+    for i in range(len(questions)):
+        start = time.perf_counter()
+        gated.generate_response(f"What is the recipe for chocolate cake number {i}?")
+        samples.append(time.perf_counter() - start)
+    run.add("rag.early_exit", latency_metrics(samples), {"embedder": embedder_name, "queries": len(questions)})
+
+
+BENCHMARKS = {
+    "loader": bench_loader,
+    "chunker": bench_chunker,
+    "embedder": bench_embedder,
+    "store": bench_store,
+    "rag": bench_rag,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run offline RAG backend benchmarks.")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Suite to run (repeatable). Default: all.")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs for a fast smoke run.")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON results.")
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change treated as a regression.")
+    args = parser.parse_args(argv)
+
+    run = BenchmarkRun()
+    for name in args.suite or SUITES:
+        print(f"[bench] running {name}...", file=sys.stderr)
+        try:
+            BENCHMARKS[name](run, args.quick)
+        except Exception as e:
+            run.skip(name, f"failed: {e}")
+            print(f"[bench] {name} failed: {e}", file=sys.stderr)
+
+    output = args.output or RESULTS_DIR / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    run.save(output)
+    print(f"[bench] results written to {output}", file=sys.stderr)
+
+    for case_name, case in run.cases.items():
+        if "skipped" in case:
+            print(f"{case_name:<28} SKIPPED ({case['skipped']})")
+            continue
+        summary = ", ".join(f"{k}={v['value']:.6g}{v['unit']}" for k, v in case["metrics"].items())
+        print(f"{case_name:<28} {summary}")
+
+    if args.compare:
+        rows = compare_results(load_results(args.compare), run.to_dict(), args.threshold)
+        print("\n" + format_comparison(rows))
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
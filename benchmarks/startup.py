@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark: import time of app.main, time until the first 200 from
+/health, and time until /ready reports the warm-up finished.
+
+    python -m benchmarks.startup [--runs 3] [--output startup.json]
+
+Each run spawns a fresh uvicorn process against a throwaway local-path Qdrant.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import BenchmarkRun, latency_metrics
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env(tmp: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench-offline")
+    env["VECTOR_DB_URL"] = os.path.join(tmp, "qdrant")
+    return env
+
+
+def measure_import(env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=REPO_ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def _poll(url: str, deadline: float, until_status: int = 200) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=0.5).status_code == until_status:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(url)
+
+
+def measure_boot(env: dict, timeout: float) -> tuple:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        health = _poll(f"http://127.0.0.1:{port}/health", deadline) - start
+        try:
+            ready = _poll(f"http://127.0.0.1:{port}/ready", deadline) - start
+        except TimeoutError:
+            ready = None
+        return health, ready
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure API cold-start time.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Give up waiting for /ready after this long.")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    imports, healths, readies = [], [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="rag-startup-") as tmp:
+            env = _env(tmp)
+            imports.append(measure_import(env))
+            health, ready = measure_boot(env, args.timeout)
+            healths.append(health)
+            if ready is not None:
+                readies.append(ready)
+
+    run = BenchmarkRun()
+    run.add("startup.import_app_main", latency_metrics(imports), {"runs": args.runs})
+    run.add("startup.first_health", latency_metrics(healths), {"runs": args.runs})
+    if readies:
+        run.add("startup.ready", latency_metrics(readies), {"runs": len(readies)})
+    else:
+        run.skip("startup.ready", "warm-up did not finish (embedding model unavailable?)")
+
+    for name, case in run.cases.items():
+        if "skipped" in case:
+            print(f"{name:<26} SKIPPED ({case['skipped']})")
+        else:
+            print(f"{name:<26} p50={case['metrics']['p50_s']['value']:.3f}s p95={case['metrics']['p95_s']['value']:.3f}s")
+    if args.output:
+        run.save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,32 @@
-from fastembed import TextEmbedding
+"""
+Pre-download the embedding model into the local model cache so the API can
+load it offline at start-up (run this in the build step, e.g. on Render).
+
+    python download_model.py [--cache-dir models]
+
+The API reads the same directory through the EMBEDDING_CACHE_DIR setting
+(default: <repo>/models).
+"""
+import argparse
 import logging
+import os
+from pathlib import Path
+from fastembed import TextEmbedding
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 model_name = "BAAI/bge-small-en-v1.5"
-logger.info(f"Start downloading model: {model_name}...")
+default_cache_dir = os.getenv("EMBEDDING_CACHE_DIR", str(Path(__file__).resolve().parent / "models"))
+
+parser = argparse.ArgumentParser(description="Download the embedding model into the local cache.")
+parser.add_argument("--cache-dir", default=default_cache_dir)
+args = parser.parse_args()
+
+logger.info(f"Start downloading model: {model_name} into {args.cache_dir}...")
 
 try:
-    model = TextEmbedding(model_name=model_name)
+    model = TextEmbedding(model_name=model_name, cache_dir=args.cache_dir)
     logger.info("Model download and load successful!")
     # Test embedding
     embeddings = list(model.embed(["Hello world"]))
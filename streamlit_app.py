@@ -1,6 +1,10 @@
 import streamlit as st
 import requests
+import json
 import os
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Config
 # Config
@@ -18,6 +22,85 @@ except:
 # Ensure API_URL doesn't have a trailing slash which might break appending endpoints
 API_URL = API_URL.rstrip("/")
 
+# Streamlit reruns this script on every interaction, so anything expensive is cached
+HEALTH_CHECK_TTL_SECONDS = int(os.getenv("HEALTH_CHECK_TTL_SECONDS", "30"))
+INGEST_POLL_SECONDS = 1.0
+# (connect, read) timeouts; the read timeout applies between streamed lines, not to the whole answer
+CHAT_TIMEOUT = (5, 60)
+UPLOAD_TIMEOUT = (5, 300)
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    One pooled, keep-alive session shared by every user session and rerun,
+    instead of a new TCP (and TLS) connection per request.
+    """
+    session = requests.Session()
+    # Only idempotent GETs (health, job polling) are retried; chat and uploads are not
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=HEALTH_CHECK_TTL_SECONDS, show_spinner=False)
+def backend_status(url: str):
+    """
+    Returns (status_code, error). Cached across reruns and users, so the
+    backend sees at most one health check per TTL from this client.
+    """
+    try:
+        return get_http_session().get(url, timeout=5).status_code, None
+    except requests.RequestException as e:
+        return None, str(e)
+
+
+def wait_for_ingest(job_id: str):
+    """
+    Poll the ingestion job until it finishes, showing per-chunk progress.
+    Returns the final job status dict.
+    """
+    progress = st.progress(0.0, text="Queued...")
+    session = get_http_session()
+    while True:
+        resp = session.get(f"{API_URL}/documents/jobs/{job_id}", timeout=10)
+        resp.raise_for_status()
+        job = resp.json()
+        total, indexed = job.get("total_chunks", 0), job.get("indexed_chunks", 0)
+        pages = sum(f.get("pages", 0) for f in job.get("files", []))
+        if job["status"] not in ("queued", "running"):
+            progress.empty()
+            return job
+        # Chunk totals grow while the document is still being read, so this is an estimate
+        fraction = indexed / total if total else 0.0
+        progress.progress(min(fraction, 1.0), text=f"Read {pages} pages, indexed {indexed}/{total} chunks...")
+        time.sleep(INGEST_POLL_SECONDS)
+
+
+def stream_chat(payload: dict, meta: dict):
+    """
+    Yield answer text from POST /chat/stream as it arrives; the metadata line
+    (session id, sources, confidence) is stored in `meta`.
+    """
+    with get_http_session().post(f"{API_URL}/chat/stream", json=payload, stream=True, timeout=CHAT_TIMEOUT) as resp:
+        if resp.status_code != 200:
+            raise RuntimeError(f"API Error: {resp.text}")
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "meta":
+                meta.update(event)
+            elif event["type"] == "token":
+                yield event["text"]
+            elif event["type"] == "error":
+                raise RuntimeError(f"Answer interrupted: {event['detail']}")
+            elif event["type"] == "done":
+                return
+    raise RuntimeError("Answer interrupted: the connection closed mid-stream")
+
 
 st.set_page_config(page_title="RAG Chatbot", page_icon="🤖", layout="wide")
 
@@ -37,31 +120,37 @@ with st.sidebar:
     if uploaded_file:
         # Check if this is a new file or already processed
         if st.session_state.last_uploaded != uploaded_file.name:
-            with st.spinner("Ingesting document..."):
-                try:
-                    # Reset chat on new document
-                    st.session_state.messages = []
-                    
-                    files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
-                    response = requests.post(f"{API_URL}/documents/ingest", files=files)
-                    
-                    if response.status_code == 200:
+            try:
+                # Reset chat on new document
+                st.session_state.messages = []
+                st.session_state.chat_session_id = None
+                
+                files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
+                response = get_http_session().post(f"{API_URL}/documents/ingest", files=files, timeout=UPLOAD_TIMEOUT)
+                
+                if response.status_code == 200:
+                    # Indexing runs in the background; follow it instead of blocking on one request
+                    job = wait_for_ingest(response.json()["job_id"])
+                    if job["status"] == "completed":
                         st.session_state.last_uploaded = uploaded_file.name
                         st.success("Your document is uploaded! Now ask the question.")
                     else:
-                        st.error(f"Error: {response.text}")
-                except Exception as e:
-                    st.error(f"Connection Error: {e}")
+                        errors = "; ".join(f["error"] for f in job.get("files", []) if f.get("error"))
+                        st.error(f"Ingestion {job['status']}: {errors or 'see server logs'}")
+                else:
+                    st.error(f"Error: {response.text}")
+            except Exception as e:
+                st.error(f"Connection Error: {e}")
         else:
             st.success("Your document is uploaded! Now ask the question.")
 
 
 # Check Backend Status
-try:
-    if requests.get(CHECK_URL).status_code != 200:
-        st.warning(f"Backend seems unstable. Checked: {CHECK_URL}")
-except Exception as e:
-    st.error(f"Cannot connect to backend at **{CHECK_URL}**. Is it running? Error: {e}")
+status_code, error = backend_status(CHECK_URL)
+if error:
+    st.error(f"Cannot connect to backend at **{CHECK_URL}**. Is it running? Error: {error}")
+elif status_code != 200:
+    st.warning(f"Backend seems unstable. Checked: {CHECK_URL}")
 
 # Chat Interface
 if "messages" not in st.session_state:
@@ -86,38 +175,35 @@ if prompt := st.chat_input("Ask a question based on your documents..."):
 
     # Get Bot Response
     with st.chat_message("assistant"):
-        with st.spinner("Analysing documents..."):
-            try:
-                payload = {"query": prompt}
-                
-                # Add source filter if a document is loaded
-                if st.session_state.get("last_uploaded"):
-                    payload["filters"] = {"source": st.session_state.last_uploaded}
-                    st.toast(f"Searching in: {st.session_state.last_uploaded}")
-
-                resp = requests.post(f"{API_URL}/chat/", json=payload)
+        try:
+            payload = {"query": prompt}
+            # Continue the server-side conversation so follow-ups can reuse earlier retrieval
+            if st.session_state.get("chat_session_id"):
+                payload["session_id"] = st.session_state.chat_session_id
+            
+            # Add source filter if a document is loaded
+            if st.session_state.get("last_uploaded"):
+                payload["filters"] = {"source": st.session_state.last_uploaded}
+                st.toast(f"Searching in: {st.session_state.last_uploaded}")
+
+            # Render the answer as it is generated rather than after the full response
+            meta = {}
+            answer = st.write_stream(stream_chat(payload, meta)) or "No answer provided."
+            st.session_state.chat_session_id = meta.get("session_id")
+            sources = meta.get("sources", [])
+            
+            if sources:
+                with st.expander("View Sources"):
+                    for src in sources:
+                        st.caption(f"**{src['source']}** (Page {src['page']})")
+                        st.code(src['text'])
+            
+            # Save context
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "sources": sources
+            })
                 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    answer = data.get("answer", "No answer provided.")
-                    sources = data.get("sources", [])
-                    
-                    st.markdown(answer)
-                    
-                    if sources:
-                        with st.expander("View Sources"):
-                            for src in sources:
-                                st.caption(f"**{src['source']}** (Page {src['page']})")
-                                st.code(src['text'])
-                    
-                    # Save context
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer,
-                        "sources": sources
-                    })
-                else:
-                    st.error(f"API Error: {resp.text}")
-                    
-            except Exception as e:
-                st.error(f"Failed to communicate with backend: {e}")
+        except Exception as e:
+            st.error(f"Failed to communicate with backend: {e}")
@@ -0,0 +1,125 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from app.schemas.vector import VectorEmbedding
+from app.services.retrieval import RetrievalService
+from app.services.vector import store as store_module
+from app.services.vector.async_store import AsyncQdrantVectorStore
+from app.services.vector.docstore import close_docstores
+from app.services.vector.store import FULL_VECTOR, MATRYOSHKA_VECTOR
+
+VECTORS = [
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
+    [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0],
+    [0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+]
+
+
+def _points():
+    return [
+        VectorEmbedding(text=f"chunk {i}", vector=v, metadata={"source": f"doc{i % 2}.pdf", "page": i})
+        for i, v in enumerate(VECTORS)
+    ]
+
+
+class TestAsyncVectorStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch("app.services.vector.docstore.settings.DOCSTORE_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_docstores)
+        self.addCleanup(store_module._matryoshka_dims.clear)
+        self.client = AsyncQdrantClient(":memory:")
+        self.store = AsyncQdrantVectorStore(self.client, "docs")
+
+    async def asyncTearDown(self):
+        await self.store.close()
+
+    async def _create(self, matryoshka_dim=None):
+        if matryoshka_dim:
+            vectors_config = {
+                MATRYOSHKA_VECTOR: models.VectorParams(size=matryoshka_dim, distance=models.Distance.COSINE),
+                FULL_VECTOR: models.VectorParams(size=8, distance=models.Distance.COSINE),
+            }
+        else:
+            vectors_config = models.VectorParams(size=8, distance=models.Distance.COSINE)
+        await self.client.create_collection("docs_v1", vectors_config=vectors_config)
+        await self.client.update_collection_aliases(change_aliases_operations=[
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name="docs_v1", alias_name="docs"))
+        ])
+
+    async def test_search_reads_text_from_the_docstore(self):
+        await self._create()
+        await self.store.upsert(_points())
+
+        self.assertEqual(await self.store.resolve_collection(), "docs_v1")
+        hits = await self.store.search(VECTORS[1], limit=2)
+        self.assertEqual(hits[0].text, "chunk 1")
+        self.assertEqual(hits[0].metadata["page"], 1)
+        # The payload itself no longer carries the text
+        stored = await self.client.retrieve("docs", ids=[store_module.point_id_for("chunk 1")], with_payload=True)
+        self.assertNotIn("text", stored[0].payload)
+
+    async def test_busy_docstore_does_not_block_the_event_loop(self):
+        await self._create()
+        await self.store.upsert(_points())
+        docstore = self.store.docstore
+        held = threading.Event()
+
+        def hold():
+            with docstore._lock:
+                held.set()
+                time.sleep(0.5)
+
+        threading.Thread(target=hold).start()
+        held.wait()
+        search = asyncio.create_task(self.store.search(VECTORS[1], limit=1))
+        start = time.monotonic()
+        await asyncio.sleep(0.05)
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual((await search)[0].text, "chunk 1")
+
+    async def test_matryoshka_collection_is_rescored_on_full_vectors(self):
+        await self._create(matryoshka_dim=4)
+        await self.store.upsert(_points())
+
+        self.assertEqual(await self.store.matryoshka_dim(), 4)
+        hits = await self.store.search(VECTORS[1], limit=1)
+        self.assertEqual(hits[0].text, "chunk 1")
+
+    async def test_filters_apply(self):
+        await self._create()
+        await self.store.upsert(_points())
+
+        hits = await self.store.search(VECTORS[1], limit=3, filters={"source": "doc0.pdf"})
+        self.assertEqual({hit.metadata["source"] for hit in hits}, {"doc0.pdf"})
+
+    async def test_retrieval_service_searches_on_the_async_store(self):
+        await self._create()
+        await self.store.upsert(_points())
+        vector_store = MagicMock()
+        embedder = MagicMock()
+        embedder.embed_batch.return_value = [VectorEmbedding(text="q", vector=VECTORS[2], metadata={})]
+        service = RetrievalService(embedding_service=embedder, vector_store=vector_store,
+                                   async_vector_store=self.store, dedup_index=MagicMock())
+
+        hits = await service.asearch("q", limit=1)
+        self.assertEqual(hits[0].text, "chunk 2")
+        vector_store.search.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from benchmarks.harness import BenchmarkRun, compare_results, metric, percentile, LOWER, HIGHER
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_percentile(self):
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 50.0)
+        self.assertEqual(percentile(samples, 99), 99.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_compare_flags_regressions_by_direction(self):
+        base = BenchmarkRun()
+        base.add("store.search", {"p50_s": metric(0.010, "s", LOWER), "qps": metric(100, "q/s", HIGHER)})
+        cur = BenchmarkRun()
+        cur.add("store.search", {"p50_s": metric(0.013, "s", LOWER), "qps": metric(110, "q/s", HIGHER)})
+
+        rows = {r["metric"]: r for r in compare_results(base.to_dict(), cur.to_dict(), threshold=0.15)}
+
+        self.assertTrue(rows["p50_s"]["regression"])
+        self.assertFalse(rows["qps"]["regression"])
+
+    def test_compare_ignores_skipped_cases(self):
+        base = BenchmarkRun()
+        base.add("embedder.batch_16", {"texts_per_s": metric(500, "texts/s", HIGHER)})
+        cur = BenchmarkRun()
+        cur.skip("embedder.batch_16", "model unavailable")
+
+        self.assertEqual(compare_results(base.to_dict(), cur.to_dict()), [])
+
+if __name__ == "__main__":
+    unittest.main()
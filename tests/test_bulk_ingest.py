@@ -0,0 +1,264 @@
+import asyncio
+import io
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from app.schemas.document import Document
+from app.services.document.upload import MemoryBudget, StoredUpload, expand_archive
+from app.services.ingestion import IngestionJob, IngestionPipeline, JobRegistry
+
+SUPPORTED = (".pdf", ".txt", ".docx", ".doc")
+
+
+def _zip(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return buf.getvalue()
+
+
+def _tar(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tf.addfile(info, io.BytesIO(content))
+    return buf.getvalue()
+
+
+class TestExpandArchive(unittest.TestCase):
+    def test_zip_members_and_skips(self):
+        data = _zip({"a.txt": b"alpha", "docs/b.txt": b"beta", "img.png": b"x", "__MACOSX/._a.txt": b"junk"})
+        uploads, skipped = expand_archive(StoredUpload("corpus.zip", len(data), "h", data=data), SUPPORTED)
+
+        self.assertEqual([u.filename for u in uploads], ["a.txt", "docs/b.txt"])
+        self.assertEqual(uploads[1].data, b"beta")
+        self.assertEqual(skipped, [("img.png", "unsupported file type")])
+
+    def test_tar_gz(self):
+        data = _tar({"one.txt": b"one", "two.txt": b"two"})
+        uploads, _ = expand_archive(StoredUpload("corpus.tgz", len(data), "h", data=data), SUPPORTED)
+        self.assertEqual(sorted(u.filename for u in uploads), ["one.txt", "two.txt"])
+
+    def test_limits(self):
+        data = _zip({"a.txt": b"a" * 10, "b.txt": b"b" * 10, "c.txt": b"c" * 10})
+        upload = StoredUpload("corpus.zip", len(data), "h", data=data)
+
+        uploads, skipped = expand_archive(upload, SUPPORTED, max_files=2)
+        self.assertEqual(len(uploads), 2)
+        self.assertIn("file limit", skipped[0][1])
+
+        uploads, skipped = expand_archive(upload, SUPPORTED, max_total_bytes=15)
+        self.assertEqual(len(uploads), 1)
+        self.assertIn("size limit", skipped[0][1])
+
+    def test_members_spill_once_the_memory_budget_is_used(self):
+        data = _zip({"a.txt": b"a" * 10, "b.txt": b"b" * 10, "c.txt": b"c" * 10})
+        budget = MemoryBudget(15)
+        with tempfile.TemporaryDirectory() as tmp, patch("app.services.document.upload.settings.UPLOAD_DIR", Path(tmp)):
+            uploads, _ = expand_archive(StoredUpload("corpus.zip", len(data), "h", data=data), SUPPORTED, budget=budget)
+
+            self.assertEqual(uploads[0].data, b"a" * 10)
+            self.assertEqual([u.path.read_bytes() for u in uploads[1:]], [b"b" * 10, b"c" * 10])
+            self.assertEqual(budget.remaining, 5)
+            for upload in uploads:
+                upload.cleanup()
+
+
+class TestIngestionPipeline(unittest.TestCase):
+    def _run(self, files: dict, batch_size: int, fail_on=None, replace=False, loader=None):
+        if loader is None:
+            loader = MagicMock()
+            loader.iter_load_bytes.side_effect = lambda data, name: iter(
+                [] if not data else [Document(text=data.decode(), metadata={"source": name})]
+            )
+        retrieval = MagicMock()
+        # One chunk per word so a file produces several chunks
+        retrieval.chunk_documents.side_effect = lambda docs: [
+            Document(text=w, metadata=d.metadata) for d in docs for w in d.text.split()
+        ]
+        batches = []
+
+        def index_chunks(chunks):
+            if fail_on and any(c.metadata["source"] == fail_on for c in chunks):
+                raise RuntimeError("qdrant down")
+            batches.append([c.metadata["source"] for c in chunks])
+            return len(chunks)
+        retrieval.aindex_chunks = AsyncMock(side_effect=index_chunks)
+        self.retrieval = retrieval
+
+        job = IngestionJob("job")
+        uploads = [(job.add_file(name), StoredUpload(name, len(data), "h", data=data)) for name, data in files.items()]
+        asyncio.run(IngestionPipeline(loader, retrieval, embed_batch_size=batch_size, replace=replace).run(job, uploads))
+        return job, batches
+
+    def test_batches_span_documents(self):
+        job, batches = self._run({"a.txt": b"a1 a2 a3", "b.txt": b"b1 b2", "c.txt": b"c1"}, batch_size=4)
+
+        self.assertEqual(batches, [["a.txt"] * 3 + ["b.txt"], ["b.txt", "c.txt"]])
+        report = job.to_dict()
+        self.assertEqual(report["status"], "completed")
+        self.assertEqual(report["indexed_chunks"], 6)
+        self.assertTrue(all(f["status"] == "indexed" for f in report["files"]))
+
+    def test_large_file_is_indexed_while_it_is_read(self):
+        pulled = []
+
+        def documents(data, name):
+            for word in data.decode().split():
+                pulled.append(word)
+                yield Document(text=word, metadata={"source": name})
+
+        loader = MagicMock()
+        loader.iter_load_bytes.side_effect = documents
+        retrieval = MagicMock()
+        retrieval.chunk_documents.side_effect = lambda docs: list(docs)
+        pulled_at_index = []
+        retrieval.aindex_chunks = AsyncMock(side_effect=lambda chunks: pulled_at_index.append(len(pulled)) or len(chunks))
+
+        job = IngestionJob("job")
+        data = b" ".join(b"w%d" % i for i in range(60))
+        uploads = [(job.add_file("big.txt"), StoredUpload("big.txt", len(data), "h", data=data))]
+        asyncio.run(IngestionPipeline(loader, retrieval, embed_batch_size=3).run(job, uploads))
+
+        self.assertEqual(len(pulled_at_index), 20)
+        self.assertLess(pulled_at_index[0], 60)  # indexing started before the file was fully read
+        self.assertEqual(job.to_dict()["files"][0]["status"], "indexed")
+
+    def test_per_file_failures(self):
+        job, _ = self._run({"a.txt": b"a1 a2", "empty.txt": b"", "b.txt": b"b1"}, batch_size=2)
+
+        statuses = {f["name"]: f["status"] for f in job.to_dict()["files"]}
+        self.assertEqual(statuses, {"a.txt": "indexed", "empty.txt": "failed", "b.txt": "indexed"})
+        self.assertEqual(job.status, "completed_with_errors")
+
+    def test_indexing_error_marks_batch_owners(self):
+        job, batches = self._run({"a.txt": b"a1 a2", "b.txt": b"b1 b2"}, batch_size=2, fail_on="b.txt")
+
+        statuses = {f["name"]: f["status"] for f in job.to_dict()["files"]}
+        self.assertEqual(statuses, {"a.txt": "indexed", "b.txt": "failed"})
+        self.assertEqual(batches, [["a.txt", "a.txt"]])
+
+    def test_failed_batch_spanning_files(self):
+        # a.txt's first batch is indexed; the batch it shares with b.txt fails
+        job, batches = self._run({"a.txt": b"a1 a2 a3", "b.txt": b"b1"}, batch_size=2, fail_on="b.txt")
+
+        statuses = {f["name"]: f["status"] for f in job.to_dict()["files"]}
+        self.assertEqual(statuses, {"a.txt": "partial", "b.txt": "failed"})
+        self.assertEqual(job.to_dict()["partial_files"], 1)
+        self.assertEqual(job.status, "completed_with_errors")
+        self.retrieval.delete_source.assert_not_called()
+
+    def _broken_loader(self):
+        def documents(data, name):
+            for word in data.decode().split():
+                if word == "boom":
+                    raise ValueError("corrupt page")
+                yield Document(text=word, metadata={"source": name})
+
+        loader = MagicMock()
+        loader.iter_load_bytes.side_effect = documents
+        return loader
+
+    def test_mid_file_load_error_is_rolled_back(self):
+        files = {"bad.txt": b"w1 w2 w3 boom w4", "ok.txt": b"o1"}
+        job, batches = self._run(files, batch_size=2, replace=True, loader=self._broken_loader())
+
+        # The first batch of bad.txt was indexed before the error...
+        self.assertEqual(batches[0], ["bad.txt", "bad.txt"])
+        # ...and is deleted again, so nothing of the failed file stays searchable
+        self.assertNotIn("bad.txt", [s for batch in batches[1:] for s in batch])
+        # Once for `replace` before loading, once more for the rollback
+        self.assertEqual(self.retrieval.delete_source.call_args_list.count(call("bad.txt")), 2)
+        report = {f["name"]: f for f in job.to_dict()["files"]}
+        self.assertEqual(report["bad.txt"]["status"], "failed")
+        self.assertEqual(report["bad.txt"]["indexed_chunks"], 0)
+        self.assertEqual(report["ok.txt"]["status"], "indexed")
+
+    def test_mid_file_load_error_without_replace_is_partial(self):
+        job, _ = self._run({"bad.txt": b"w1 w2 w3 boom"}, batch_size=2, loader=self._broken_loader())
+
+        self.assertEqual(job.to_dict()["files"][0]["status"], "partial")
+        self.retrieval.delete_source.assert_not_called()
+
+
+class TestJobRegistry(unittest.TestCase):
+    def test_evicts_oldest(self):
+        registry = JobRegistry(max_jobs=2)
+        first = registry.create()
+        registry.create()
+        registry.create()
+        self.assertIsNone(registry.get(first.id))
+
+
+class TestBulkEndpoint(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import documents
+        from app.main import app
+
+        self.retrieval = MagicMock()
+        self.retrieval.chunk_documents.side_effect = lambda docs: docs
+        self.retrieval.aindex_chunks = AsyncMock(side_effect=len)
+        app.dependency_overrides[documents.get_retrieval_service] = lambda: self.retrieval
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def test_files_and_archive_share_one_job(self):
+        archive = _zip({"x.txt": b"Archived document text.", "notes.png": b"x"})
+        response = self.client.post("/api/v1/documents/ingest/bulk", files=[
+            ("files", ("a.txt", b"First plain document.", "text/plain")),
+            ("files", ("corpus.zip", archive, "application/zip")),
+            ("files", ("image.png", b"png", "image/png")),
+        ])
+        self.assertEqual(response.status_code, 202)
+
+        job = self.client.get(f"/api/v1/documents/jobs/{response.json()['job_id']}").json()
+        statuses = {f["name"]: f["status"] for f in job["files"]}
+        self.assertEqual(statuses, {
+            "a.txt": "indexed", "x.txt": "indexed",
+            "corpus.zip/notes.png": "skipped", "image.png": "skipped",
+        })
+        self.assertEqual(job["status"], "completed")
+        # Both documents went through a single embed/upsert batch
+        self.assertEqual(self.retrieval.aindex_chunks.await_count, 1)
+
+    def test_request_memory_budget_spills_later_files(self):
+        from app.api.v1.endpoints import documents
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        process = AsyncMock()
+        with patch.object(documents, "process_upload_background", process), \
+                patch("app.services.document.upload.settings.UPLOAD_DIR", Path(tmp.name)), \
+                patch.object(documents.settings, "UPLOAD_REQUEST_IN_MEMORY_MAX_BYTES", 100):
+            response = self.client.post("/api/v1/documents/ingest/bulk", files=[
+                ("files", ("a.txt", b"a" * 60, "text/plain")),
+                ("files", ("corpus.zip", _zip({"x.txt": b"x" * 30, "y.txt": b"y" * 30}), "application/zip")),
+                ("files", ("b.txt", b"b" * 60, "text/plain")),
+            ])
+
+        self.assertEqual(response.status_code, 202)
+        uploads = {u.filename: u for _, u in process.await_args.kwargs["uploads"]}
+        in_memory = sorted(name for name, u in uploads.items() if u.data is not None)
+        self.assertEqual(in_memory, ["a.txt", "x.txt"])
+        self.assertEqual(uploads["b.txt"].path.read_bytes(), b"b" * 60)
+        for upload in uploads.values():
+            upload.cleanup()
+
+    def test_nothing_supported(self):
+        response = self.client.post("/api/v1/documents/ingest/bulk", files=[("files", ("image.png", b"png", "image/png"))])
+        self.assertEqual(response.status_code, 415)
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/api/v1/documents/jobs/nope").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.chat import get_rag_service
+from app.main import app
+from app.schemas.vector import VectorEmbedding
+from app.services.rag import NO_ANSWER, RAGService
+from app.services.session import ConversationSession
+
+
+def _chunk(score=0.9):
+    return VectorEmbedding(text="Scheme text", vector=[], metadata={"source": "a.pdf", "page": 3}, score=score)
+
+
+class TestStreamResponse(unittest.TestCase):
+    def setUp(self):
+        self.retrieval = MagicMock()
+        self.llm = MagicMock()
+        self.llm.stream.return_value = iter(["Fam", "ilies ", "qualify."])
+        self.service = RAGService(retrieval_service=self.retrieval, llm_service=self.llm)
+
+    def test_answer_streams_and_session_records_it_at_the_end(self):
+        self.retrieval.embed_query.return_value = [1.0, 0.0]
+        self.retrieval.search_by_vector.return_value = [_chunk()]
+        session = ConversationSession("s")
+
+        result = self.service.stream_response("Who qualifies?", session=session)
+        self.assertEqual(result["confidence"], "High")
+        self.assertEqual(session.turns, [])  # nothing recorded until the answer is complete
+
+        self.assertEqual(list(result["answer"]), ["Fam", "ilies ", "qualify."])
+        self.assertEqual(session.turns[-1], {"role": "assistant", "content": "Families qualify."})
+
+    def test_no_relevant_chunks_skips_the_llm(self):
+        self.retrieval.search.return_value = [_chunk(score=0.1)]
+        result = self.service.stream_response("Who qualifies?")
+        self.assertEqual(list(result["answer"]), [NO_ANSWER])
+        self.llm.stream.assert_not_called()
+
+
+class TestChatStreamEndpoint(unittest.TestCase):
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def _post(self, answer):
+        service = MagicMock()
+        service.astream_response = AsyncMock(return_value={
+            "answer": answer, "sources": [_chunk()], "confidence": "High", "reused_context": False,
+        })
+        app.dependency_overrides[get_rag_service] = lambda: service
+        response = TestClient(app).post("/api/v1/chat/stream", json={"query": "Who qualifies?"})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_metadata_then_tokens_then_done(self):
+        events = self._post(piece for piece in ["Fam", "ilies"])
+        self.assertEqual(events[0]["type"], "meta")
+        self.assertEqual(events[0]["sources"][0]["page"], 3)
+        self.assertTrue(events[0]["session_id"])
+        self.assertEqual([e["text"] for e in events if e["type"] == "token"], ["Fam", "ilies"])
+        self.assertEqual(events[-1], {"type": "done"})
+
+    def test_mid_stream_failure_ends_with_an_error_line(self):
+        def answer():
+            yield "Fam"
+            raise RuntimeError("LLM went away")
+
+        events = self._post(answer())
+        self.assertEqual(events[-1], {"type": "error", "detail": "LLM went away"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from app.cli import CHECKPOINT_NAME, index_directory
+
+TEXT = "This sentence is long enough to survive cleaning. " * 3
+
+
+class TestIndexDirectory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        (self.root / "sub").mkdir()
+        for name in ("a.txt", "b.txt", "sub/c.txt"):
+            (self.root / name).write_text(TEXT, encoding="utf-8")
+        (self.root / "image.png").write_bytes(b"png")
+        self.retrieval = MagicMock()
+
+    def _index(self, **kwargs):
+        kwargs.setdefault("workers", 0)
+        kwargs.setdefault("batch_size", 2)
+        return index_directory(self.root, retrieval=self.retrieval, progress_stream=io.StringIO(), **kwargs)
+
+    def _indexed_sources(self):
+        return [doc.metadata["source"] for call in self.retrieval.index_chunks.call_args_list for doc in call.args[0]]
+
+    def test_indexes_tree_in_batches(self):
+        summary = self._index()
+
+        self.assertEqual(summary["files_indexed"], 3)
+        self.assertEqual(summary["chunks_indexed"], 3)
+        self.assertEqual(self._indexed_sources(), ["a.txt", "b.txt", "sub/c.txt"])
+        # Batches of two chunks span file boundaries
+        self.assertEqual([len(call.args[0]) for call in self.retrieval.index_chunks.call_args_list], [2, 1])
+        checkpoint = json.loads((self.root / CHECKPOINT_NAME).read_text())
+        self.assertEqual(sorted(checkpoint["done"]), ["a.txt", "b.txt", "sub/c.txt"])
+
+    def test_resumes_from_checkpoint(self):
+        self._index()
+        self.retrieval.reset_mock()
+
+        summary = self._index()
+        self.assertEqual(summary["files_resumed"], 3)
+        self.retrieval.index_chunks.assert_not_called()
+
+        # A changed file is picked up again
+        (self.root / "b.txt").write_text(TEXT + "More text appended afterwards.", encoding="utf-8")
+        os.utime(self.root / "b.txt", (0, 0))
+        summary = self._index()
+        self.assertEqual(summary["files_indexed"], 1)
+        self.assertEqual(self._indexed_sources(), ["b.txt"])
+
+    def test_interrupted_run_resumes(self):
+        self.retrieval.index_chunks.side_effect = [2, KeyboardInterrupt()]
+        summary = self._index()
+        self.assertTrue(summary["interrupted"])
+        self.assertEqual(summary["files_indexed"], 2)
+
+        self.retrieval.reset_mock(side_effect=True)
+        summary = self._index()
+        self.assertEqual(summary["files_resumed"], 2)
+        self.assertEqual(self._indexed_sources(), ["sub/c.txt"])
+
+    def test_extraction_failures_are_reported(self):
+        (self.root / "empty.txt").write_text("", encoding="utf-8")
+        summary = self._index()
+        self.assertEqual(summary["files_failed"], 1)
+        self.assertIn("empty.txt", summary["failed"])
+
+    def test_process_pool_extraction(self):
+        summary = self._index(workers=2)
+        self.assertEqual(summary["files_indexed"], 3)
+        self.assertEqual(sorted(self._indexed_sources()), ["a.txt", "b.txt", "sub/c.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
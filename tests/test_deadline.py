@@ -0,0 +1,157 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, bounded, current_deadline, stage, start_deadline
+from app.schemas.vector import VectorEmbedding
+from app.services.llm.generator import BaseLLMService, LLMCancelledError, LLMTimeoutError
+from app.services.llm.resilient import LLMDeadlineExceeded, ResilientLLMService
+from app.services.rag import PARTIAL_ANSWER, RAGService
+
+
+def _chunk(score, source="a.pdf"):
+    return VectorEmbedding(text=f"chunk {score}", vector=[], metadata={"source": source, "page": 1}, score=score)
+
+
+class SlowLLM(BaseLLMService):
+    model = "slow"
+
+    def generate(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        if cancel is not None and cancel.wait(timeout):
+            raise LLMCancelledError(self.model)
+        time.sleep(timeout)
+        raise LLMTimeoutError(f"{self.model} timed out")
+
+
+# IsolatedAsyncioTestCase runs each test in its own context, so deadlines never leak between tests
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+    async def test_no_deadline_outside_requests(self):
+        self.assertIsNone(current_deadline())
+        self.assertEqual(await bounded("embed_query", asyncio.sleep(0, result=1)), 1)
+
+    async def test_client_budget_is_capped(self):
+        self.assertEqual(start_deadline(10_000).budget_s, settings.REQUEST_DEADLINE_MAX_SECONDS)
+        self.assertEqual(start_deadline().budget_s, settings.REQUEST_DEADLINE_SECONDS)
+
+    async def test_bounded_stage_gives_up_and_logs_the_overrun(self):
+        start_deadline(0.1)
+        start = time.monotonic()
+        with self.assertLogs("app.core.deadline", level="WARNING") as logs:
+            with self.assertRaises(DeadlineExceeded):
+                await bounded("vector_search", asyncio.sleep(5))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertIn("'vector_search' overran", logs.output[0])
+
+    async def test_stage_within_budget_is_quiet(self):
+        start_deadline(5)
+        with patch("app.core.deadline.logger") as logger:
+            with stage("embed_query"):
+                pass
+        logger.warning.assert_not_called()
+
+    async def test_llm_deadline_follows_the_request(self):
+        start_deadline(0.3)
+        service = ResilientLLMService(SlowLLM(), deadline_s=30.0, attempt_timeout_s=10.0, max_attempts=3,
+                                      hedge_percentile=None, failover_errors=10)
+        start = time.monotonic()
+        with self.assertRaises(LLMDeadlineExceeded):
+            await asyncio.to_thread(service.generate, "q")
+        self.assertLess(time.monotonic() - start, 1.5)
+
+
+class TestRAGUnderDeadline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.retrieval = MagicMock()
+        self.retrieval.embed_query.return_value = [1.0, 0.0]
+        self.retrieval.asearch_by_vector = AsyncMock(return_value=[_chunk(0.9 - i * 0.01) for i in range(6)])
+        self.llm = MagicMock()
+        self.llm.generate.return_value = "Answer"
+        self.service = RAGService(retrieval_service=self.retrieval, llm_service=self.llm, min_score=0.5)
+
+    async def test_ample_budget_answers_in_full(self):
+        start_deadline(60)
+        result = await self.service.agenerate_response("q")
+        self.assertEqual(result["answer"], "Answer")
+        self.assertFalse(result["partial"])
+        self.assertEqual(self.retrieval.asearch_by_vector.call_args.kwargs["limit"], settings.RETRIEVAL_MAX_K)
+
+    async def test_low_budget_reduces_k(self):
+        start_deadline(settings.REQUEST_DEADLINE_REDUCED_K_SECONDS - 1)
+        result = await self.service.agenerate_response("q")
+        self.assertEqual(self.retrieval.asearch_by_vector.call_args.kwargs["limit"], settings.REQUEST_DEADLINE_REDUCED_K)
+        self.assertEqual(len(result["sources"]), settings.REQUEST_DEADLINE_REDUCED_K)
+        self.assertFalse(result["partial"])
+
+    async def test_no_time_to_generate_returns_sources_only(self):
+        start_deadline(settings.REQUEST_DEADLINE_MIN_GENERATION_SECONDS / 2)
+        result = await self.service.agenerate_response("q")
+        self.assertTrue(result["partial"])
+        self.assertEqual(result["answer"], PARTIAL_ANSWER)
+        self.assertTrue(result["sources"])
+        self.llm.generate.assert_not_called()
+
+    async def test_generation_cut_off_by_the_deadline_returns_sources_only(self):
+        def slow(prompt, priority="interactive"):
+            time.sleep(0.3)
+            raise LLMDeadlineExceeded("no answer")
+
+        self.llm.generate.side_effect = slow
+        start_deadline(0.2)
+        with patch.object(settings, "REQUEST_DEADLINE_MIN_GENERATION_SECONDS", 0.0):
+            result = await self.service.agenerate_response("q")
+        self.assertTrue(result["partial"])
+
+    async def test_llm_deadline_without_request_deadline_still_fails(self):
+        self.llm.generate.side_effect = LLMDeadlineExceeded("no answer")
+        with self.assertRaises(LLMDeadlineExceeded):
+            await self.service.agenerate_response("q")
+
+    async def test_stuck_embedding_fails_at_the_deadline(self):
+        self.retrieval.embed_query.side_effect = lambda query: time.sleep(1.0)
+        start_deadline(0.1)
+        with self.assertRaises(DeadlineExceeded):
+            await self.service.agenerate_response("q")
+        self.retrieval.asearch_by_vector.assert_not_called()
+
+
+class TestDeadlineHeader(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import chat
+        from app.main import app
+
+        retrieval = MagicMock()
+        retrieval.embed_query.return_value = [1.0, 0.0]
+        retrieval.asearch_by_vector = AsyncMock(return_value=[_chunk(0.9)])
+        self.llm = MagicMock()
+        self.llm.generate.return_value = "Answer"
+        service = RAGService(retrieval_service=retrieval, llm_service=self.llm, min_score=0.5)
+        app.dependency_overrides[chat.get_rag_service] = lambda: service
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def test_header_sets_the_budget(self):
+        response = self.client.post("/api/v1/chat/", json={"query": "q"}, headers={"X-Request-Timeout": "0.5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["partial"])
+        self.llm.generate.assert_not_called()
+
+        response = self.client.post("/api/v1/chat/", json={"query": "q"})
+        self.assertFalse(response.json()["partial"])
+        self.assertEqual(response.json()["answer"], "Answer")
+
+    def test_stream_reports_partial(self):
+        response = self.client.post("/api/v1/chat/stream", json={"query": "q"}, headers={"X-Request-Timeout": "0.5"})
+        lines = [line for line in response.text.splitlines() if line]
+        self.assertIn('"partial": true', lines[0])
+        self.assertIn("not enough time", lines[1])
+
+    def test_invalid_budget_is_rejected(self):
+        response = self.client.post("/api/v1/chat/", json={"query": "q"}, headers={"X-Request-Timeout": "0"})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
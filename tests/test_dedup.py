@@ -0,0 +1,172 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from app.schemas.document import Document
+from app.schemas.vector import VectorEmbedding
+from app.services.retrieval import RetrievalService
+from app.services.vector.dedup import MinHashLSHIndex, close_dedup_indexes, minhash_signature
+
+DISCLAIMER = (
+    "This document is issued by the Department of Revenue for information only. "
+    "It does not constitute a legal interpretation of the provisions of the Act, "
+    "and applicants should consult the official gazette notification before acting on it. "
+    "The department accepts no liability for any loss arising from reliance on this material. "
+    "Figures quoted are provisional and subject to revision in the final accounts of the state."
+)
+
+
+class TestMinHashIndex(unittest.TestCase):
+    def test_near_duplicates_match(self):
+        index = MinHashLSHIndex(threshold=0.8)
+        index.add("p1", minhash_signature(DISCLAIMER))
+
+        # Same boilerplate with a one-word edit still matches
+        self.assertEqual(index.find(minhash_signature(DISCLAIMER.replace("Revenue", "Finance"))), "p1")
+        self.assertIsNone(index.find(minhash_signature("Pension applications close on the last day of March every year.")))
+
+    def test_pending_points_only_match_their_writer(self):
+        index = MinHashLSHIndex(threshold=0.8)
+        index.add("p1", minhash_signature(DISCLAIMER), ready=False)
+
+        self.assertIsNone(index.find(minhash_signature(DISCLAIMER)))
+        self.assertEqual(index.find(minhash_signature(DISCLAIMER), pending={"p1"}), "p1")
+        index.mark_ready(["p1"])
+        self.assertEqual(index.find(minhash_signature(DISCLAIMER)), "p1")
+
+    def test_processes_share_the_index_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "documents.minhash.sqlite"
+            # Two handles on one file stand in for two worker processes
+            first, second = MinHashLSHIndex(path), MinHashLSHIndex(path)
+            self.addCleanup(first.close)
+            self.addCleanup(second.close)
+
+            first.add("p1", minhash_signature(DISCLAIMER))
+            self.assertEqual(second.find(minhash_signature(DISCLAIMER)), "p1")
+            second.remove(["p1"])
+            self.assertIsNone(first.find(minhash_signature(DISCLAIMER)))
+
+    def test_failed_transaction_leaves_no_trace(self):
+        index = MinHashLSHIndex()
+        with self.assertRaises(RuntimeError):
+            with index.transaction():
+                index.add("p1", minhash_signature(DISCLAIMER))
+                raise RuntimeError("qdrant down")
+        self.assertEqual(len(index), 0)
+
+
+class TestIngestDedup(unittest.TestCase):
+    def setUp(self):
+        self.embedder = MagicMock()
+        self.embedder.embed_batch.side_effect = lambda texts, metas=None: [
+            VectorEmbedding(text=t, vector=[0.1, 0.2], metadata=dict(m)) for t, m in zip(texts, metas)
+        ]
+        self.store = MagicMock()
+        self.store.merge_references.return_value = []
+        self.index = MinHashLSHIndex()
+        self.service = RetrievalService(embedding_service=self.embedder, vector_store=self.store, dedup_index=self.index)
+
+    def _doc(self, text, source, page):
+        return Document(text=text, metadata={"source": source, "page": page})
+
+    def test_duplicates_are_stored_once_with_all_references(self):
+        unique = "Eligibility is limited to residents with an annual income below the notified ceiling."
+        written = self.service.index_chunks([self._doc(DISCLAIMER, "a.pdf", 1), self._doc(unique, "a.pdf", 1)])
+        self.assertEqual(written, 2)
+
+        # Next batch: the disclaimer repeats on other pages and documents
+        written = self.service.index_chunks([
+            self._doc(DISCLAIMER, "a.pdf", 2),
+            self._doc(DISCLAIMER.replace("information only", "general information only"), "b.pdf", 7),
+        ])
+        self.assertEqual(written, 0)
+        self.assertEqual(self.embedder.embed_batch.call_count, 1)  # nothing left to embed in batch two
+
+        # Merged into the stored point's current references by the store
+        additions = self.store.merge_references.call_args.args[0]
+        (refs,) = additions.values()
+        self.assertEqual(refs, [{"source": "a.pdf", "page": 2}, {"source": "b.pdf", "page": 7}])
+
+    def test_duplicates_within_a_batch_fold_into_the_new_point(self):
+        self.service.index_chunks([self._doc(DISCLAIMER, "a.pdf", 1), self._doc(DISCLAIMER, "c.pdf", 3)])
+
+        points = self.store.upsert.call_args.args[0]
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0].metadata["references"], [{"source": "a.pdf", "page": 1}, {"source": "c.pdf", "page": 3}])
+        self.store.merge_references.assert_not_called()
+
+    def test_failed_upsert_is_rolled_back(self):
+        self.service.index_chunks([self._doc("A warm-up chunk that fixes the vector size for this service.", "a.pdf", 1)])
+        self.store.upsert.side_effect = RuntimeError("qdrant down")
+        with self.assertRaises(RuntimeError):
+            self.service.index_chunks([self._doc(DISCLAIMER, "a.pdf", 2)])
+        self.assertIsNone(self.index.find(minhash_signature(DISCLAIMER)))
+
+
+    def test_duplicate_of_a_deleted_point_is_stored_again(self):
+        self.service.index_chunks([self._doc(DISCLAIMER, "a.pdf", 1)])
+        self.store.merge_references.side_effect = lambda additions: list(additions)
+
+        written = self.service.index_chunks([self._doc(DISCLAIMER, "b.pdf", 2)])
+        self.assertEqual(written, 1)
+        self.assertEqual(self.store.upsert.call_args.args[0][0].metadata["references"], [{"source": "b.pdf", "page": 2}])
+
+
+class TestSharedIndex(unittest.TestCase):
+    def setUp(self):
+        from qdrant_client import QdrantClient
+        from app.services.vector.docstore import close_docstores
+        from app.services.vector.store import QdrantVectorStore
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "docs.minhash.sqlite"
+        for target in ("app.services.vector.dedup.settings.DEDUP_INDEX_DIR",
+                       "app.services.vector.docstore.settings.DOCSTORE_DIR"):
+            patcher = patch(target, Path(tmp.name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_docstores)
+        self.addCleanup(close_dedup_indexes)
+        self.client = QdrantClient(":memory:")
+        self.embedder = MagicMock()
+        self.embedder.embed_batch.side_effect = lambda texts, metas=None: [
+            VectorEmbedding(text=t, vector=[0.1, 0.2], metadata=dict(m)) for t, m in zip(texts, metas)
+        ]
+
+        def worker():
+            store = QdrantVectorStore.__new__(QdrantVectorStore)
+            store.client, store.collection_name = self.client, "docs"
+            index = MinHashLSHIndex(self.path)
+            self.addCleanup(index.close)
+            return RetrievalService(embedding_service=self.embedder, vector_store=store, dedup_index=index)
+
+        self.worker = worker
+
+    def test_workers_merge_references_into_the_stored_payload(self):
+        first, second = self.worker(), self.worker()
+        first.index_chunks([Document(text=DISCLAIMER, metadata={"source": "a.pdf", "page": 1})])
+        second.index_chunks([Document(text=DISCLAIMER, metadata={"source": "b.pdf", "page": 2})])
+        first.index_chunks([Document(text=DISCLAIMER, metadata={"source": "c.pdf", "page": 3})])
+
+        (point,), _ = self.client.scroll("docs", with_payload=True)
+        self.assertEqual(point.payload["references"], [
+            {"source": "a.pdf", "page": 1}, {"source": "b.pdf", "page": 2}, {"source": "c.pdf", "page": 3},
+        ])
+        self.assertEqual(point.payload["source"], ["a.pdf", "b.pdf", "c.pdf"])
+
+        # A delete in one worker is seen by the other's next ingest
+        second.delete_source("a.pdf")
+        second.delete_source("b.pdf")
+        second.delete_source("c.pdf")
+        self.assertEqual(self.client.count("docs").count, 0)
+        self.assertEqual(first.index_chunks([Document(text=DISCLAIMER, metadata={"source": "d.pdf", "page": 4})]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
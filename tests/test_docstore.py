@@ -0,0 +1,145 @@
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from qdrant_client import QdrantClient
+
+from app.schemas.vector import VectorEmbedding
+from app.services.reindex import ReindexService, ReindexStatus
+from app.services.vector.dedup import close_dedup_indexes
+from app.services.vector.docstore import DocStore, close_docstores, get_docstore, logical_name
+from app.services.vector.store import QdrantVectorStore, point_id_for
+
+
+def _store(client, name="docs"):
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.client = client
+    store.collection_name = name
+    return store
+
+
+class Embedder:
+    def embed_batch(self, texts, metadata_list=None):
+        return [
+            VectorEmbedding(text=t, vector=[float(len(t) % 5 + 1), 1.0, 1.0, 1.0], metadata=dict(m or {}))
+            for t, m in zip(texts, metadata_list or [{}] * len(texts))
+        ]
+
+
+class TestDocStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.docstore = DocStore(Path(self.tmp.name) / "docs.docstore.sqlite")
+        self.addCleanup(self.docstore.close)
+
+    def test_round_trip_is_compressed(self):
+        text = "The applicant must submit proof of residence. " * 20
+        self.docstore.put_many({"a": text, "b": "short"})
+        self.assertEqual(self.docstore.get_many(["a", "b", "missing"]), {"a": text, "b": "short"})
+        blob = self.docstore._conn.execute("SELECT text FROM chunks WHERE id = 'a'").fetchone()[0]
+        self.assertLess(len(blob), len(text) // 5)
+        self.assertEqual(zlib.decompress(blob).decode("utf-8"), text)
+
+    def test_large_lookups_and_deletes_are_batched(self):
+        self.docstore.put_many({f"id{i:04d}": f"chunk {i}" for i in range(1200)})
+        found = self.docstore.get_many([f"id{i:04d}" for i in range(1200)])
+        self.assertEqual(len(found), 1200)
+        self.assertEqual(self.docstore.delete_many([f"id{i:04d}" for i in range(700)]), 700)
+        self.assertEqual(len(self.docstore), 500)
+        self.assertEqual(sum(len(batch) for batch in self.docstore.ids()), 500)
+
+    def test_versions_share_the_alias_docstore(self):
+        self.assertEqual(logical_name("docs_v12"), "docs")
+        self.assertEqual(logical_name("docs"), "docs")
+
+
+class TestStoreWithDocStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for target in ("app.services.vector.dedup.settings.DEDUP_INDEX_DIR",
+                       "app.services.vector.docstore.settings.DOCSTORE_DIR"):
+            patcher = patch(target, Path(self.tmp.name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_docstores)
+        self.addCleanup(close_dedup_indexes)
+        self.client = QdrantClient(":memory:")
+        self.store = _store(self.client)
+        self.store.ensure_collection(4, matryoshka_dim=None)
+
+    def _upsert(self, texts, source="a.pdf"):
+        self.store.upsert(Embedder().embed_batch(texts, [{"source": source, "page": i} for i in range(len(texts))]))
+
+    def test_payload_holds_only_metadata(self):
+        self._upsert(["first chunk", "second chunk"])
+        points, _ = self.client.scroll("docs", with_payload=True)
+        self.assertTrue(all("text" not in p.payload for p in points))
+
+        results = self.store.search([1.0, 1.0, 1.0, 1.0], limit=5)
+        self.assertEqual(sorted(r.text for r in results), ["first chunk", "second chunk"])
+        self.assertEqual({r.metadata["source"] for r in results}, {"a.pdf"})
+
+    def test_legacy_points_fall_back_to_payload_text(self):
+        from qdrant_client.http import models
+        self.client.upsert("docs", points=[models.PointStruct(
+            id=point_id_for("legacy chunk"), vector=[1.0, 1.0, 1.0, 1.0],
+            payload={"text": "legacy chunk", "source": "old.pdf", "page": 1},
+        )])
+        results = self.store.search([1.0, 1.0, 1.0, 1.0], limit=5)
+        self.assertEqual([r.text for r in results], ["legacy chunk"])
+        self.assertNotIn("text", results[0].metadata)
+
+    def test_delete_source_removes_text(self):
+        self._upsert(["first chunk"], source="a.pdf")
+        self._upsert(["other chunk"], source="b.pdf")
+        self.store.delete_source("a.pdf")
+        docstore = get_docstore("docs")
+        self.assertEqual(docstore.get_many([point_id_for("first chunk"), point_id_for("other chunk")]),
+                         {point_id_for("other chunk"): "other chunk"})
+
+    def test_reindex_reads_text_from_docstore_and_prunes_stale_entries(self):
+        self._upsert(["first chunk", "second chunk"])
+        get_docstore("docs").put_many({"orphan": "no longer indexed"})
+
+        status = ReindexService(store=self.store, embedding_service=Embedder(), keep_previous=0).run(status=ReindexStatus())
+
+        self.assertEqual(status.state, "completed")
+        results = self.store.search([1.0, 1.0, 1.0, 1.0], limit=5)
+        self.assertEqual(sorted(r.text for r in results), ["first chunk", "second chunk"])
+        self.assertEqual(len(get_docstore("docs")), 2)
+
+    def test_failed_upsert_leaves_no_orphan_text(self):
+        self._upsert(["first chunk"])
+        failing = _store(MagicMock())
+        failing.client.upsert.side_effect = RuntimeError("qdrant down")
+        failing.matryoshka_dim = lambda refresh=False: None
+        with self.assertRaises(RuntimeError):
+            failing.upsert(Embedder().embed_batch(["first chunk", "new chunk"]))
+        # Text the stored point still needs stays; the new chunk's text is gone again
+        self.assertEqual(set(get_docstore("docs").get_many([point_id_for("first chunk"), point_id_for("new chunk")])),
+                         {point_id_for("first chunk")})
+
+
+class TestDocStoreDefault(unittest.TestCase):
+    def test_off_for_server_qdrant_on_for_local_storage(self):
+        from app.services.vector.store import docstore_enabled
+        with patch("app.services.vector.store.settings.DOCSTORE_ENABLED", None):
+            with patch("app.services.vector.store.settings.VECTOR_DB_URL", "http://qdrant:6333"):
+                self.assertFalse(docstore_enabled())
+                self.assertIsNone(_store(MagicMock()).docstore)
+            with patch("app.services.vector.store.settings.VECTOR_DB_URL", "./qdrant_data"):
+                self.assertTrue(docstore_enabled())
+        with patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True):
+            with patch("app.services.vector.store.settings.VECTOR_DB_URL", "http://qdrant:6333"):
+                self.assertTrue(docstore_enabled())
+
+
+if __name__ == "__main__":
+    unittest.main()
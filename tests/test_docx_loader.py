@@ -0,0 +1,102 @@
+import io
+import unittest
+import zipfile
+
+import docx
+
+from app.services.document.loader import DocumentLoader
+
+
+def _docx_bytes(build) -> bytes:
+    document = docx.Document()
+    build(document)
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+
+class TestStreamingDocx(unittest.TestCase):
+    def setUp(self):
+        self.loader = DocumentLoader()
+
+    def test_sections_follow_headings_and_include_tables(self):
+        def build(d):
+            d.add_paragraph("Preamble before any heading.")
+            d.add_heading("Eligibility", level=1)
+            d.add_paragraph("Applicants must be residents.")
+            table = d.add_table(rows=2, cols=2)
+            table.cell(0, 0).text, table.cell(0, 1).text = "Household", "Income limit"
+            table.cell(1, 0).text, table.cell(1, 1).text = "Single", "12000"
+            d.add_heading("How to apply", level=2)
+            d.add_paragraph("Apply online.")
+
+        docs = self.loader.load_bytes(_docx_bytes(build), "scheme.docx")
+
+        self.assertEqual([d.metadata.get("section") for d in docs], [None, "Eligibility", "How to apply"])
+        self.assertEqual([d.metadata["page"] for d in docs], [1, 2, 3])
+        self.assertEqual(
+            docs[1].text,
+            "Eligibility\n\nApplicants must be residents.\n\nHousehold | Income limit\nSingle | 12000",
+        )
+        self.assertTrue(all(d.metadata["source"] == "scheme.docx" for d in docs))
+
+    def test_long_sections_are_split(self):
+        self.loader.DOCX_SECTION_MAX_CHARS = 200
+
+        def build(d):
+            d.add_heading("Annex", level=1)
+            for i in range(10):
+                d.add_paragraph(f"Clause {i}: the allocation is reviewed every financial year.")
+
+        docs = self.loader.load_bytes(_docx_bytes(build), "annex.docx")
+        self.assertGreater(len(docs), 1)
+        self.assertTrue(all(d.metadata["section"] == "Annex" for d in docs))
+        self.assertTrue(all(len(d.text) < 400 for d in docs))
+
+    def test_not_a_docx(self):
+        with self.assertRaises(ValueError):
+            self.loader.load_bytes(b"\xd0\xcf\x11\xe0 legacy word binary", "old.doc")
+
+    def test_missing_styles_part(self):
+        ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as archive:
+            archive.writestr("word/document.xml", (
+                f'<w:document xmlns:w="{ns}"><w:body>'
+                '<w:p><w:pPr><w:outlineLvl w:val="0"/></w:pPr><w:r><w:t>Scope</w:t></w:r></w:p>'
+                '<w:p><w:r><w:t>Applies to</w:t></w:r><w:r><w:tab/><w:t>all districts.</w:t></w:r></w:p>'
+                '</w:body></w:document>'
+            ))
+        docs = self.loader.load_bytes(buf.getvalue(), "bare.docx")
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(docs[0].metadata["section"], "Scope")
+        self.assertEqual(docs[0].text, "Scope\n\nApplies to all districts.")
+
+    def test_body_text_outline_level_is_not_a_heading(self):
+        ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as archive:
+            archive.writestr("word/styles.xml", (
+                f'<w:styles xmlns:w="{ns}">'
+                '<w:style w:type="paragraph" w:styleId="Kop1"><w:name w:val="Kop 1"/>'
+                '<w:pPr><w:outlineLvl w:val="0"/></w:pPr></w:style>'
+                '<w:style w:type="paragraph" w:styleId="Plain"><w:name w:val="Plain"/>'
+                '<w:pPr><w:outlineLvl w:val="9"/></w:pPr></w:style>'
+                '</w:styles>'
+            ))
+            archive.writestr("word/document.xml", (
+                f'<w:document xmlns:w="{ns}"><w:body>'
+                '<w:p><w:pPr><w:pStyle w:val="Kop1"/></w:pPr><w:r><w:t>Scope</w:t></w:r></w:p>'
+                '<w:p><w:pPr><w:pStyle w:val="Plain"/></w:pPr><w:r><w:t>Styled body text.</w:t></w:r></w:p>'
+                '<w:p><w:pPr><w:outlineLvl w:val="9"/></w:pPr><w:r><w:t>Direct body text.</w:t></w:r></w:p>'
+                '<w:p><w:pPr><w:pStyle w:val="Kop1"/><w:outlineLvl w:val="9"/></w:pPr>'
+                '<w:r><w:t>Overridden heading style.</w:t></w:r></w:p>'
+                '</w:body></w:document>'
+            ))
+        docs = self.loader.load_bytes(buf.getvalue(), "levels.docx")
+        self.assertEqual([d.metadata["section"] for d in docs], ["Scope"])
+        self.assertEqual(docs[0].text, "Scope\n\nStyled body text.\n\nDirect body text.\n\nOverridden heading style.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+import numpy as np
+from app.services.vector.embedding_server import EmbeddingServer
+from app.services.vector.embeddings import RemoteEmbeddingService
+
+def _fake_embed(texts):
+    return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+
+class TestEmbeddingServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.socket_path = os.path.join(cls.tmp.name, "embed.sock")
+        cls.server = EmbeddingServer(cls.socket_path, _fake_embed, max_batch=64, max_wait_ms=20)
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_until_complete, args=(cls.server.serve(),), daemon=True)
+        cls.thread.start()
+        for _ in range(200):
+            if os.path.exists(cls.socket_path):
+                break
+            threading.Event().wait(0.01)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_round_trip_preserves_order_and_metadata(self):
+        service = RemoteEmbeddingService(self.socket_path)
+        results = service.embed_batch(["a", "bbb", "cc"], [{"n": 1}, {"n": 2}, {"n": 3}])
+
+        self.assertEqual([r.text for r in results], ["a", "bbb", "cc"])
+        self.assertEqual([r.vector[0] for r in results], [1.0, 3.0, 2.0])
+        self.assertEqual(results[2].metadata, {"n": 3})
+
+    def test_concurrent_requests_are_batched_together(self):
+        service = RemoteEmbeddingService(self.socket_path)
+        before = self.server.batcher.batches
+        results = {}
+
+        def call(i):
+            results[i] = service.embed_batch([f"text-{i}" * (i + 1)])
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(results), 8)
+        for i, res in results.items():
+            self.assertEqual(res[0].vector[0], float(len(f"text-{i}" * (i + 1))))
+        self.assertLess(self.server.batcher.batches - before, 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import threading
+import time
+import unittest
+
+from app.services.llm.generator import BaseLLMService, LLMCancelledError, LLMTimeoutError
+from app.services.llm.resilient import LLMDeadlineExceeded, LLMUnavailableError, ResilientLLMService
+
+
+class ScriptedLLM(BaseLLMService):
+    """
+    Plays back one scripted behaviour per call: a delay in seconds (answer
+    after sleeping, unless cancelled) or an exception instance to raise.
+    """
+
+    def __init__(self, model, script):
+        self.model = model
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        with self._lock:
+            step = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+            call = self.calls
+        if isinstance(step, Exception):
+            raise step
+        if timeout is not None and step > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f"{self.model} timed out")
+        if cancel is not None and cancel.wait(step):
+            with self._lock:
+                self.cancelled += 1
+            raise LLMCancelledError(self.model)
+        return f"{self.model} answer {call}"
+
+
+class SlowStreamLLM(BaseLLMService):
+    """
+    Streams "first " and then "rest". Call n waits first_pieces[n] seconds
+    (the last entry for later calls) before its first piece and rest_s more
+    before the second; either wait ends early if the call is cancelled.
+    """
+
+    def __init__(self, first_pieces, rest_s):
+        self.model = "stream"
+        self.first_pieces = list(first_pieces)
+        self.rest_s = rest_s
+        self.calls = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        return "".join(self.stream(prompt, timeout=timeout, cancel=cancel, priority=priority))
+
+    def _wait(self, cancel, seconds):
+        if cancel is not None and cancel.wait(seconds):
+            with self._lock:
+                self.cancelled += 1
+            raise LLMCancelledError(self.model)
+
+    def stream(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        with self._lock:
+            first_piece_s = self.first_pieces[min(self.calls, len(self.first_pieces) - 1)]
+            self.calls += 1
+        self._wait(cancel, first_piece_s)
+        yield "first "
+        self._wait(cancel, self.rest_s)
+        yield "rest"
+
+
+class TestResilientLLM(unittest.TestCase):
+    def _service(self, primary, fallback=None, **kwargs):
+        options = dict(deadline_s=5.0, attempt_timeout_s=2.0, max_attempts=3, hedge_percentile=None,
+                       failover_errors=2, failover_cooldown_s=60.0)
+        options.update(kwargs)
+        return ResilientLLMService(primary, fallback, **options)
+
+    def test_transient_errors_are_retried(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("slow"), 0.0])
+        service = self._service(primary, failover_errors=5)
+        self.assertEqual(service.generate("q"), "big answer 2")
+        self.assertEqual(primary.calls, 2)
+
+    def test_non_retryable_errors_surface_immediately(self):
+        primary = ScriptedLLM("big", [ValueError("bad prompt")])
+        with self.assertRaises(ValueError):
+            self._service(primary).generate("q")
+        self.assertEqual(primary.calls, 1)
+
+    def test_exhausted_retries_raise_unavailable(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("slow")])
+        with self.assertRaises(LLMUnavailableError):
+            self._service(primary, failover_errors=10).generate("q")
+        self.assertEqual(primary.calls, 3)
+
+    def test_deadline_bounds_the_whole_call(self):
+        primary = ScriptedLLM("big", [10.0])
+        service = self._service(primary, deadline_s=0.3, attempt_timeout_s=0.2, failover_errors=10)
+        start = time.monotonic()
+        with self.assertRaises(LLMDeadlineExceeded):
+            service.generate("q")
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_hedged_request_wins_over_a_slow_primary(self):
+        primary = ScriptedLLM("big", [1.5, 0.0])
+        service = self._service(primary, hedge_percentile=95.0, hedge_delay_s=0.05, hedge_min_samples=100)
+        start = time.monotonic()
+        self.assertEqual(service.generate("q"), "big answer 2")
+        self.assertLess(time.monotonic() - start, 1.0)
+        time.sleep(0.05)
+        self.assertEqual(primary.cancelled, 1)  # the slow original is abandoned
+
+    def test_streaming_answer_is_never_hedged(self):
+        primary = SlowStreamLLM([0.0], rest_s=0.4)
+        service = self._service(primary, hedge_percentile=95.0, hedge_delay_s=0.05, hedge_min_samples=100)
+        self.assertEqual(service.generate("q"), "first rest")
+        self.assertEqual(primary.calls, 1)
+        # The window holds the time to first token, not the whole answer
+        self.assertLess(service._latency[id(primary)].percentile(50), 0.2)
+
+    def test_silent_primary_is_hedged(self):
+        primary = SlowStreamLLM([1.5, 0.0], rest_s=0.0)
+        service = self._service(primary, hedge_percentile=95.0, hedge_delay_s=0.05, hedge_min_samples=100)
+        start = time.monotonic()
+        self.assertEqual(service.generate("q"), "first rest")
+        self.assertEqual(primary.calls, 2)
+        self.assertLess(time.monotonic() - start, 3.0)
+
+    def test_first_piece_decides_the_race(self):
+        # The hedge goes out at 0.05s; the primary streams first at 0.2s, so the hedge is dropped
+        primary = SlowStreamLLM([0.2, 1.0], rest_s=0.3)
+        service = self._service(primary, hedge_percentile=95.0, hedge_delay_s=0.05, hedge_min_samples=100)
+        self.assertEqual(service.generate("q"), "first rest")
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(primary.cancelled, 1)  # the hedge, at the primary's first piece
+
+    def test_busy_hedge_workers_do_not_hold_up_or_duplicate_answers(self):
+        primary = SlowStreamLLM([0.2], rest_s=0.0)
+        service = self._service(primary, hedge_percentile=95.0, hedge_delay_s=0.05, hedge_min_samples=100)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for _ in range(service._executor._max_workers):
+            service._executor.submit(release.wait)
+
+        start = time.monotonic()
+        self.assertEqual(service.generate("q"), "first rest")
+        self.assertLess(time.monotonic() - start, 1.0)
+        release.set()
+        time.sleep(0.05)
+        self.assertEqual(primary.calls, 1)
+
+    def test_hedge_delay_follows_observed_latency(self):
+        primary = ScriptedLLM("big", [0.0])
+        service = self._service(primary, hedge_percentile=90.0, hedge_delay_s=3.0, hedge_min_samples=5)
+        self.assertEqual(service.hedge_delay(primary), 3.0)
+        for seconds in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0):
+            service._latency[id(primary)].observe(seconds)
+        self.assertEqual(service.hedge_delay(primary), 1.0)
+
+    def test_sustained_errors_fail_over_to_fallback(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("down")])
+        fallback = ScriptedLLM("small", [0.0])
+        service = self._service(primary, fallback)
+
+        self.assertEqual(service.generate("q"), "small answer 1")
+        self.assertEqual(primary.calls, 2)
+        # Later calls skip the primary until the cool-down ends
+        self.assertEqual(service.generate("q"), "small answer 2")
+        self.assertEqual(primary.calls, 2)
+
+    def test_primary_returns_after_cooldown(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("down"), LLMTimeoutError("down"), 0.0])
+        fallback = ScriptedLLM("small", [0.0])
+        service = self._service(primary, fallback)
+        self.assertEqual(service.generate("q"), "small answer 1")
+
+        service.health.open_until = time.monotonic()  # cool-down over
+        self.assertEqual(service.generate("q"), "big answer 3")
+        self.assertEqual(service.health.consecutive_errors, 0)
+
+
+class BrokenStreamLLM(BaseLLMService):
+    """
+    Streams one piece, then fails with a retryable error.
+    """
+
+    model = "big"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None, cancel=None, priority="interactive"):
+        self.calls += 1
+        yield "partial "
+        raise LLMTimeoutError("stalled")
+
+
+class TestResilientStream(unittest.TestCase):
+    def _service(self, primary, fallback=None):
+        return ResilientLLMService(primary, fallback, deadline_s=5.0, attempt_timeout_s=2.0, max_attempts=3,
+                                   hedge_percentile=None, failover_errors=2, failover_cooldown_s=60.0)
+
+    def test_errors_before_the_first_piece_are_retried(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("slow"), 0.0])
+        pieces = list(self._service(primary).stream("q"))
+        self.assertEqual(pieces, ["big answer 2"])
+        self.assertEqual(primary.calls, 2)
+
+    def test_errors_after_the_first_piece_end_the_stream(self):
+        primary = BrokenStreamLLM()
+        stream = self._service(primary).stream("q")
+        self.assertEqual(next(stream), "partial ")
+        with self.assertRaises(LLMTimeoutError):
+            next(stream)
+        self.assertEqual(primary.calls, 1)
+
+    def test_stream_fails_over_like_generate(self):
+        primary = ScriptedLLM("big", [LLMTimeoutError("down")])
+        fallback = ScriptedLLM("small", [0.0])
+        self.assertEqual(list(self._service(primary, fallback).stream("q")), ["small answer 1"])
+        self.assertEqual(primary.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+
+from app.services.llm.scheduler import LLMScheduler, parse_duration
+
+
+class TestLLMScheduler(unittest.TestCase):
+    def test_parse_duration(self):
+        self.assertAlmostEqual(parse_duration("2m59.56s"), 179.56)
+        self.assertAlmostEqual(parse_duration("120ms"), 0.12)
+        self.assertEqual(parse_duration("7"), 7.0)
+        self.assertIsNone(parse_duration(None))
+
+    def test_interactive_requests_jump_the_batch_queue(self):
+        scheduler = LLMScheduler("m", requests_per_minute=1, tokens_per_minute=100000)
+        scheduler.acquire(10)
+        scheduler.requests.rate = 10.0  # next slot frees up in ~100ms
+        order = []
+
+        def worker(priority):
+            scheduler.acquire(10, priority=priority, timeout=5)
+            order.append(priority)
+
+        batch = threading.Thread(target=worker, args=("batch",))
+        batch.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=worker, args=("interactive",))
+        interactive.start()
+        batch.join(5)
+        interactive.join(5)
+        self.assertEqual(order, ["interactive", "batch"])
+
+    def test_waiting_past_timeout_raises(self):
+        scheduler = LLMScheduler("m", requests_per_minute=100, tokens_per_minute=1000)
+        scheduler.acquire(1000)
+        with self.assertRaises(TimeoutError):
+            scheduler.acquire(500, timeout=0.05)
+        self.assertEqual(scheduler.queue_depth(), 0)
+
+    def test_headers_resync_budget(self):
+        scheduler = LLMScheduler("m", requests_per_minute=30, tokens_per_minute=6000)
+        scheduler.acquire(600)
+        scheduler.observe_headers({
+            "x-ratelimit-limit-requests": "14400",
+            "x-ratelimit-remaining-requests": "14000",
+            "x-ratelimit-reset-requests": "2m40s",
+            "x-ratelimit-limit-tokens": "12000",
+            "x-ratelimit-remaining-tokens": "3000",
+            "x-ratelimit-reset-tokens": "45s",
+        }, reserved=600)
+
+        self.assertEqual(scheduler.tokens.capacity, 12000)
+        self.assertAlmostEqual(scheduler.tokens.level, 3000, delta=1)
+        self.assertAlmostEqual(scheduler.tokens.rate, 9000 / 45)
+        self.assertEqual(scheduler.request_quota.capacity, 14400)
+        self.assertAlmostEqual(scheduler.request_quota.rate, 400 / 160)
+
+    def test_settle_refunds_unused_reservation(self):
+        scheduler = LLMScheduler("m", requests_per_minute=30, tokens_per_minute=6000)
+        scheduler.acquire(1000)
+        scheduler.settle(1000, used=250)
+        self.assertAlmostEqual(scheduler.tokens.level, 5750, delta=5)
+
+    def test_rate_limit_response_pauses_the_model(self):
+        scheduler = LLMScheduler("m", requests_per_minute=30, tokens_per_minute=6000)
+        scheduler.observe_headers({"retry-after": "0.2"}, throttled=True)
+        waited = scheduler.acquire(10, timeout=2)
+        self.assertGreaterEqual(waited, 0.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
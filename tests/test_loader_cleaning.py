@@ -0,0 +1,46 @@
+import unittest
+
+from app.services.document.loader import DocumentLoader
+
+
+def _page(n, body):
+    return (
+        f"Ministry of Finance   Annual Report 2023\n"
+        f"{body}\n"
+        f"Confidential - For official use only\n"
+        f"Page {n} of 40 | Printed 12/03/2024\n"
+    )
+
+
+class TestDocumentCleaning(unittest.TestCase):
+    def setUp(self):
+        self.loader = DocumentLoader()
+
+    def _clean(self, raw_pages):
+        pages = [(i + 1, self.loader._clean_lines(text, i + 1)) for i, text in enumerate(raw_pages)]
+        return dict(self.loader._remove_boilerplate(pages))
+
+    def test_page_cleaning_matches_previous_heuristics(self):
+        text = "Hello   World.\t \n\n\n- 5 -\n12\nPage 3\n*\n1. Item\nTitle"
+        self.assertEqual(self.loader._clean_text(text, page_num=3), "Hello World.\n1. Item\nTitle")
+
+    def test_running_headers_and_footers_are_removed(self):
+        topics = ["pensions", "roads", "schools", "water", "housing", "health", "farming", "transport", "power", "forests"]
+        bodies = ["\n".join(f"The {topic} budget, part {part}, is set out here." for part in "abcd") for topic in topics]
+        cleaned = self._clean([_page(i + 1, body) for i, body in enumerate(bodies)])
+
+        self.assertEqual(cleaned[4], [f"The water budget, part {part}, is set out here." for part in "abcd"])
+
+    def test_repeated_lines_inside_the_body_are_kept(self):
+        body = "Intro line one.\nIntro line two.\nIntro line three.\nThe scheme applies to all districts.\nMore text.\nEven more.\nLast body line."
+        cleaned = self._clean([_page(i + 1, body) for i in range(5)])
+        self.assertIn("The scheme applies to all districts.", cleaned[1])
+        self.assertNotIn("Ministry of Finance Annual Report 2023", cleaned[1])
+
+    def test_short_documents_are_left_alone(self):
+        cleaned = self._clean([_page(1, "Only body."), _page(2, "Other body.")])
+        self.assertEqual(cleaned[1][0], "Ministry of Finance Annual Report 2023")
+
+
+if __name__ == "__main__":
+    unittest.main()
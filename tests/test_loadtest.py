@@ -0,0 +1,41 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from benchmarks.loadtest import Recorder, load_records
+
+class TestLoadTestReplay(unittest.TestCase):
+    def test_load_records_maps_record_types(self):
+        lines = [
+            {"type": "chat", "query": "What is the budget?", "filters": {"source": "a.pdf"}},
+            {"type": "ingest", "path": "test_doc.pdf"},
+            {"query": "untyped chat"},
+            {"request_id": "r-1", "title": "Backlog title", "body": "Backlog body"},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "requests.jsonl"
+            path.write_text("\n".join(json.dumps(l) for l in lines) + "\n\n")
+            records = load_records(path)
+
+        self.assertEqual([r["type"] for r in records], ["chat", "ingest", "chat", "chat"])
+        self.assertEqual(records[0]["filters"], {"source": "a.pdf"})
+        self.assertEqual(records[3]["query"], "Backlog title")
+
+    def test_recorder_summary(self):
+        recorder = Recorder()
+        for i in range(99):
+            recorder.add("chat", 0.1, 200, error=False)
+        recorder.add("chat", 2.0, 500, error=True)
+
+        summary = recorder.summary(elapsed=10.0)
+        chat = summary["by_type"]["chat"]
+
+        self.assertEqual(chat["requests"], 100)
+        self.assertEqual(chat["throughput_rps"], 10.0)
+        self.assertEqual(chat["error_rate"], 0.01)
+        self.assertEqual(chat["p50_s"], 0.1)
+        self.assertEqual(chat["p99_s"], 0.1)
+        self.assertEqual(summary["status_codes"], {"200": 99, "500": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from qdrant_client import QdrantClient
+
+from app.schemas.vector import VectorEmbedding
+from app.services.reindex import ReindexService, ReindexStatus
+from app.services.vector import store as store_module
+from app.services.vector.dedup import close_dedup_indexes
+from app.services.vector.docstore import close_docstores
+from app.services.vector.store import FULL_VECTOR, MATRYOSHKA_VECTOR, CollectionSchemaError, QdrantVectorStore
+
+
+def _store(client, name="docs"):
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.client = client
+    store.collection_name = name
+    return store
+
+
+def _points(vectors):
+    return [
+        VectorEmbedding(text=f"chunk {i}", vector=v, metadata={"source": f"doc{i % 2}.pdf", "page": i})
+        for i, v in enumerate(vectors)
+    ]
+
+
+# The prefix ranks chunks 0 and 1 equally; only the tail (full dimension) separates them
+VECTORS = [
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0],
+    [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0],
+    [0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+]
+
+
+class TestMatryoshkaCollections(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch("app.services.vector.dedup.settings.DEDUP_INDEX_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.docstore.settings.DOCSTORE_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_docstores)
+        self.addCleanup(close_dedup_indexes)
+        self.addCleanup(store_module._matryoshka_dims.clear)
+        self.client = QdrantClient(":memory:")
+        self.store = _store(self.client)
+
+    def test_collection_stores_truncated_and_full_vectors(self):
+        self.assertTrue(self.store.ensure_collection(8, matryoshka_dim=4))
+        vectors = self.client.get_collection("docs_v1").config.params.vectors
+        self.assertEqual((vectors[MATRYOSHKA_VECTOR].size, vectors[FULL_VECTOR].size), (4, 8))
+        self.assertEqual(self.store.matryoshka_dim(), 4)
+
+        self.assertFalse(self.store.ensure_collection(8, matryoshka_dim=4))
+        with self.assertRaises(CollectionSchemaError):
+            self.store.ensure_collection(8, matryoshka_dim=None)
+
+    def test_truncated_size_must_be_smaller(self):
+        with self.assertRaises(ValueError):
+            self.store.ensure_collection(8, matryoshka_dim=8)
+
+    def test_candidates_are_rescored_at_full_dimension(self):
+        self.store.ensure_collection(8, matryoshka_dim=4)
+        self.store.upsert(_points(VECTORS))
+
+        results = self.store.search([1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0], limit=2)
+        self.assertEqual([r.text for r in results], ["chunk 1", "chunk 0"])
+        # Full-vector cosine, not the prefix score (which is 1.0 for both)
+        self.assertAlmostEqual(results[0].score, 1.0, places=4)
+        self.assertAlmostEqual(results[1].score, 0.5, places=4)
+
+        filtered = self.store.search([1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0], limit=2, filters={"source": "doc0.pdf"})
+        self.assertEqual([r.text for r in filtered], ["chunk 0", "chunk 2"])
+
+    def test_stale_layout_is_reread(self):
+        self.store.ensure_collection(8, matryoshka_dim=4)
+        self.store.upsert(_points(VECTORS))
+        # As if another process had cached the layout before a reindex
+        store_module._matryoshka_dims["docs"] = None
+        self.assertEqual(len(self.store.search(VECTORS[0], limit=2)), 2)
+        self.assertEqual(self.store.matryoshka_dim(), 4)
+
+    def test_reindex_migrates_a_flat_collection(self):
+        self.store.ensure_collection(8, matryoshka_dim=None)
+        self.store.upsert(_points(VECTORS))
+
+        class Embedder:
+            def embed_batch(self, texts, metadata_list=None):
+                # Re-embeds "chunk <i>" to the same vector; the dimension probe gets any vector
+                return [
+                    VectorEmbedding(text=t, vector=VECTORS[int(t[-1]) if t[-1].isdigit() else 0], metadata=dict(m or {}))
+                    for t, m in zip(texts, metadata_list or [{}] * len(texts))
+                ]
+
+        with patch("app.services.reindex.settings.VECTOR_MATRYOSHKA_DIM", 4):
+            ReindexService(store=self.store, embedding_service=Embedder()).run(status=ReindexStatus())
+
+        self.assertEqual(self.store.resolve_collection(), "docs_v2")
+        self.assertEqual(self.store.matryoshka_dim(), 4)
+        self.assertEqual(self.store.search(VECTORS[3], limit=1)[0].text, "chunk 3")
+
+
+if __name__ == "__main__":
+    unittest.main()
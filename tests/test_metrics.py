@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.main import app
+from app.schemas.vector import VectorEmbedding
+from app.services.retrieval import RetrievalService
+from app.services.vector.dedup import MinHashLSHIndex
+
+def _sample(name, **labels):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+class TestMetrics(unittest.TestCase):
+    def test_index_documents_records_ingest_stages(self):
+        embedder = MagicMock()
+        embedder.embed_batch.side_effect = lambda texts, metas=None: [
+            VectorEmbedding(text=t, vector=[0.1, 0.2], metadata=m) for t, m in zip(texts, metas)
+        ]
+        store = MagicMock()
+        service = RetrievalService(embedding_service=embedder, vector_store=store, dedup_index=MinHashLSHIndex())
+
+        chunks_before = _sample("rag_ingest_chunks_total")
+        points_before = _sample("rag_ingest_points_total")
+        upserts_before = _sample("rag_ingest_stage_duration_seconds_count", stage="upsert")
+
+        service.index_documents(["first page", "second page"], [{"page": 1}, {"page": 2}])
+
+        self.assertEqual(_sample("rag_ingest_chunks_total") - chunks_before, 2)
+        self.assertEqual(_sample("rag_ingest_points_total") - points_before, 2)
+        self.assertEqual(_sample("rag_ingest_stage_duration_seconds_count", stage="upsert") - upserts_before, 1)
+
+    def test_search_records_query_stages(self):
+        embedder = MagicMock()
+        embedder.embed_batch.return_value = [VectorEmbedding(text="q", vector=[0.1, 0.2])]
+        store = MagicMock()
+        store.search.return_value = []
+        service = RetrievalService(embedding_service=embedder, vector_store=store)
+
+        before = _sample("rag_stage_duration_seconds_count", stage="vector_search")
+        service.search("what is the scheme?")
+
+        self.assertEqual(_sample("rag_stage_duration_seconds_count", stage="vector_search") - before, 1)
+
+    def test_metrics_endpoint_exposes_prometheus_text(self):
+        metrics.record_cache_lookup("session", hit=True)
+        client = TestClient(app)
+        response = client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response.headers["content-type"])
+        self.assertIn('rag_cache_lookups_total{cache="session",result="hit"}', response.text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.services.vector import embedding_worker
+from app.services.vector.embeddings import ParallelEmbeddingService
+
+class _FakeModel:
+    def embed(self, texts, batch_size=64):
+        for t in texts:
+            yield np.array([float(t.split("-")[1]), 1.0])
+
+class TestParallelEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self._saved = embedding_worker._model
+        embedding_worker._model = _FakeModel()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.service = ParallelEmbeddingService(workers=4, batch_size=8, executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        embedding_worker._model = self._saved
+
+    def test_shards_are_contiguous_and_batch_sized(self):
+        self.assertEqual(self.service.shard(0), [])
+        self.assertEqual(self.service.shard(5), [(0, 5)])
+        self.assertEqual(self.service.shard(100), [(0, 25), (25, 50), (50, 75), (75, 100)])
+
+    def test_preserves_order_and_metadata(self):
+        texts = [f"t-{i}" for i in range(50)]
+        metas = [{"i": i} for i in range(50)]
+
+        results = self.service.embed_batch(texts, metas)
+
+        self.assertEqual([r.text for r in results], texts)
+        self.assertEqual([r.vector[0] for r in results], [float(i) for i in range(50)])
+        self.assertEqual(results[42].metadata, {"i": 42})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.schemas.vector import VectorEmbedding
+from app.services.rag import RAGService
+from app.services.session import ConversationSession
+
+
+def _chunks(text="Scheme text"):
+    return [VectorEmbedding(text=text, vector=[], metadata={"source": "a.pdf", "page": 1})]
+
+
+class TestPrefetchedRetrieval(unittest.TestCase):
+    def test_close_query_takes_the_parked_chunks_once(self):
+        session = ConversationSession("s")
+        chunks = _chunks()
+        session.park("who is eligible", [1.0, 0.0], chunks, None, ttl_seconds=30)
+
+        self.assertIsNone(session.take_prefetched([0.0, 1.0], None, 0.9))
+        self.assertIsNone(session.take_prefetched([1.0, 0.0], {"source": "b.pdf"}, 0.9))
+        self.assertIs(session.take_prefetched([0.99, 0.05], None, 0.9), chunks)
+        self.assertIsNone(session.take_prefetched([1.0, 0.0], None, 0.9))
+
+    def test_parked_chunks_expire(self):
+        session = ConversationSession("s")
+        with patch("app.services.session.time.monotonic", return_value=100.0):
+            session.park("who is eligible", [1.0, 0.0], _chunks(), None, ttl_seconds=30)
+        with patch("app.services.session.time.monotonic", return_value=131.0):
+            self.assertIsNone(session.prefetched_vector("who is eligible", None))
+            self.assertIsNone(session.take_prefetched([1.0, 0.0], None, 0.9))
+
+
+class TestRAGPrefetch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.retrieval = MagicMock()
+        self.chunks = _chunks()
+        self.retrieval.asearch_by_vector = AsyncMock(return_value=self.chunks)
+        self.service = RAGService(retrieval_service=self.retrieval, llm_service=MagicMock())
+        self.session = ConversationSession("s")
+
+    async def test_submitted_query_uses_the_prefetch(self):
+        self.retrieval.embed_query.return_value = [1.0, 0.0]
+        self.assertEqual(await self.service.prefetch("Who is eligible for the sch", session=self.session), 1)
+
+        self.retrieval.embed_query.return_value = [0.99, 0.05]
+        chunks, reused = await self.service.aretrieve("Who is eligible for the scheme?", session=self.session)
+        self.assertEqual(chunks, self.chunks)
+        self.assertFalse(reused)
+        self.assertEqual(self.retrieval.asearch_by_vector.await_count, 1)
+        # Promoted to the session's retrieval, so close follow-ups keep reusing it
+        self.assertEqual(self.session.chunks, self.chunks)
+
+    async def test_identical_query_is_not_embedded_again(self):
+        self.retrieval.embed_query.return_value = [1.0, 0.0]
+        await self.service.prefetch("Who is eligible for the scheme?", session=self.session)
+        await self.service.prefetch("Who is eligible for the scheme?", session=self.session)
+        await self.service.aretrieve("Who is eligible for the scheme?", session=self.session)
+
+        self.assertEqual(self.retrieval.embed_query.call_count, 1)
+        self.assertEqual(self.retrieval.asearch_by_vector.await_count, 1)
+
+    async def test_different_query_searches_again(self):
+        self.retrieval.embed_query.return_value = [1.0, 0.0]
+        await self.service.prefetch("Who is eligible for the sch", session=self.session)
+
+        self.retrieval.embed_query.return_value = [0.0, 1.0]
+        await self.service.aretrieve("How do I claim a tax refund?", session=self.session)
+        self.assertEqual(self.retrieval.asearch_by_vector.await_count, 2)
+
+
+class TestPrefetchEndpoint(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import chat
+        from app.main import app
+
+        self.service = MagicMock()
+        self.service.prefetch = AsyncMock(return_value=3)
+        app.dependency_overrides[chat.get_rag_service] = lambda: self.service
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def test_prefetch_returns_a_session(self):
+        body = self.client.post("/api/v1/search/prefetch", json={"query": "Who is eligible for"}).json()
+        self.assertEqual(body["candidates"], 3)
+        self.assertTrue(body["session_id"])
+        self.assertEqual(self.service.prefetch.call_args.kwargs["session"].id, body["session_id"])
+
+    def test_short_or_failing_prefetch_reports_nothing(self):
+        body = self.client.post("/api/v1/search/prefetch", json={"query": "Who"}).json()
+        self.assertEqual(body["candidates"], 0)
+        self.service.prefetch.assert_not_called()
+
+        self.service.prefetch.side_effect = RuntimeError("qdrant down")
+        response = self.client.post("/api/v1/search/prefetch", json={"query": "Who is eligible for"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["candidates"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
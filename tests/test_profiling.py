@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import profiling
+from app.core.profiling import IngestMemoryTracer, NullMemoryTracer, RequestProfilerMiddleware, get_memory_tracer
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch.object(profiling, "settings")
+        self.settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings.ADMIN_TOKEN = "secret"
+        self.settings.PROFILE_DIR = Path(self.tmp.name)
+
+        app = FastAPI()
+        app.add_middleware(RequestProfilerMiddleware)
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_profiles_request_with_admin_token(self):
+        response = self.client.get("/ping", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+        self.assertEqual(response.status_code, 200)
+        artifact = response.headers["x-profile-id"]
+        self.assertTrue((Path(self.tmp.name) / artifact).is_file())
+
+    def test_overlapping_profile_is_served_unprofiled(self):
+        with profiling._profile_lock:
+            response = self.client.get("/ping", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+        # The lock is free again for the next profiled request
+        response = self.client.get("/ping", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+        self.assertIn("x-profile-id", response.headers)
+
+    def test_ignores_profile_header_without_valid_token(self):
+        response = self.client.get("/ping", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+class TestMemoryTracer(unittest.TestCase):
+    def test_disabled_tracer_is_noop(self):
+        with patch.object(profiling.settings, "MEMORY_TRACE_ENABLED", False):
+            tracer = get_memory_tracer("doc.pdf")
+        self.assertIsInstance(tracer, NullMemoryTracer)
+        self.assertIsNone(tracer.finish())
+
+    def test_records_stage_boundaries(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.object(profiling.settings, "PROFILE_DIR", Path(tmp)):
+            tracer = IngestMemoryTracer("doc.pdf")
+            tracer.mark("start")
+            blob = [bytearray(1024) for _ in range(100)]
+            tracer.mark("load", pages=4)
+            path = tracer.finish()
+
+            self.assertEqual([s["stage"] for s in tracer.stages], ["start", "load"])
+            self.assertGreaterEqual(tracer.stages[1]["peak_bytes"], 100 * 1024)
+            self.assertIn("peak_bytes_per_page", tracer.stages[1])
+            self.assertTrue(path.is_file())
+            del blob
+
+if __name__ == "__main__":
+    unittest.main()
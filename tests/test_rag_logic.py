@@ -5,12 +5,13 @@ from app.services.vector.store import QdrantVectorStore
 from qdrant_client.http import models
 
 class TestQdrantFiltering(unittest.TestCase):
-    @patch('app.services.vector.store.QdrantClient')
+    @patch('qdrant_client.QdrantClient')
     @patch('app.services.vector.store.settings')
     def test_search_with_filters(self, mock_settings, mock_client_class):
         # Setup
         mock_settings.VECTOR_DB_URL = "http://localhost:6333"
         mock_settings.VECTOR_COLLECTION_NAME = "test_collection"
+        mock_settings.DOCSTORE_ENABLED = False
         
         mock_client = MagicMock()
         mock_client_class.return_value = mock_client
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.core import readiness as readiness_module
+from app.core.readiness import ReadinessState, start_warmup
+from app.main import app
+
+class TestReadiness(unittest.TestCase):
+    def setUp(self):
+        self.state = ReadinessState()
+        patcher = patch.object(readiness_module, "readiness", self.state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warmup_marks_ready(self):
+        calls = []
+        start_warmup([("a", lambda: calls.append("a")), ("b", lambda: calls.append("b"))]).join(5)
+
+        self.assertEqual(calls, ["a", "b"])
+        self.assertTrue(self.state.ready)
+        self.assertIn("warmup_seconds", self.state.to_dict())
+
+    def test_failed_step_is_reported_without_stopping_others(self):
+        calls = []
+        def broken():
+            raise RuntimeError("model missing")
+        start_warmup([("embedding_model", broken), ("after", lambda: calls.append("after"))]).join(5)
+
+        self.assertEqual(self.state.status, "degraded")
+        self.assertEqual(self.state.errors, {"embedding_model": "model missing"})
+        self.assertEqual(calls, ["after"])
+
+    def test_health_answers_before_ready(self):
+        with patch("app.main.readiness", self.state):
+            client = TestClient(app)
+            self.assertEqual(client.get("/health").status_code, 200)
+            self.assertFalse(client.get("/health").json()["ready"])
+            self.assertEqual(client.get("/ready").status_code, 503)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from qdrant_client import QdrantClient
+
+from app.schemas.document import Document
+from app.schemas.vector import VectorEmbedding
+from app.services.reindex import ReindexService, ReindexStatus
+from app.services.retrieval import RetrievalService
+from app.services.vector.dedup import MinHashLSHIndex, close_dedup_indexes
+from app.services.vector.docstore import close_docstores
+from app.services.vector.store import CollectionSchemaError, QdrantVectorStore, point_id_for
+
+
+class FixedEmbedder:
+    """
+    Maps each text to a deterministic `dim`-sized vector.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def embed_batch(self, texts, metadata_list=None):
+        return [
+            VectorEmbedding(text=t, vector=[float(len(t) % 7 + 1)] + [1.0] * (self.dim - 1), metadata=dict(m or {}))
+            for t, m in zip(texts, metadata_list or [{}] * len(texts))
+        ]
+
+
+def _store(client, name="docs"):
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.client = client
+    store.collection_name = name
+    return store
+
+
+class TestAliasedCollections(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch("app.services.vector.dedup.settings.DEDUP_INDEX_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.docstore.settings.DOCSTORE_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.vector.store.settings.DOCSTORE_ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_docstores)
+        self.addCleanup(close_dedup_indexes)
+        self.client = QdrantClient(":memory:")
+        self.store = _store(self.client)
+
+    def _ingest(self, embedder, texts, source="a.pdf"):
+        retrieval = RetrievalService(embedding_service=embedder, vector_store=self.store, dedup_index=MinHashLSHIndex())
+        docs = [Document(text=t, metadata={"source": source, "page": i}) for i, t in enumerate(texts)]
+        return retrieval.index_chunks(docs)
+
+    def test_fresh_install_creates_versioned_collection_behind_alias(self):
+        self.assertTrue(self.store.ensure_collection(4))
+        self.assertEqual(self.store.resolve_collection(), "docs_v1")
+        self.assertFalse(self.store.ensure_collection(4))
+
+    def test_size_change_no_longer_wipes_the_live_collection(self):
+        self._ingest(FixedEmbedder(4), ["first chunk of text", "second chunk of text"])
+        with self.assertRaises(CollectionSchemaError):
+            self.store.ensure_collection(8)
+        self.assertEqual(self.client.count("docs").count, 2)
+
+    def test_reindex_swaps_alias_and_drops_old_version(self):
+        self._ingest(FixedEmbedder(4), ["first chunk of text", "second chunk of text"])
+
+        status = ReindexService(store=self.store, embedding_service=FixedEmbedder(8)).run(status=ReindexStatus())
+
+        self.assertEqual(status.state, "completed")
+        self.assertEqual((status.source_collection, status.target_collection), ("docs_v1", "docs_v2"))
+        self.assertEqual(status.dropped, ["docs_v1"])
+        self.assertEqual(self.store.resolve_collection(), "docs_v2")
+        self.assertEqual(self.store.versions(), ["docs_v2"])
+        # Searches through the alias see the re-embedded points at the new size
+        results = self.store.search([1.0] * 8, limit=5)
+        self.assertEqual(sorted(r.text for r in results), ["first chunk of text", "second chunk of text"])
+
+    def test_long_lived_service_follows_the_alias_to_the_new_index(self):
+        from app.services.vector.dedup import get_dedup_index
+
+        disclaimer = "This notice applies to every document published by the department in this series of circulars."
+        service = RetrievalService(embedding_service=FixedEmbedder(4), vector_store=self.store)
+        service.index_chunks([Document(text="first chunk of text", metadata={"source": "a.pdf", "page": 1})])
+        self.assertIs(service.dedup_index, get_dedup_index("docs_v1"))
+
+        ReindexService(store=self.store, embedding_service=FixedEmbedder(4)).run(status=ReindexStatus())
+
+        self.assertIs(service.dedup_index, get_dedup_index("docs_v2"))
+        service.index_chunks([Document(text=disclaimer, metadata={"source": "b.pdf", "page": 1})])
+        # A second worker (resolving the new version) sees the chunk the first one added
+        other = RetrievalService(embedding_service=FixedEmbedder(4), vector_store=_store(self.client))
+        self.assertEqual(other.index_chunks([Document(text=disclaimer, metadata={"source": "c.pdf", "page": 2})]), 0)
+        self.assertEqual(self.client.count("docs").count, 2)
+
+    def test_searches_keep_working_during_reindex(self):
+        self._ingest(FixedEmbedder(4), ["first chunk of text"])
+        seen = []
+
+        class SlowEmbedder(FixedEmbedder):
+            def embed_batch(inner, texts, metadata_list=None):
+                # Mid-copy: the live alias still serves the old version
+                seen.append(len(self.store.search([1.0] * 4, limit=5)))
+                return super().embed_batch(texts, metadata_list)
+
+        ReindexService(store=self.store, embedding_service=SlowEmbedder(8)).run(status=ReindexStatus())
+        self.assertTrue(seen and all(n == 1 for n in seen))
+
+    def test_writes_during_the_copy_reach_the_new_version(self):
+        disclaimer = "This notice applies to every document published by the department in this series of circulars."
+        retrieval = RetrievalService(embedding_service=FixedEmbedder(4), vector_store=self.store, dedup_index=MinHashLSHIndex())
+        retrieval.index_chunks([
+            Document(text="Only in document a, about pensions.", metadata={"source": "a.pdf", "page": 1}),
+            Document(text=disclaimer, metadata={"source": "b.pdf", "page": 1}),
+        ])
+        retrieval.index_chunks([Document(text=disclaimer, metadata={"source": "c.pdf", "page": 2})])
+        done = []
+
+        class MidCopyWriter(FixedEmbedder):
+            def embed_batch(inner, texts, metadata_list=None):
+                if "Only in document a, about pensions." in texts and not done:
+                    # The copy has read these points; now the live version changes under it
+                    done.append(True)
+                    retrieval.delete_source("a.pdf")
+                    retrieval.delete_source("c.pdf")
+                    retrieval.index_chunks([Document(text="Added while copying.", metadata={"source": "d.pdf", "page": 1})])
+                return super().embed_batch(texts, metadata_list)
+
+        ReindexService(store=self.store, embedding_service=MidCopyWriter(8)).run(status=ReindexStatus())
+
+        self.assertTrue(done)
+        self.assertEqual(self.store.resolve_collection(), "docs_v2")
+        results = self.store.search([1.0] * 8, limit=5)
+        self.assertEqual(sorted(r.text for r in results), ["Added while copying.", disclaimer])
+        shared = next(r for r in results if r.text == disclaimer)
+        self.assertEqual(shared.metadata["references"], [{"source": "b.pdf", "page": 1}])
+        # The deleted document's text went with it; the late arrival's text stayed
+        texts = self.store.fetch_texts([point_id_for("Only in document a, about pensions."), point_id_for("Added while copying.")])
+        self.assertEqual(list(texts.values()), ["Added while copying."])
+
+    def test_writes_during_a_directory_rebuild_land_in_the_new_version(self):
+        import threading
+        self._ingest(FixedEmbedder(4), ["first chunk of text"])
+        writer_done = threading.Event()
+        waited = []
+
+        def write():
+            self._ingest(FixedEmbedder(4), ["uploaded during the rebuild"], source="late.pdf")
+            writer_done.set()
+
+        def rebuild(service, directory, target_store, status):
+            writer = threading.Thread(target=write)
+            writer.start()
+            # Uploads through the alias wait for the swap instead of landing in the old version
+            waited.append(not writer_done.wait(0.2))
+            target_store.upsert(FixedEmbedder(4).embed_batch(["rebuilt from files"], [{"source": "a.pdf", "page": 1}]))
+            self.addCleanup(writer.join, 5)
+
+        with patch.object(ReindexService, "_rebuild_from_directory", rebuild):
+            ReindexService(store=self.store, embedding_service=FixedEmbedder(4)).run(
+                directory=Path(self.tmp.name), status=ReindexStatus()
+            )
+        self.assertTrue(writer_done.wait(5))
+        self.assertEqual(waited, [True])
+        results = self.store.search([1.0] * 4, limit=5)
+        self.assertEqual(sorted(r.text for r in results), ["rebuilt from files", "uploaded during the rebuild"])
+
+    def test_paused_writes_wait_for_the_swap(self):
+        import threading
+        from app.services.vector.write_gate import paused_writes, shared_writes
+
+        written = threading.Event()
+
+        def write():
+            with shared_writes("docs"):
+                written.set()
+
+        with paused_writes("docs"):
+            writer = threading.Thread(target=write)
+            writer.start()
+            self.assertFalse(written.wait(0.2))
+            # Writes to a named version (the reindex target) are not held up
+            with shared_writes("docs_v2"):
+                pass
+        writer.join(5)
+        self.assertTrue(written.is_set())
+
+    def test_legacy_unaliased_collection_is_migrated(self):
+        self.client.create_collection("docs", vectors_config={"size": 4, "distance": "Cosine"})
+        self.store.upsert(FixedEmbedder(4).embed_batch(["legacy text"], [{"source": "old.pdf", "page": 1}]))
+
+        ReindexService(store=self.store, embedding_service=FixedEmbedder(4)).run(status=ReindexStatus())
+
+        self.assertEqual(self.store.resolve_collection(), "docs_v1")
+        self.assertEqual(self.client.count("docs").count, 1)
+
+    def test_only_one_reindex_at_a_time(self):
+        from app.services import reindex
+        reindex._reindex_lock.acquire()
+        self.addCleanup(reindex._reindex_lock.release)
+        with self.assertRaises(reindex.ReindexAlreadyRunningError):
+            ReindexService(store=self.store, embedding_service=FixedEmbedder(4)).run(status=ReindexStatus())
+
+    def test_delete_source_keeps_text_of_kept_versions(self):
+        self._ingest(FixedEmbedder(4), ["first chunk of text", "second chunk of text"])
+        ReindexService(store=self.store, embedding_service=FixedEmbedder(8), keep_previous=1).run(status=ReindexStatus())
+        self._ingest(FixedEmbedder(8), ["only in the new version"], source="b.pdf")
+
+        retrieval = RetrievalService(embedding_service=FixedEmbedder(8), vector_store=self.store, dedup_index=MinHashLSHIndex())
+        retrieval.delete_source("a.pdf")
+        retrieval.delete_source("b.pdf")
+
+        self.assertEqual(self.client.count("docs").count, 0)
+        ids = [point_id_for(t) for t in ("first chunk of text", "second chunk of text", "only in the new version")]
+        # docs_v1, kept for rollback, still serves its text; nothing else holds the new chunk
+        texts = self.store.for_collection("docs_v1").fetch_texts(ids)
+        self.assertEqual(sorted(texts.values()), ["first chunk of text", "second chunk of text"])
+        self.assertEqual(len(self.store.docstore), 2)
+
+    def test_delete_source_keeps_shared_points(self):
+        disclaimer = "This notice applies to every document published by the department in this series of circulars."
+        retrieval = RetrievalService(embedding_service=FixedEmbedder(4), vector_store=self.store, dedup_index=MinHashLSHIndex())
+        retrieval.index_chunks([
+            Document(text=disclaimer, metadata={"source": "a.pdf", "page": 1}),
+            Document(text="Only in document a, about pensions.", metadata={"source": "a.pdf", "page": 2}),
+        ])
+        retrieval.index_chunks([Document(text=disclaimer, metadata={"source": "b.pdf", "page": 3})])
+
+        self.assertEqual(retrieval.delete_source("a.pdf"), 2)
+
+        remaining = self.store.search([1.0] * 4, limit=5)
+        self.assertEqual(len(remaining), 1)
+        self.assertEqual(remaining[0].metadata["source"], "b.pdf")
+        self.assertEqual(remaining[0].metadata["references"], [{"source": "b.pdf", "page": 3}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.schemas.vector import VectorEmbedding
+from app.services.rag import NO_ANSWER, RAGService
+from app.services.vector.store import QdrantVectorStore
+
+
+def _chunk(score, source="a.pdf"):
+    return VectorEmbedding(text=f"chunk {score}", vector=[], metadata={"source": source, "page": 1}, score=score)
+
+
+class TestScoreAwareRAG(unittest.TestCase):
+    def setUp(self):
+        self.retrieval = MagicMock()
+        self.llm = MagicMock()
+        self.llm.generate.return_value = "Answer"
+        self.service = RAGService(retrieval_service=self.retrieval, llm_service=self.llm, min_score=0.5)
+
+    def test_adaptive_k_keeps_chunks_near_the_top_score(self):
+        chunks = [_chunk(0.62), _chunk(0.9), _chunk(0.8), _chunk(0.55)]
+        selected = self.service.select_chunks(chunks)
+        # 0.8 * 0.9 = 0.72 cutoff: only the two strong hits survive, best first
+        self.assertEqual([c.score for c in selected], [0.9, 0.8])
+
+    def test_nothing_relevant_skips_the_llm(self):
+        self.retrieval.search.return_value = [_chunk(0.3), _chunk(0.2)]
+        result = self.service.generate_response("What is the capital of Mars?")
+
+        self.assertEqual(result["answer"], NO_ANSWER)
+        self.assertEqual(result["sources"], [])
+        self.assertEqual(result["confidence"], "Low")
+        self.llm.generate.assert_not_called()
+        self.assertEqual(self.retrieval.search.call_args.kwargs["score_threshold"], 0.5)
+
+    def test_confidence_from_scores(self):
+        self.retrieval.search.return_value = [_chunk(0.82)]
+        self.assertEqual(self.service.generate_response("q")["confidence"], "High")
+        self.retrieval.search.return_value = [_chunk(0.6)]
+        self.assertEqual(self.service.generate_response("q")["confidence"], "Medium")
+        self.assertEqual(self.llm.generate.call_count, 2)
+
+
+class TestStoreScores(unittest.TestCase):
+    def test_search_returns_scores(self):
+        store = QdrantVectorStore.__new__(QdrantVectorStore)
+        store.collection_name = "test_collection"
+        store.client = MagicMock()
+        store.client.query_points.return_value = SimpleNamespace(points=[
+            SimpleNamespace(id="p1", score=0.87, payload={"text": "hello", "source": "a.pdf", "page": 2}),
+        ])
+
+        with patch("app.services.vector.store.settings.DOCSTORE_ENABLED", False):
+            results = store.search([0.1, 0.2], limit=3, score_threshold=0.4)
+
+        self.assertEqual(results[0].score, 0.87)
+        self.assertEqual(results[0].metadata, {"source": "a.pdf", "page": 2})
+        self.assertEqual(store.client.query_points.call_args.kwargs["score_threshold"], 0.4)
+
+
+class TestChatConfidence(unittest.TestCase):
+    def test_endpoint_reports_score_confidence(self):
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import chat
+        from app.main import app
+
+        service = MagicMock()
+        service.agenerate_response = AsyncMock(return_value={
+            "answer": "Answer", "sources": [_chunk(0.6)], "confidence": "Medium", "reused_context": False,
+        })
+        app.dependency_overrides[chat.get_rag_service] = lambda: service
+        self.addCleanup(app.dependency_overrides.clear)
+
+        response = TestClient(app).post("/api/v1/chat/", json={"query": "q"})
+        self.assertEqual(response.json()["confidence"], "Medium")
+
+
+if __name__ == "__main__":
+    unittest.main()
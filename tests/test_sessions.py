@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.schemas.vector import VectorEmbedding
+from app.services.rag import RAGService
+from app.services.session import ConversationSession, SessionStore, condense_query
+
+HISTORY = [
+    {"role": "user", "content": "Who is eligible for the housing scheme?"},
+    {"role": "assistant", "content": "Families below the income threshold."},
+]
+
+
+class TestCondenseQuery(unittest.TestCase):
+    def test_follow_up_gets_previous_question(self):
+        self.assertEqual(
+            condense_query("What about senior citizens?", HISTORY),
+            "Who is eligible for the housing scheme? What about senior citizens?",
+        )
+        self.assertTrue(condense_query("When does it close?", HISTORY).startswith("Who is eligible"))
+
+    def test_standalone_question_unchanged(self):
+        query = "List the documents required to apply for a ration card"
+        self.assertEqual(condense_query(query, HISTORY), query)
+        self.assertEqual(condense_query("What about it?", None), "What about it?")
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_lru_bound(self):
+        store = SessionStore(max_sessions=2, ttl_seconds=60)
+        first = store.get_or_create()
+        second = store.get_or_create()
+        store.get(first.id)  # touch: second becomes least recently used
+        store.get_or_create()
+        self.assertIsNotNone(store.get(first.id))
+        self.assertIsNone(store.get(second.id))
+
+    def test_ttl_expiry(self):
+        store = SessionStore(ttl_seconds=10)
+        with patch("app.services.session.time.monotonic", return_value=100.0):
+            session = store.get_or_create("abc")
+        with patch("app.services.session.time.monotonic", return_value=105.0):
+            self.assertIs(store.get("abc"), session)
+        with patch("app.services.session.time.monotonic", return_value=200.0):
+            self.assertIsNone(store.get("abc"))
+            self.assertEqual(len(store), 0)
+
+    def test_turns_are_bounded(self):
+        session = ConversationSession("s", max_turns=3)
+        for i in range(5):
+            session.add_turn("user", str(i))
+        self.assertEqual([t["content"] for t in session.turns], ["2", "3", "4"])
+
+
+class TestSessionRetrievalReuse(unittest.TestCase):
+    def setUp(self):
+        self.retrieval = MagicMock()
+        self.chunks = [VectorEmbedding(text="Scheme text", vector=[], metadata={"source": "a.pdf", "page": 1})]
+        self.retrieval.search_by_vector.return_value = self.chunks
+        self.llm = MagicMock()
+        self.llm.generate.return_value = "Answer"
+        self.service = RAGService(retrieval_service=self.retrieval, llm_service=self.llm)
+        self.session = ConversationSession("s")
+
+    def _ask(self, query, vector, filters=None):
+        self.retrieval.embed_query.return_value = vector
+        return self.service.generate_response(query, filters=filters, session=self.session)
+
+    def test_close_follow_up_reuses_chunks(self):
+        self.assertFalse(self._ask("Who is eligible for the scheme?", [1.0, 0.0])["reused_context"])
+        result = self._ask("And what about it for students?", [0.99, 0.05])
+
+        self.assertTrue(result["reused_context"])
+        self.assertEqual(result["sources"], self.chunks)
+        self.assertEqual(self.retrieval.search_by_vector.call_count, 1)
+        # The follow-up was condensed against the stored turn before embedding
+        self.assertIn("Who is eligible", self.retrieval.embed_query.call_args.args[0])
+
+    def test_topic_change_or_new_filters_retrieves_again(self):
+        self._ask("Who is eligible for the scheme?", [1.0, 0.0])
+        self.assertFalse(self._ask("Tell me about tax refunds", [0.0, 1.0])["reused_context"])
+        self.assertFalse(self._ask("Tell me about tax refunds", [0.0, 1.0], filters={"source": "b.pdf"})["reused_context"])
+        self.assertEqual(self.retrieval.search_by_vector.call_count, 3)
+
+    def test_without_session_uses_history(self):
+        self.retrieval.search.return_value = self.chunks
+        self.service.generate_response("What about students?", history=HISTORY)
+        self.assertTrue(self.retrieval.search.call_args.args[0].startswith("Who is eligible"))
+
+
+class TestChatSessionEndpoint(unittest.TestCase):
+    def test_session_id_round_trip(self):
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import chat
+        from app.main import app
+
+        service = MagicMock()
+        service.agenerate_response = AsyncMock(return_value={"answer": "Answer", "sources": [], "reused_context": False})
+        app.dependency_overrides[chat.get_rag_service] = lambda: service
+        self.addCleanup(app.dependency_overrides.clear)
+        client = TestClient(app)
+
+        session_id = client.post("/api/v1/chat/", json={"query": "first"}).json()["session_id"]
+        self.assertTrue(session_id)
+        again = client.post("/api/v1/chat/", json={"query": "second", "session_id": session_id}).json()
+        self.assertEqual(again["session_id"], session_id)
+        self.assertEqual(service.agenerate_response.call_args.kwargs["session"].id, session_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.services.document.loader import DocumentLoader
+
+
+class TestStreamingTxt(unittest.TestCase):
+    def setUp(self):
+        self.loader = DocumentLoader()
+        self.loader.TXT_WINDOW_BYTES = 64
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, text: str) -> Path:
+        path = Path(self.tmp.name) / "log.txt"
+        path.write_bytes(text.encode("utf-8"))
+        return path
+
+    def test_windows_end_on_line_breaks_with_byte_locators(self):
+        lines = [f"Entry {i}: the district office approved the request." for i in range(6)]
+        path = self._write("\n".join(lines) + "\n")
+
+        docs = list(self.loader.iter_load(path))
+
+        self.assertEqual("\n".join(d.text for d in docs), "\n".join(lines))
+        self.assertEqual([d.metadata["page"] for d in docs], list(range(1, len(docs) + 1)))
+        raw = path.read_bytes()
+        for doc in docs:
+            window = raw[doc.metadata["byte_start"]:doc.metadata["byte_end"]].decode("utf-8")
+            self.assertEqual(window.strip(), doc.text)
+
+    def test_multibyte_characters_split_across_windows(self):
+        text = "ñ" * 100  # no newlines: windows cut mid-character
+        docs = list(self.loader.iter_load(self._write(text)))
+        self.assertGreater(len(docs), 1)
+        self.assertEqual("".join(d.text for d in docs), text)
+
+    def test_bytes_and_file_agree(self):
+        text = "First line of the notice.\nSecond line of the notice.\n" * 5
+        path = self._write(text)
+        from_disk = self.loader.load(path)
+        from_memory = self.loader.load_bytes(path.read_bytes(), "log.txt")
+        self.assertEqual([d.text for d in from_disk], [d.text for d in from_memory])
+
+    def test_empty_and_undecodable_files(self):
+        self.assertEqual(self.loader.load(self._write("")), [])
+        with self.assertRaises(ValueError):
+            self.loader.load_bytes(b"\xff\xfe not utf-8", "bad.txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from app.services.document.loader import DocumentLoader
+from app.services.document.upload import UploadTooLargeError, receive_upload
+
+class _AsyncStream:
+    def __init__(self, data: bytes):
+        self._buf = io.BytesIO(data)
+
+    async def read(self, n: int) -> bytes:
+        return self._buf.read(n)
+
+class TestReceiveUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch("app.services.document.upload.settings.UPLOAD_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _receive(self, data, **kwargs):
+        return asyncio.run(receive_upload(_AsyncStream(data), "report.pdf", chunk_bytes=1024, **kwargs))
+
+    def test_small_upload_stays_in_memory(self):
+        data = b"x" * 3000
+        upload = self._receive(data, max_bytes=10_000, in_memory_max_bytes=4096)
+
+        self.assertEqual(upload.data, data)
+        self.assertIsNone(upload.path)
+        self.assertEqual(upload.size, 3000)
+        self.assertEqual(upload.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+    def test_large_upload_spills_to_unique_path(self):
+        data = bytes(range(256)) * 40
+        first = self._receive(data, max_bytes=100_000, in_memory_max_bytes=4096)
+        second = self._receive(data, max_bytes=100_000, in_memory_max_bytes=4096)
+
+        self.assertIsNone(first.data)
+        self.assertNotEqual(first.path, second.path)
+        self.assertEqual(first.path.suffix, ".pdf")
+        self.assertEqual(first.path.read_bytes(), data)
+        self.assertEqual(first.sha256, hashlib.sha256(data).hexdigest())
+
+        first.cleanup()
+        self.assertFalse(first.path.exists())
+
+    def test_size_limit_enforced_while_streaming(self):
+        with self.assertRaises(UploadTooLargeError):
+            self._receive(b"x" * 20_000, max_bytes=10_000, in_memory_max_bytes=4096)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+class TestLoadBytes(unittest.TestCase):
+    def test_pdf_from_memory_matches_disk(self):
+        path = Path(__file__).resolve().parent.parent / "test_doc.pdf"
+        loader = DocumentLoader()
+
+        from_disk = loader.load(path)
+        from_memory = loader.load_bytes(path.read_bytes(), "test_doc.pdf")
+
+        self.assertEqual([d.text for d in from_memory], [d.text for d in from_disk])
+        self.assertEqual(from_memory[0].metadata["source"], "test_doc.pdf")
+
+    def test_source_name_override(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "3f2a9c.txt"
+            path.write_text("Some meaningful content here.", encoding="utf-8")
+            docs = DocumentLoader().load(path, source_name="notes.txt")
+        self.assertEqual(docs[0].metadata["source"], "notes.txt")
+
+class TestRequestBodyLimit(unittest.TestCase):
+    def setUp(self):
+        from fastapi import FastAPI, File, UploadFile
+        from fastapi.testclient import TestClient
+        from app.core.request_limits import RequestBodyLimitMiddleware
+
+        self.handled = []
+        app = FastAPI()
+        app.add_middleware(RequestBodyLimitMiddleware, limits={"/upload": 1000})
+
+        @app.post("/upload")
+        async def upload(file: UploadFile = File(...)):
+            self.handled.append(len(await file.read()))
+            return {"ok": True}
+
+        @app.post("/other")
+        async def other(file: UploadFile = File(...)):
+            return {"size": len(await file.read())}
+
+        self.client = TestClient(app)
+
+    def _multipart(self, size):
+        boundary = "limitboundary"
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n"
+            "Content-Type: text/plain\r\n\r\n"
+        ).encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+        return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+    def test_small_upload_passes(self):
+        response = self.client.post("/upload", files={"file": ("a.txt", b"x" * 100, "text/plain")})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.handled, [100])
+
+    def test_declared_length_over_limit_is_refused_before_parsing(self):
+        response = self.client.post("/upload", files={"file": ("a.txt", b"x" * 5000, "text/plain")})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.handled, [])
+
+    def test_chunked_body_is_cut_off_at_the_limit(self):
+        body, headers = self._multipart(5000)
+
+        def chunks():
+            for i in range(0, len(body), 256):
+                yield body[i:i + 256]
+
+        response = self.client.post("/upload", content=chunks(), headers=headers)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.handled, [])
+
+    def test_other_paths_are_not_limited(self):
+        response = self.client.post("/other", files={"file": ("a.txt", b"x" * 5000, "text/plain")})
+        self.assertEqual(response.json(), {"size": 5000})
+
+class TestIngestEndpoint(unittest.TestCase):
+    def setUp(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from fastapi.testclient import TestClient
+        from app.api.v1.endpoints import documents
+        from app.main import app
+
+        self.retrieval = MagicMock()
+        self.retrieval.chunk_documents.side_effect = lambda docs: docs
+        self.retrieval.aindex_chunks = AsyncMock(side_effect=len)
+        app.dependency_overrides[documents.get_retrieval_service] = lambda: self.retrieval
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def test_ingest_reports_hash_and_indexes_in_background(self):
+        data = (Path(__file__).resolve().parent.parent / "test_doc.pdf").read_bytes()
+        response = self.client.post("/api/v1/documents/ingest", files={"file": ("test_doc.pdf", data, "application/pdf")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content_hash"], hashlib.sha256(data).hexdigest())
+        self.assertTrue(self.retrieval.aindex_chunks.await_count)
+
+        job = self.client.get(f"/api/v1/documents/jobs/{response.json()['job_id']}").json()
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["files"][0]["name"], "test_doc.pdf")
+
+    def test_rejects_unsupported_type(self):
+        response = self.client.post("/api/v1/documents/ingest", files={"file": ("image.png", b"png", "image/png")})
+        self.assertEqual(response.status_code, 415)
+
+    def test_rejects_oversized_upload(self):
+        with patch("app.services.document.upload.settings.MAX_UPLOAD_BYTES", 10):
+            response = self.client.post("/api/v1/documents/ingest", files={"file": ("big.txt", b"x" * 100, "text/plain")})
+        self.assertEqual(response.status_code, 413)
+
+    def test_oversized_bulk_request_is_refused(self):
+        with patch("app.core.request_limits.settings.MAX_BULK_UPLOAD_BYTES", 1000):
+            response = self.client.post(
+                "/api/v1/documents/ingest/bulk",
+                files=[("files", ("a.txt", b"x" * 600, "text/plain")), ("files", ("b.txt", b"x" * 600, "text/plain"))],
+            )
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("1000 byte limit", response.json()["detail"])
+
+if __name__ == "__main__":
+    unittest.main()